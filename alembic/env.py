@@ -35,6 +35,7 @@ def include_object(object, name, type_, reflected, compare_to):
             name.upper().startswith("OPERATING_BUDGET")
             or name.upper().startswith("SUPPLIER_BUDGET")
             or name.upper().startswith("CONSTRUCTION_BUDGET")
+            or name.upper() == "BUDGET_TABLE_VERSION"
         )
     )
 
@@ -0,0 +1,85 @@
+"""Bulk upload stage tables
+
+Revision ID: c3d9e5a1f7b2
+Revises: 456f78a4af12
+Create Date: 2026-10-18 09:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c3d9e5a1f7b2'
+down_revision: Union[str, Sequence[str], None] = '456f78a4af12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _stage_columns():
+    return [
+        sa.Column('ID', sa.Integer(), nullable=False),
+        sa.Column('UPLOAD_TOKEN', sa.String(length=32), nullable=False),
+        sa.Column('ROW_NO', sa.Integer(), nullable=False),
+        sa.Column('CREATED_AT', sa.DateTime(), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('OPERATING_BUDGET_STAGE',
+    *_stage_columns(),
+    sa.Column('FISCAL_YEAR', sa.Integer(), nullable=True),
+    sa.Column('FUND_CODE', sa.String(), nullable=True),
+    sa.Column('PROGRAM_CODE', sa.String(), nullable=True),
+    sa.Column('ACCOUNT', sa.String(), nullable=True),
+    sa.Column('DEPTID', sa.String(), nullable=True),
+    sa.Column('OPERATING_UNIT', sa.String(), nullable=True),
+    sa.Column('CLASS', sa.String(), nullable=True),
+    sa.Column('PROJECT_ID', sa.String(), nullable=True),
+    sa.Column('BUDGET_AMOUNT', sa.Float(), nullable=True),
+    sa.Column('DESCR', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('ID')
+    )
+    op.create_index('ix_OPERATING_BUDGET_STAGE_UPLOAD_TOKEN', 'OPERATING_BUDGET_STAGE', ['UPLOAD_TOKEN'])
+
+    op.create_table('SUPPLIER_BUDGET_STAGE',
+    *_stage_columns(),
+    sa.Column('VENDOR_ID', sa.String(length=15), nullable=True),
+    sa.Column('DESCR', sa.String(length=120), nullable=True),
+    sa.Column('FISCAL_YEAR', sa.String(length=4), nullable=True),
+    sa.Column('FUND_CODE', sa.String(length=4), nullable=True),
+    sa.Column('PROGRAM_CODE', sa.String(length=4), nullable=True),
+    sa.Column('ACCOUNT', sa.String(length=10), nullable=True),
+    sa.Column('OPERATING_UNIT', sa.String(length=4), nullable=True),
+    sa.Column('DEPTID', sa.String(length=10), nullable=True),
+    sa.Column('PROJECT_ID', sa.String(length=26), nullable=True),
+    sa.Column('BUSINESS_UNIT', sa.String(length=5), nullable=True),
+    sa.Column('AMOUNT', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('ID')
+    )
+    op.create_index('ix_SUPPLIER_BUDGET_STAGE_UPLOAD_TOKEN', 'SUPPLIER_BUDGET_STAGE', ['UPLOAD_TOKEN'])
+
+    op.create_table('CONSTRUCTION_BUDGET_STAGE',
+    *_stage_columns(),
+    sa.Column('BUDGET_PERIOD', sa.String(length=4), nullable=True),
+    sa.Column('FUND_CODE', sa.String(length=4), nullable=True),
+    sa.Column('PROGRAM_CODE', sa.String(length=4), nullable=True),
+    sa.Column('PROJECT_ID', sa.String(length=26), nullable=True),
+    sa.Column('ACTIVITY_ID', sa.String(length=20), nullable=True),
+    sa.Column('LINE_DESCR', sa.String(length=255), nullable=True),
+    sa.Column('MONETARY_AMOUNT', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.PrimaryKeyConstraint('ID')
+    )
+    op.create_index('ix_CONSTRUCTION_BUDGET_STAGE_UPLOAD_TOKEN', 'CONSTRUCTION_BUDGET_STAGE', ['UPLOAD_TOKEN'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_CONSTRUCTION_BUDGET_STAGE_UPLOAD_TOKEN', table_name='CONSTRUCTION_BUDGET_STAGE')
+    op.drop_table('CONSTRUCTION_BUDGET_STAGE')
+    op.drop_index('ix_SUPPLIER_BUDGET_STAGE_UPLOAD_TOKEN', table_name='SUPPLIER_BUDGET_STAGE')
+    op.drop_table('SUPPLIER_BUDGET_STAGE')
+    op.drop_index('ix_OPERATING_BUDGET_STAGE_UPLOAD_TOKEN', table_name='OPERATING_BUDGET_STAGE')
+    op.drop_table('OPERATING_BUDGET_STAGE')
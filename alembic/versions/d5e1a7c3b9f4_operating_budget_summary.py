@@ -0,0 +1,52 @@
+"""Operating budget summary table
+
+Revision ID: d5e1a7c3b9f4
+Revises: c3d9e5a1f7b2
+Create Date: 2026-10-18 11:40:03.512874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd5e1a7c3b9f4'
+down_revision: Union[str, Sequence[str], None] = 'c3d9e5a1f7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('OPERATING_BUDGET_SUMMARY',
+    sa.Column('ID', sa.Integer(), nullable=False),
+    sa.Column('FISCAL_YEAR', sa.Integer(), nullable=False),
+    sa.Column('FUND_CODE', sa.String(length=30), nullable=False),
+    sa.Column('PROGRAM_CODE', sa.String(length=30), nullable=False),
+    sa.Column('DEPTID', sa.String(length=30), nullable=False),
+    sa.Column('BUDGET_AMOUNT', sa.Float(), nullable=False),
+    sa.Column('ROW_COUNT', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('ID')
+    )
+    op.create_index(
+        'ux_OPERATING_BUDGET_SUMMARY_KEY',
+        'OPERATING_BUDGET_SUMMARY',
+        ['FISCAL_YEAR', 'FUND_CODE', 'PROGRAM_CODE', 'DEPTID'],
+        unique=True,
+    )
+    # Seed the totals from the existing rows
+    op.execute(
+        "INSERT INTO OPERATING_BUDGET_SUMMARY "
+        "(FISCAL_YEAR, FUND_CODE, PROGRAM_CODE, DEPTID, BUDGET_AMOUNT, ROW_COUNT) "
+        "SELECT COALESCE(FISCAL_YEAR, 0), COALESCE(FUND_CODE, ''), COALESCE(PROGRAM_CODE, ''), "
+        "COALESCE(DEPTID, ''), COALESCE(SUM(BUDGET_AMOUNT), 0), COUNT(*) "
+        "FROM OPERATING_BUDGET "
+        "GROUP BY COALESCE(FISCAL_YEAR, 0), COALESCE(FUND_CODE, ''), COALESCE(PROGRAM_CODE, ''), COALESCE(DEPTID, '')"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_OPERATING_BUDGET_SUMMARY_KEY', table_name='OPERATING_BUDGET_SUMMARY')
+    op.drop_table('OPERATING_BUDGET_SUMMARY')
@@ -0,0 +1,31 @@
+"""Budget table version counters
+
+Revision ID: e8b2c4d6f0a1
+Revises: d5e1a7c3b9f4
+Create Date: 2026-10-18 16:42:19.084113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e8b2c4d6f0a1'
+down_revision: Union[str, Sequence[str], None] = 'd5e1a7c3b9f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('BUDGET_TABLE_VERSION',
+    sa.Column('TABLE_NAME', sa.String(length=64), nullable=False),
+    sa.Column('VERSION', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('TABLE_NAME')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('BUDGET_TABLE_VERSION')
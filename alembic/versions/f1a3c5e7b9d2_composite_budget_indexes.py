@@ -0,0 +1,85 @@
+"""Replace single-column budget indexes with composite ones
+
+Revision ID: f1a3c5e7b9d2
+Revises: e8b2c4d6f0a1
+Create Date: 2026-10-18 18:05:44.512087
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f1a3c5e7b9d2'
+down_revision: Union[str, Sequence[str], None] = 'e8b2c4d6f0a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Single-column indexes (ix_<TABLE>_<COLUMN>, as created from index=True)
+# that the composites below lead with, that duplicate the primary key, or
+# that no query can seek (DESCR is only searched with LIKE '%term%')
+SINGLE_COLUMN_INDEXES = {
+    'OPERATING_BUDGET': ['ID', 'FISCAL_YEAR', 'FUND_CODE', 'PROGRAM_CODE', 'OPERATING_UNIT', 'CLASS', 'DESCR'],
+    'SUPPLIER_BUDGET': ['ID', 'FISCAL_YEAR', 'FUND_CODE', 'PROGRAM_CODE', 'OPERATING_UNIT', 'BUSINESS_UNIT'],
+    'CONSTRUCTION_BUDGET': ['ID', 'BUDGET_PERIOD', 'FUND_CODE', 'PROGRAM_CODE', 'PROJECT_ID', 'ACTIVITY_ID'],
+}
+
+# Every index app/models.py declares on the budget tables: the composites, and
+# the single-column ones still declared with index=True
+MODEL_INDEXES = {
+    'ix_OPERATING_BUDGET_FY_FUND_PROGRAM_DEPT': ('OPERATING_BUDGET', ['FISCAL_YEAR', 'FUND_CODE', 'PROGRAM_CODE', 'DEPTID']),
+    'ix_OPERATING_BUDGET_FUND_PROGRAM': ('OPERATING_BUDGET', ['FUND_CODE', 'PROGRAM_CODE']),
+    'ix_OPERATING_BUDGET_ACCOUNT': ('OPERATING_BUDGET', ['ACCOUNT']),
+    'ix_OPERATING_BUDGET_DEPTID': ('OPERATING_BUDGET', ['DEPTID']),
+    'ix_OPERATING_BUDGET_PROJECT_ID': ('OPERATING_BUDGET', ['PROJECT_ID']),
+    'ix_SUPPLIER_BUDGET_FY_FUND_PROGRAM': ('SUPPLIER_BUDGET', ['FISCAL_YEAR', 'FUND_CODE', 'PROGRAM_CODE']),
+    'ix_SUPPLIER_BUDGET_FUND_PROGRAM': ('SUPPLIER_BUDGET', ['FUND_CODE', 'PROGRAM_CODE']),
+    'ix_SUPPLIER_BUDGET_ACCOUNT': ('SUPPLIER_BUDGET', ['ACCOUNT']),
+    'ix_SUPPLIER_BUDGET_DEPTID': ('SUPPLIER_BUDGET', ['DEPTID']),
+    'ix_SUPPLIER_BUDGET_PROJECT_ID': ('SUPPLIER_BUDGET', ['PROJECT_ID']),
+    'ix_CONSTRUCTION_BUDGET_PERIOD_FUND_PROGRAM': ('CONSTRUCTION_BUDGET', ['BUDGET_PERIOD', 'FUND_CODE', 'PROGRAM_CODE']),
+    'ix_CONSTRUCTION_BUDGET_FUND_PROGRAM': ('CONSTRUCTION_BUDGET', ['FUND_CODE', 'PROGRAM_CODE']),
+    'ix_CONSTRUCTION_BUDGET_PROJECT_ACTIVITY': ('CONSTRUCTION_BUDGET', ['PROJECT_ID', 'ACTIVITY_ID']),
+}
+COMPOSITE_INDEXES = {name: spec for name, spec in MODEL_INDEXES.items() if len(spec[1]) > 1}
+
+
+def _existing_indexes(table):
+    """{name: [column, ...]} of the table's indexes."""
+    return {index['name']: index['column_names'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Databases created from the models have the single-column indexes, ones
+    # built by the earlier migrations have none of the indexes below. Either
+    # way the tables end up with exactly the indexes the models declare.
+    for table, columns in SINGLE_COLUMN_INDEXES.items():
+        existing = _existing_indexes(table)
+        for column in columns:
+            name = f'ix_{table}_{column}'
+            if name in existing:
+                op.drop_index(name, table_name=table)
+    for name, (table, columns) in MODEL_INDEXES.items():
+        existing = _existing_indexes(table)
+        if name in existing and existing[name] != columns:
+            op.drop_index(name, table_name=table)
+            del existing[name]
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Back to one index per column, as the models declared before this revision
+    for name, (table, columns) in COMPOSITE_INDEXES.items():
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
+    for table, columns in SINGLE_COLUMN_INDEXES.items():
+        existing = _existing_indexes(table)
+        for column in columns:
+            name = f'ix_{table}_{column}'
+            if name not in existing:
+                op.create_index(name, table, [column])
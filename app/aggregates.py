@@ -0,0 +1,146 @@
+"""
+Database-side totals over the budget tables.
+
+``summarize`` groups by a caller-chosen set of chartfields and returns SUM /
+COUNT per group.  With ``rollup`` it also returns subtotals and a grand total,
+using ``GROUP BY ROLLUP(...)`` where the dialect has it and an equivalent
+``UNION ALL`` of coarser groupings elsewhere (e.g. SQLite).
+
+Operating budget totals that only group and filter by fiscal_year, fund_code,
+program_code and deptid are read from the maintained OPERATING_BUDGET_SUMMARY
+table (see app/summary.py) instead of scanning OPERATING_BUDGET.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from sqlalchemy import func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from . import models, summary
+from .filters import (
+    CONSTRUCTION_BUDGET_FILTERS,
+    EQ,
+    OPERATING_BUDGET_FILTERS,
+    PREFIX,
+    SUPPLIER_BUDGET_FILTERS,
+    FilterSpec,
+)
+
+NATIVE_ROLLUP_DIALECTS = {"mssql", "postgresql", "oracle"}
+
+
+@dataclass(frozen=True)
+class AggregateSpec:
+    filters: FilterSpec
+    amount_attr: str
+
+    @property
+    def group_fields(self) -> Dict[str, str]:
+        """Groupable params (the chartfield codes) mapped to model attributes."""
+        return {f.param: f.attr for f in self.filters.fields if f.kind in (EQ, PREFIX)}
+
+    def group_column(self, param: str):
+        try:
+            return getattr(self.filters.model, self.group_fields[param])
+        except KeyError:
+            raise ValueError(f"Cannot group by {param!r}") from None
+
+
+OPERATING_BUDGET_AGGREGATES = AggregateSpec(OPERATING_BUDGET_FILTERS, "budget_amount")
+SUPPLIER_BUDGET_AGGREGATES = AggregateSpec(SUPPLIER_BUDGET_FILTERS, "amount")
+CONSTRUCTION_BUDGET_AGGREGATES = AggregateSpec(CONSTRUCTION_BUDGET_FILTERS, "monetary_amount")
+
+
+def _answerable_from_summary(spec: AggregateSpec, group_by: Sequence[str], filters) -> bool:
+    """Whether grouping and filters only touch OPERATING_BUDGET_SUMMARY's key columns."""
+    if spec is not OPERATING_BUDGET_AGGREGATES:
+        return False
+    summary_params = {f.param for f in summary.SUMMARY_FILTERS.fields}
+    used = set(group_by) | spec.filters.active_params(filters)
+    return used <= summary_params
+
+
+def _grouping_label(index: int) -> str:
+    return f"grouping_{index}"
+
+
+def summarize(
+    db: Session,
+    spec: AggregateSpec,
+    group_by: Sequence[str],
+    filters: Optional[Mapping[str, str]] = None,
+    rollup: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Total the amount column per group. Raises ValueError for a non-groupable
+    column. Each result has `groups`, `total_amount`, `row_count` and
+    `subtotal` (True for ROLLUP subtotal / grand-total rows).
+    """
+    group_by = list(dict.fromkeys(group_by))
+    columns = [spec.group_column(name) for name in group_by]
+    if _answerable_from_summary(spec, group_by, filters):
+        source = models.OperatingBudgetSummary
+        columns = [getattr(source, spec.group_fields[name]) for name in group_by]
+        clauses = summary.SUMMARY_FILTERS.clauses(filters, db.get_bind())
+        measures = [
+            func.sum(source.budget_amount).label("total_amount"),
+            func.coalesce(func.sum(source.row_count), 0).label("row_count"),
+        ]
+    else:
+        if spec is OPERATING_BUDGET_AGGREGATES:
+            # Group missing keys as the summary table stores them, so both paths agree
+            columns = [
+                summary.key_column(spec.filters.model, attr) if attr in summary.KEY_ATTRS else column
+                for attr, column in zip((spec.group_fields[name] for name in group_by), columns)
+            ]
+        clauses = spec.filters.clauses(filters, db.get_bind())
+        measures = [
+            func.sum(getattr(spec.filters.model, spec.amount_attr)).label("total_amount"),
+            func.count().label("row_count"),
+        ]
+
+    if not rollup or not columns:
+        stmt = (
+            select(*[c.label(n) for c, n in zip(columns, group_by)], *measures)
+            .where(*clauses)
+            .group_by(*columns)
+            .order_by(*columns)
+        )
+    elif db.get_bind().dialect.name in NATIVE_ROLLUP_DIALECTS:
+        stmt = (
+            select(
+                *[c.label(n) for c, n in zip(columns, group_by)],
+                *[func.grouping(c).label(_grouping_label(i)) for i, c in enumerate(columns)],
+                *measures,
+            )
+            .where(*clauses)
+            .group_by(func.rollup(*columns))
+            .order_by(*columns)
+        )
+    else:
+        levels = []
+        for depth in range(len(columns), -1, -1):
+            levels.append(
+                select(
+                    *[
+                        (c if i < depth else null()).label(n)
+                        for i, (c, n) in enumerate(zip(columns, group_by))
+                    ],
+                    *[literal(0 if i < depth else 1).label(_grouping_label(i)) for i in range(len(columns))],
+                    *measures,
+                )
+                .where(*clauses)
+                .group_by(*columns[:depth])
+            )
+        stmt = union_all(*levels)
+        stmt = stmt.order_by(*[stmt.selected_columns[n] for n in group_by])
+
+    results = []
+    for row in db.execute(stmt).mappings():
+        results.append({
+            "groups": {name: row[name] for name in group_by},
+            "total_amount": float(row["total_amount"] or 0),
+            "row_count": row["row_count"],
+            "subtotal": any(row.get(_grouping_label(i)) for i in range(len(columns))) if rollup else False,
+        })
+    return results
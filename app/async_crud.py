@@ -0,0 +1,168 @@
+"""
+AsyncSession counterparts of the REST-facing functions in app/crud.py.
+
+Reads are issued as native async statements. Writes run the existing sync
+crud functions through ``AsyncSession.run_sync`` so that every write path
+(summary deltas and other hooks) stays defined once; the I/O still goes
+through the async driver, so no worker thread is held while SQL runs.
+"""
+from typing import Any, Mapping, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import aggregates, crud, models, rollover, schemas
+from .fastjson import CONSTRUCTION_BUDGET_JSON, OPERATING_BUDGET_JSON, SUPPLIER_BUDGET_JSON, RowSerializer
+from .filters import (
+    CONSTRUCTION_BUDGET_FILTERS,
+    OPERATING_BUDGET_FILTERS,
+    SUPPLIER_BUDGET_FILTERS,
+    FilterSpec,
+)
+
+
+def _list_stmt(
+    bind,
+    spec: FilterSpec,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    filters: Optional[Mapping[str, str]] = None,
+    after_id: Optional[int] = None,
+    base=None,
+):
+    model = spec.model
+    stmt = spec.apply(select(model) if base is None else base, filters, bind)
+    if after_id is not None:
+        stmt = stmt.where(model.id > after_id)
+    stmt = stmt.order_by(model.id).offset(skip)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+async def _list(db: AsyncSession, spec: FilterSpec, *args: Any):
+    return (await db.scalars(_list_stmt(db.get_bind(), spec, *args))).all()
+
+
+async def _rows(db: AsyncSession, spec: FilterSpec, serializer: RowSerializer, *args: Any):
+    """Like _list, but Core rows of just the serializer's columns (no ORM hydration)."""
+    return (await db.execute(_list_stmt(db.get_bind(), spec, *args, serializer.select()))).all()
+
+
+async def table_version(db: AsyncSession, model) -> int:
+    """Async counterpart of cache.table_version."""
+    version = models.BudgetTableVersion
+    stmt = select(version.version).where(version.table_name == model.__tablename__)
+    return (await db.scalar(stmt)) or 0
+
+
+async def get_budget(db: AsyncSession, budget_id: int):
+    return await db.get(models.OperatingBudget, budget_id)
+
+async def get_budgets(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                      filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _list(db, OPERATING_BUDGET_FILTERS, skip, limit, filters, after_id)
+
+async def get_budget_rows(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                          filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _rows(db, OPERATING_BUDGET_FILTERS, OPERATING_BUDGET_JSON, skip, limit, filters, after_id)
+
+async def count_budgets(db: AsyncSession, filters: Optional[Mapping[str, str]] = None) -> int:
+    return await db.run_sync(crud.count_budgets, filters)
+
+async def create_budget(db: AsyncSession, budget: schemas.OperatingBudgetCreate):
+    return await db.run_sync(crud.create_budget, budget)
+
+async def update_budget(db: AsyncSession, budget_id: int, budget: schemas.OperatingBudgetCreate):
+    return await db.run_sync(crud.update_budget, budget_id, budget)
+
+async def delete_budget(db: AsyncSession, budget_id: int):
+    return await db.run_sync(crud.delete_budget, budget_id)
+
+async def bulk_update_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_update_budgets, change.values, change.ids, change.filters, dry_run)
+
+async def bulk_delete_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_delete_budgets, change.ids, change.filters, dry_run)
+
+async def rollover_budgets(db: AsyncSession, request: schemas.Rollover, dry_run: bool = False) -> rollover.RolloverResult:
+    return await db.run_sync(
+        rollover.rollover, rollover.OPERATING_BUDGET_ROLLOVER, request.source_year, request.target_year,
+        request.filters, request.adjustments, request.replace, dry_run,
+    )
+
+
+async def get_supplier_budget(db: AsyncSession, supplier_budget_id: int):
+    return await db.get(models.SupplierBudget, supplier_budget_id)
+
+async def get_supplier_budgets(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                               filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _list(db, SUPPLIER_BUDGET_FILTERS, skip, limit, filters, after_id)
+
+async def get_supplier_budget_rows(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                                   filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _rows(db, SUPPLIER_BUDGET_FILTERS, SUPPLIER_BUDGET_JSON, skip, limit, filters, after_id)
+
+async def count_supplier_budgets(db: AsyncSession, filters: Optional[Mapping[str, str]] = None) -> int:
+    return await db.run_sync(crud.count_supplier_budgets, filters)
+
+async def create_supplier_budget(db: AsyncSession, supplier_budget: schemas.SupplierBudgetCreate):
+    return await db.run_sync(crud.create_supplier_budget, supplier_budget)
+
+async def update_supplier_budget(db: AsyncSession, supplier_budget_id: int, supplier_budget: schemas.SupplierBudgetCreate):
+    return await db.run_sync(crud.update_supplier_budget, supplier_budget_id, supplier_budget)
+
+async def delete_supplier_budget(db: AsyncSession, supplier_budget_id: int):
+    return await db.run_sync(crud.delete_supplier_budget, supplier_budget_id)
+
+async def bulk_update_supplier_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_update_supplier_budgets, change.values, change.ids, change.filters, dry_run)
+
+async def bulk_delete_supplier_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_delete_supplier_budgets, change.ids, change.filters, dry_run)
+
+async def rollover_supplier_budgets(db: AsyncSession, request: schemas.Rollover, dry_run: bool = False) -> rollover.RolloverResult:
+    return await db.run_sync(
+        rollover.rollover, rollover.SUPPLIER_BUDGET_ROLLOVER, request.source_year, request.target_year,
+        request.filters, request.adjustments, request.replace, dry_run,
+    )
+
+
+async def get_construction_budget(db: AsyncSession, construction_budget_id: int):
+    return await db.get(models.ConstructionBudget, construction_budget_id)
+
+async def get_construction_budgets(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                                   filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _list(db, CONSTRUCTION_BUDGET_FILTERS, skip, limit, filters, after_id)
+
+async def get_construction_budget_rows(db: AsyncSession, skip: int = 0, limit: Optional[int] = None,
+                                       filters: Optional[Mapping[str, str]] = None, after_id: Optional[int] = None):
+    return await _rows(db, CONSTRUCTION_BUDGET_FILTERS, CONSTRUCTION_BUDGET_JSON, skip, limit, filters, after_id)
+
+async def count_construction_budgets(db: AsyncSession, filters: Optional[Mapping[str, str]] = None) -> int:
+    return await db.run_sync(crud.count_construction_budgets, filters)
+
+async def create_construction_budget(db: AsyncSession, construction_budget: schemas.ConstructionBudgetCreate):
+    return await db.run_sync(crud.create_construction_budget, construction_budget)
+
+async def update_construction_budget(db: AsyncSession, construction_budget_id: int, construction_budget: schemas.ConstructionBudgetCreate):
+    return await db.run_sync(crud.update_construction_budget, construction_budget_id, construction_budget)
+
+async def delete_construction_budget(db: AsyncSession, construction_budget_id: int):
+    return await db.run_sync(crud.delete_construction_budget, construction_budget_id)
+
+async def bulk_update_construction_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_update_construction_budgets, change.values, change.ids, change.filters, dry_run)
+
+async def bulk_delete_construction_budgets(db: AsyncSession, change: schemas.BulkChange, dry_run: bool = False) -> int:
+    return await db.run_sync(crud.bulk_delete_construction_budgets, change.ids, change.filters, dry_run)
+
+async def rollover_construction_budgets(db: AsyncSession, request: schemas.Rollover, dry_run: bool = False) -> rollover.RolloverResult:
+    return await db.run_sync(
+        rollover.rollover, rollover.CONSTRUCTION_BUDGET_ROLLOVER, request.source_year, request.target_year,
+        request.filters, request.adjustments, request.replace, dry_run,
+    )
+
+
+async def summarize(db: AsyncSession, spec: aggregates.AggregateSpec, group_by, filters=None, rollup: bool = False):
+    return await db.run_sync(aggregates.summarize, spec, group_by, filters, rollup)
@@ -0,0 +1,118 @@
+"""
+Machine-to-machine batch loads for the REST API.
+
+``POST /<table>/batch`` accepts either a JSON array of rows or an NDJSON
+body (``application/x-ndjson``, one row per line). NDJSON is read from the
+request stream as it arrives, so a large feed never has to be held in memory.
+Rows are validated and inserted in chunks; each chunk is its own transaction
+and reports its own result, so one bad row only holds back its chunk.
+"""
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import crud, models, summary
+from .staging import StageTarget
+
+BATCH_CHUNK_SIZE = crud.BULK_CHUNK_SIZE
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+
+
+class InvalidLine:
+    """Placeholder for an NDJSON line that is not valid JSON."""
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+async def iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield one decoded value per non-blank line of an NDJSON byte stream."""
+    buffer = b""
+    async for data in stream:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return InvalidLine(f"Invalid JSON: {exc}")
+
+
+async def iter_json_array(body: bytes) -> AsyncIterator[Any]:
+    rows = json.loads(body)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of rows")
+    for row in rows:
+        yield row
+
+
+def _validate_chunk(target: StageTarget, chunk: List[Any], start: int):
+    invalid = [
+        {"row": start + offset, "field": "", "message": row.message}
+        for offset, row in enumerate(chunk)
+        if isinstance(row, InvalidLine)
+    ]
+    valid, errors = crud.validate_rows(
+        target.schema,
+        [{} if isinstance(row, InvalidLine) else row for row in chunk],
+        start=start,
+    )
+    if invalid:
+        bad_rows = {error["row"] for error in invalid}
+        errors = invalid + [error for error in errors if error["row"] not in bad_rows]
+    return valid, errors
+
+
+async def load_batch(
+    db: AsyncSession,
+    target: StageTarget,
+    rows: AsyncIterator[Any],
+    chunk_size: int = BATCH_CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Validate and insert `rows` chunk by chunk; returns totals and per-chunk results."""
+    on_insert = summary.record_rows if target.model is models.OperatingBudget else None
+    result = {"rows": 0, "inserted": 0, "chunks": []}
+
+    async def flush(chunk: List[Any]) -> None:
+        start = result["rows"] + 1
+        valid, errors = _validate_chunk(target, chunk, start)
+        inserted = 0
+        if not errors:
+            inserted = await db.run_sync(crud.insert_items, target.model, valid, on_insert)
+        result["chunks"].append({
+            "chunk": len(result["chunks"]) + 1,
+            "first_row": start,
+            "rows": len(chunk),
+            "inserted": inserted,
+            "errors": errors,
+        })
+        result["rows"] += len(chunk)
+        result["inserted"] += inserted
+
+    chunk: List[Any] = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            await flush(chunk)
+            chunk = []
+    if chunk:
+        await flush(chunk)
+    return result
+
+
+async def load_request(db: AsyncSession, target: StageTarget, request) -> Dict[str, Any]:
+    """Load a batch from a request body; raises ValueError for a malformed JSON array."""
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type in NDJSON_MEDIA_TYPES:
+        rows = iter_ndjson(request.stream())
+    else:
+        rows = iter_json_array(await request.body())
+    return await load_batch(db, target, rows, BATCH_CHUNK_SIZE)
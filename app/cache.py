@@ -0,0 +1,125 @@
+"""
+Versioned query-result cache for the UI list pages.
+
+Results are cached per (table, kind, normalised filter params) in a bounded
+LRU. Each entry remembers the table's version from BUDGET_TABLE_VERSION when
+it was loaded; every crud write path bumps that counter inside its own
+transaction, so a cached result is reused only while the table is unchanged.
+Because the counter lives in the database, a write made by any worker or
+container invalidates every worker's cache. A lookup costs one primary-key
+SELECT instead of the list query.
+
+QUERY_CACHE_SIZE sets the number of entries per process (0 disables caching).
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "128"))
+
+
+def _table_name(model) -> str:
+    return model.__tablename__
+
+
+def bump(db: Session, model) -> None:
+    """Invalidate cached results for `model`'s table. Does not commit."""
+    version = models.BudgetTableVersion
+    name = _table_name(model)
+    changed = (
+        update(version)
+        .where(version.table_name == name)
+        .values(version=version.version + 1)
+    )
+    if db.execute(changed).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.add(version(table_name=name, version=1))
+    except IntegrityError:
+        # Another writer created the counter first
+        db.execute(changed)
+
+
+def table_version(db: Session, model) -> int:
+    version = models.BudgetTableVersion
+    stmt = select(version.version).where(version.table_name == _table_name(model))
+    return db.execute(stmt).scalar() or 0
+
+
+def normalize_params(params: Optional[Mapping[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    """Order-independent key for query params, ignoring blank values."""
+    if not params:
+        return ()
+    items = params.multi_items() if hasattr(params, "multi_items") else params.items()
+    return tuple(sorted((key, value.strip()) for key, value in items if value and value.strip()))
+
+
+class QueryCache:
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, Tuple[int, Any]]" = OrderedDict()
+
+    def get_or_load(
+        self,
+        db: Session,
+        model,
+        params: Optional[Mapping[str, str]],
+        load: Callable[[], Any],
+        kind: str = "rows",
+        version: Optional[int] = None,
+    ) -> Any:
+        """
+        Return the cached result for (table, kind, params) if the table has not
+        changed since it was loaded, otherwise call `load` and cache that.
+        ORM objects in the result are detached from `db` so they can be shared.
+        Pass `version` if the caller has already read the table's version.
+        """
+        if self.maxsize <= 0:
+            return load()
+        if version is None:
+            version = table_version(db, model)
+        key = (_table_name(model), kind, normalize_params(params))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = load()
+        # A list of rows, or a pagination.Page of them
+        rows = getattr(value, "rows", value)
+        if isinstance(rows, list):
+            for obj in rows:
+                state = inspect(obj, raiseerr=False)
+                if state is not None and state.session is db:
+                    db.expunge(obj)
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+query_cache = QueryCache()
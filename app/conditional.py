@@ -0,0 +1,48 @@
+"""
+Conditional GET (ETag / If-None-Match) helpers for the list endpoints.
+
+A list response is fully determined by the table's version counter (see
+app/cache.py), the request path and its query params, so its ETag can be
+computed before any rows are read. A client that sends a matching
+If-None-Match gets an empty 304 without the list query or template render.
+"""
+import hashlib
+from typing import Any, Mapping, Optional
+
+from fastapi import Request, Response
+
+from .cache import normalize_params
+
+# Browsers store the response but revalidate it on every use
+CACHE_CONTROL = "no-cache"
+
+
+def etag(model, version: int, path: str, params: Optional[Mapping[str, str]] = None, *extra: Any) -> str:
+    """Strong ETag for a response built from `model`'s table at `version`."""
+    key = repr((model.__tablename__, version, path, normalize_params(params), extra))
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def matches(request: Request, tag: str) -> bool:
+    """True if the request's If-None-Match lists `tag` (or is ``*``)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        # If-None-Match uses the weak comparison
+        if candidate == "*" or candidate.removeprefix("W/") == tag:
+            return True
+    return False
+
+
+def set_etag(response: Response, tag: str, vary: Optional[str] = None) -> Response:
+    response.headers["ETag"] = tag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    if vary:
+        response.headers["Vary"] = vary
+    return response
+
+
+def not_modified(tag: str, vary: Optional[str] = None) -> Response:
+    return set_etag(Response(status_code=304), tag, vary)
@@ -1,39 +1,112 @@
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import bindparam, delete, func, insert, select, update
 from sqlalchemy.orm import Session
 
-from . import models, schemas
+from . import cache, models, schemas, summary, textindex
 from .database import Base
+from .filters import (
+    CONSTRUCTION_BUDGET_FILTERS,
+    OPERATING_BUDGET_FILTERS,
+    SUPPLIER_BUDGET_FILTERS,
+    FilterSpec,
+)
+from . import pagination
+from .pagination import Page, estimate_row_count, keyset_page, parse_sort
 
 def get_budget(db: Session, budget_id: int):
     return db.query(models.OperatingBudget).filter(models.OperatingBudget.id == budget_id).first()
 
-from typing import Optional
+from typing import Any, Iterable, Iterator, List, Mapping, Optional, Sequence
 
-def get_budgets(db: Session, skip: int = 0, limit: Optional[int] = None):
+def _page(db: Session, spec: FilterSpec, params: Mapping[str, str], limit: Optional[int] = None) -> Page:
+    """
+    One UI page (UI_PAGE_SIZE rows by default) of `spec`'s table: filtered by
+    `params`, sorted by its `sort` param and continued from its `cursor` param.
+    """
+    sort, descending = parse_sort(params.get("sort"))
+    column = spec.sort_column(sort)
+    query = spec.apply(db.query(spec.model), params, db.get_bind(), sort=column)
+    limit = limit or pagination.UI_PAGE_SIZE
+    return keyset_page(query, spec.model, column, descending, params.get("cursor"), limit)
+
+def _stream(bind, spec: FilterSpec, params: Mapping[str, str]) -> Iterator[Any]:
+    """
+    Every row matching `params` in sort order, fetched STREAM_YIELD_PER at a
+    time over a server-side cursor. Runs on a session of its own, opened on
+    first iteration, because a streamed response outlives the request's session.
+    """
+    params = dict(params)
+    sort, descending = parse_sort(params.get("sort"))
+    with Session(bind) as db:
+        column = spec.sort_column(sort)
+        query = spec.apply(db.query(spec.model), params, bind, sort=column)
+        query = pagination.keyset_query(query, spec.model, column, descending)
+        yield from query.yield_per(pagination.STREAM_YIELD_PER)
+
+def get_budgets(
+    db: Session,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    filters: Optional[Mapping[str, str]] = None,
+    after_id: Optional[int] = None,
+):
     """
     Retrieve budgets with optional pagination. If limit is None, no LIMIT clause is applied.
+    `filters` are query params compiled by OPERATING_BUDGET_FILTERS into WHERE clauses.
+    `after_id` seeks past the last id of the previous page (keyset pagination).
     """
-    query = db.query(models.OperatingBudget).order_by(models.OperatingBudget.id).offset(skip)
+    query = OPERATING_BUDGET_FILTERS.apply(db.query(models.OperatingBudget), filters, db.get_bind())
+    if after_id is not None:
+        query = query.filter(models.OperatingBudget.id > after_id)
+    query = query.order_by(models.OperatingBudget.id).offset(skip)
     if limit is not None:
         query = query.limit(limit)
     return query.all()
 
+def latest_budget_year(db: Session) -> Optional[int]:
+    """The most recent fiscal year (the UI's default view)."""
+    return db.query(func.max(models.OperatingBudget.fiscal_year)).scalar()
+
+def get_budget_page(db: Session, params: Mapping[str, str], limit: Optional[int] = None) -> Page:
+    return _page(db, OPERATING_BUDGET_FILTERS, params, limit)
+
+def stream_budgets(bind, params: Mapping[str, str]) -> Iterator[Any]:
+    return _stream(bind, OPERATING_BUDGET_FILTERS, params)
+
+def count_budgets(db: Session, filters: Optional[Mapping[str, str]] = None) -> int:
+    """
+    Count budgets. Unfiltered counts come from the dialect's row-count metadata
+    rather than a COUNT(*) scan.
+    """
+    clauses = OPERATING_BUDGET_FILTERS.clauses(filters, db.get_bind())
+    if not clauses:
+        return estimate_row_count(db, models.OperatingBudget)
+    return db.query(func.count(models.OperatingBudget.id)).filter(*clauses).scalar()
+
 def create_budget(db: Session, budget: schemas.OperatingBudgetCreate):
     # Ensure tables exist for the current database bind (important for in-memory SQLite in tests)
     Base.metadata.create_all(bind=db.get_bind())
     db_budget = models.OperatingBudget(**budget.dict())
     db.add(db_budget)
+    summary.record_rows(db, [db_budget])
+    cache.bump(db, models.OperatingBudget)
     db.commit()
     db.refresh(db_budget)
+    textindex.record_rows(db, models.OperatingBudget, [db_budget])
     return db_budget
 
 def update_budget(db: Session, budget_id: int, budget: schemas.OperatingBudgetCreate):
     db_budget = get_budget(db, budget_id)
     if not db_budget:
         return None
+    old_key, old_amount = summary.key_of(db_budget), db_budget.budget_amount
     for key, value in budget.dict().items():
         setattr(db_budget, key, value)
+    summary.record_update(db, old_key, old_amount, db_budget)
+    cache.bump(db, models.OperatingBudget)
     db.commit()
     db.refresh(db_budget)
+    textindex.record_rows(db, models.OperatingBudget, [db_budget])
     return db_budget
 
 def delete_budget(db: Session, budget_id: int):
@@ -41,27 +114,63 @@ def delete_budget(db: Session, budget_id: int):
     if not db_budget:
         return None
     db.delete(db_budget)
+    summary.record_rows(db, [db_budget], sign=-1)
+    cache.bump(db, models.OperatingBudget)
     db.commit()
+    textindex.forget(db, models.OperatingBudget, [db_budget.id])
     return db_budget
 
 def get_supplier_budget(db: Session, supplier_budget_id: int):
     return db.query(models.SupplierBudget).filter(models.SupplierBudget.id == supplier_budget_id).first()
 
-def get_supplier_budgets(db: Session, skip: int = 0, limit: Optional[int] = None):
+def get_supplier_budgets(
+    db: Session,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    filters: Optional[Mapping[str, str]] = None,
+    after_id: Optional[int] = None,
+):
     """
     Retrieve supplier budgets with optional pagination. If limit is None, no LIMIT clause is applied.
+    `filters` are query params compiled by SUPPLIER_BUDGET_FILTERS into WHERE clauses.
+    `after_id` seeks past the last id of the previous page (keyset pagination).
     """
-    query = db.query(models.SupplierBudget).order_by(models.SupplierBudget.id).offset(skip)
+    query = SUPPLIER_BUDGET_FILTERS.apply(db.query(models.SupplierBudget), filters, db.get_bind())
+    if after_id is not None:
+        query = query.filter(models.SupplierBudget.id > after_id)
+    query = query.order_by(models.SupplierBudget.id).offset(skip)
     if limit is not None:
         query = query.limit(limit)
     return query.all()
 
+def latest_supplier_budget_year(db: Session) -> Optional[str]:
+    """The most recent fiscal year (the UI's default view)."""
+    return db.query(func.max(models.SupplierBudget.fiscal_year)).scalar()
+
+def get_supplier_budget_page(db: Session, params: Mapping[str, str], limit: Optional[int] = None) -> Page:
+    return _page(db, SUPPLIER_BUDGET_FILTERS, params, limit)
+
+def stream_supplier_budgets(bind, params: Mapping[str, str]) -> Iterator[Any]:
+    return _stream(bind, SUPPLIER_BUDGET_FILTERS, params)
+
+def count_supplier_budgets(db: Session, filters: Optional[Mapping[str, str]] = None) -> int:
+    """
+    Count supplier budgets. Unfiltered counts come from the dialect's row-count metadata
+    rather than a COUNT(*) scan.
+    """
+    clauses = SUPPLIER_BUDGET_FILTERS.clauses(filters, db.get_bind())
+    if not clauses:
+        return estimate_row_count(db, models.SupplierBudget)
+    return db.query(func.count(models.SupplierBudget.id)).filter(*clauses).scalar()
+
 def create_supplier_budget(db: Session, supplier_budget: schemas.SupplierBudgetCreate):
     Base.metadata.create_all(bind=db.get_bind())
     db_supplier_budget = models.SupplierBudget(**supplier_budget.dict())
     db.add(db_supplier_budget)
+    cache.bump(db, models.SupplierBudget)
     db.commit()
     db.refresh(db_supplier_budget)
+    textindex.record_rows(db, models.SupplierBudget, [db_supplier_budget])
     return db_supplier_budget
 
 def update_supplier_budget(db: Session, supplier_budget_id: int, supplier_budget: schemas.SupplierBudgetCreate):
@@ -70,8 +179,10 @@ def update_supplier_budget(db: Session, supplier_budget_id: int, supplier_budget
         return None
     for key, value in supplier_budget.dict().items():
         setattr(db_supplier_budget, key, value)
+    cache.bump(db, models.SupplierBudget)
     db.commit()
     db.refresh(db_supplier_budget)
+    textindex.record_rows(db, models.SupplierBudget, [db_supplier_budget])
     return db_supplier_budget
 
 def delete_supplier_budget(db: Session, supplier_budget_id: int):
@@ -79,7 +190,9 @@ def delete_supplier_budget(db: Session, supplier_budget_id: int):
     if not db_supplier_budget:
         return None
     db.delete(db_supplier_budget)
+    cache.bump(db, models.SupplierBudget)
     db.commit()
+    textindex.forget(db, models.SupplierBudget, [db_supplier_budget.id])
     return db_supplier_budget
 
 
@@ -91,19 +204,47 @@ def get_construction_budget(db: Session, construction_budget_id: int):
     )
 
 
-def get_construction_budgets(db: Session, skip: int = 0, limit: Optional[int] = None):
-    query = db.query(models.ConstructionBudget).order_by(models.ConstructionBudget.id).offset(skip)
+def get_construction_budgets(
+    db: Session,
+    skip: int = 0,
+    limit: Optional[int] = None,
+    filters: Optional[Mapping[str, str]] = None,
+    after_id: Optional[int] = None,
+):
+    query = CONSTRUCTION_BUDGET_FILTERS.apply(db.query(models.ConstructionBudget), filters, db.get_bind())
+    if after_id is not None:
+        query = query.filter(models.ConstructionBudget.id > after_id)
+    query = query.order_by(models.ConstructionBudget.id).offset(skip)
     if limit is not None:
         query = query.limit(limit)
     return query.all()
 
 
+def get_construction_budget_page(db: Session, params: Mapping[str, str], limit: Optional[int] = None) -> Page:
+    return _page(db, CONSTRUCTION_BUDGET_FILTERS, params, limit)
+
+def stream_construction_budgets(bind, params: Mapping[str, str]) -> Iterator[Any]:
+    return _stream(bind, CONSTRUCTION_BUDGET_FILTERS, params)
+
+def count_construction_budgets(db: Session, filters: Optional[Mapping[str, str]] = None) -> int:
+    """
+    Count construction budgets. Unfiltered counts come from the dialect's row-count metadata
+    rather than a COUNT(*) scan.
+    """
+    clauses = CONSTRUCTION_BUDGET_FILTERS.clauses(filters, db.get_bind())
+    if not clauses:
+        return estimate_row_count(db, models.ConstructionBudget)
+    return db.query(func.count(models.ConstructionBudget.id)).filter(*clauses).scalar()
+
+
 def create_construction_budget(db: Session, construction_budget: schemas.ConstructionBudgetCreate):
     Base.metadata.create_all(bind=db.get_bind())
     db_obj = models.ConstructionBudget(**construction_budget.dict())
     db.add(db_obj)
+    cache.bump(db, models.ConstructionBudget)
     db.commit()
     db.refresh(db_obj)
+    textindex.record_rows(db, models.ConstructionBudget, [db_obj])
     return db_obj
 
 
@@ -113,8 +254,10 @@ def update_construction_budget(db: Session, construction_budget_id: int, constru
         return None
     for key, value in construction_budget.dict().items():
         setattr(db_obj, key, value)
+    cache.bump(db, models.ConstructionBudget)
     db.commit()
     db.refresh(db_obj)
+    textindex.record_rows(db, models.ConstructionBudget, [db_obj])
     return db_obj
 
 
@@ -123,5 +266,227 @@ def delete_construction_budget(db: Session, construction_budget_id: int):
     if not db_obj:
         return None
     db.delete(db_obj)
+    cache.bump(db, models.ConstructionBudget)
     db.commit()
+    textindex.forget(db, models.ConstructionBudget, [db_obj.id])
     return db_obj
+
+
+# Bulk loading
+#
+# The batch feed validates each chunk before touching the database, then
+# inserts it with one executemany in its own transaction. Upload confirm
+# copies rows already validated into a stage table with one INSERT ... SELECT.
+
+BULK_CHUNK_SIZE = 1000
+
+
+class BulkValidationError(ValueError):
+    """Raised when rows in a bulk batch fail validation; `errors` lists every bad row."""
+
+    def __init__(self, errors: List[dict]):
+        super().__init__(f"{len(errors)} invalid row(s)")
+        self.errors = errors
+
+
+def validate_rows(schema, rows: Iterable[Any], start: int = 1):
+    """
+    Validate every row against `schema`, collecting all failures instead of
+    stopping at the first. Returns (valid items, errors); rows are numbered
+    from `start`.
+    """
+    valid, errors = [], []
+    for row_number, row in enumerate(rows, start=start):
+        try:
+            valid.append(schema.model_validate(row))
+        except ValidationError as exc:
+            for err in exc.errors():
+                errors.append({
+                    "row": row_number,
+                    "field": ".".join(str(part) for part in err["loc"]),
+                    "message": err["msg"],
+                })
+    return valid, errors
+
+
+def insert_items(db: Session, model, items: List[Any], on_insert=None) -> int:
+    """
+    Insert validated items with one executemany and commit. Nothing is
+    returned per row, which keeps large feeds fast.
+    """
+    if not items:
+        return 0
+    stmt = insert(model)
+    indexed = textindex.is_indexed(db, model)
+    if indexed:
+        # The trigram index needs the new ids
+        stmt = stmt.returning(model.id, getattr(model, textindex.TEXT_COLUMNS[model]))
+    try:
+        result = db.execute(stmt, [item.model_dump() for item in items])
+        pairs = result.all() if indexed else None
+        if on_insert is not None:
+            on_insert(db, items)
+        cache.bump(db, model)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if indexed:
+        textindex.record_pairs(db, model, pairs)
+    return len(items)
+
+
+def insert_select(db: Session, model, names: Sequence[str], rows) -> list:
+    """
+    Copy the rows of `rows`, a SELECT of the `names` attributes in that order,
+    into `model`'s table with one INSERT ... SELECT. Returns (id, text column)
+    pairs for the new rows, for the trigram index. Does not commit.
+    """
+    table = model.__table__
+    columns = [getattr(model, name).property.columns[0] for name in names]
+    text_column = getattr(model, textindex.TEXT_COLUMNS[model]).property.columns[0]
+    stmt = insert(table).from_select(columns, rows).returning(table.c.ID, text_column)
+    return db.execute(stmt).all()
+
+
+# Set-based changes
+#
+# Bulk update/delete select rows by id list or by the UI filter params and
+# change them with a single UPDATE / DELETE statement. A dry run only counts
+# the rows that would be affected.
+
+def validate_patch(schema, values: Mapping[str, Any]) -> dict:
+    """
+    Validate column assignments against the field types of `schema`. Keys may
+    be field names or aliases (``class``); returns {field name: value}.
+    """
+    by_key = {}
+    for name, field in schema.model_fields.items():
+        by_key[name] = (name, field)
+        if field.alias:
+            by_key[field.alias] = (name, field)
+    patch, errors = {}, []
+    for key, value in values.items():
+        if key not in by_key:
+            errors.append({"row": None, "field": key, "message": "Unknown field"})
+            continue
+        name, field = by_key[key]
+        try:
+            patch[name] = TypeAdapter(field.annotation).validate_python(value)
+        except ValidationError as exc:
+            errors.extend(
+                {"row": None, "field": key, "message": err["msg"]} for err in exc.errors()
+            )
+    if errors:
+        raise BulkValidationError(errors)
+    if not patch:
+        raise ValueError("No values to set")
+    return patch
+
+
+def _selection(db: Session, spec, ids: Optional[Iterable[int]], filters: Optional[Mapping[str, str]]) -> list:
+    """WHERE clauses for an id list and/or filter params; refuses to select the whole table."""
+    clauses = spec.clauses(filters, db.get_bind())
+    if ids is not None:
+        ids = list(ids)
+        if not ids:
+            raise ValueError("Empty id list")
+        # Rendered inline so large lists stay under SQL Server's 2100 parameter limit
+        clauses.append(spec.model.id.in_(bindparam("bulk_ids", ids, expanding=True, literal_execute=True)))
+    if not clauses:
+        raise ValueError("Select rows with ids or at least one filter")
+    return clauses
+
+
+def _count_selected(db: Session, model, clauses: list) -> int:
+    return db.execute(select(func.count()).select_from(model).where(*clauses)).scalar_one()
+
+
+def _fiscal_years(db: Session, clauses: list) -> set:
+    budget = models.OperatingBudget
+    return set(db.execute(select(budget.fiscal_year).where(*clauses).distinct()).scalars())
+
+
+def _text_reindex(db: Session, model, patch: Optional[Mapping[str, Any]] = None):
+    """
+    After-commit hook keeping the trigram index current for a bulk update
+    (`patch`) or delete (no patch), or None when the index is unaffected.
+    """
+    if not textindex.is_indexed(db, model):
+        return None
+    if patch is None:
+        return lambda ids: textindex.forget(db, model, ids)
+    attr = textindex.TEXT_COLUMNS[model]
+    if attr not in patch:
+        return None
+    return lambda ids: textindex.record_pairs(db, model, [(row_id, patch[attr]) for row_id in ids])
+
+
+def _bulk_change(db: Session, model, clauses: list, stmt, dry_run: bool, touched_years=None, reindex=None) -> int:
+    if dry_run:
+        return _count_selected(db, model, clauses)
+    try:
+        years = touched_years(clauses) if touched_years else None
+        ids = db.execute(select(model.id).where(*clauses)).scalars().all() if reindex else None
+        count = db.execute(stmt.where(*clauses).execution_options(synchronize_session=False)).rowcount
+        if years:
+            summary.refresh_fiscal_years(db, years)
+        cache.bump(db, model)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if reindex:
+        reindex(ids)
+    return count
+
+
+def bulk_update_budgets(db: Session, values: Mapping[str, Any], ids=None, filters=None, dry_run: bool = False) -> int:
+    """Apply `values` to the selected budgets in one UPDATE; returns the affected row count."""
+    patch = validate_patch(schemas.OperatingBudgetCreate, values)
+    clauses = _selection(db, OPERATING_BUDGET_FILTERS, ids, filters)
+    touched_years = None
+    if patch.keys() & set(summary.KEY_ATTRS + ("budget_amount",)):
+        # Summary groups of both the old and the new fiscal year change
+        new_years = {patch["fiscal_year"]} if "fiscal_year" in patch else set()
+        touched_years = lambda clauses: _fiscal_years(db, clauses) | new_years
+    stmt = update(models.OperatingBudget).values(**patch)
+    reindex = _text_reindex(db, models.OperatingBudget, patch)
+    return _bulk_change(db, models.OperatingBudget, clauses, stmt, dry_run, touched_years, reindex)
+
+
+def bulk_delete_budgets(db: Session, ids=None, filters=None, dry_run: bool = False) -> int:
+    """Delete the selected budgets in one DELETE; returns the affected row count."""
+    clauses = _selection(db, OPERATING_BUDGET_FILTERS, ids, filters)
+    stmt = delete(models.OperatingBudget)
+    reindex = _text_reindex(db, models.OperatingBudget)
+    return _bulk_change(db, models.OperatingBudget, clauses, stmt, dry_run, lambda c: _fiscal_years(db, c), reindex)
+
+
+def bulk_update_supplier_budgets(db: Session, values: Mapping[str, Any], ids=None, filters=None, dry_run: bool = False) -> int:
+    """Apply `values` to the selected supplier budgets in one UPDATE; returns the affected row count."""
+    patch = validate_patch(schemas.SupplierBudgetCreate, values)
+    clauses = _selection(db, SUPPLIER_BUDGET_FILTERS, ids, filters)
+    stmt = update(models.SupplierBudget).values(**patch)
+    return _bulk_change(db, models.SupplierBudget, clauses, stmt, dry_run, reindex=_text_reindex(db, models.SupplierBudget, patch))
+
+
+def bulk_delete_supplier_budgets(db: Session, ids=None, filters=None, dry_run: bool = False) -> int:
+    """Delete the selected supplier budgets in one DELETE; returns the affected row count."""
+    clauses = _selection(db, SUPPLIER_BUDGET_FILTERS, ids, filters)
+    return _bulk_change(db, models.SupplierBudget, clauses, delete(models.SupplierBudget), dry_run, reindex=_text_reindex(db, models.SupplierBudget))
+
+
+def bulk_update_construction_budgets(db: Session, values: Mapping[str, Any], ids=None, filters=None, dry_run: bool = False) -> int:
+    """Apply `values` to the selected construction budgets in one UPDATE; returns the affected row count."""
+    patch = validate_patch(schemas.ConstructionBudgetCreate, values)
+    clauses = _selection(db, CONSTRUCTION_BUDGET_FILTERS, ids, filters)
+    stmt = update(models.ConstructionBudget).values(**patch)
+    return _bulk_change(db, models.ConstructionBudget, clauses, stmt, dry_run, reindex=_text_reindex(db, models.ConstructionBudget, patch))
+
+
+def bulk_delete_construction_budgets(db: Session, ids=None, filters=None, dry_run: bool = False) -> int:
+    """Delete the selected construction budgets in one DELETE; returns the affected row count."""
+    clauses = _selection(db, CONSTRUCTION_BUDGET_FILTERS, ids, filters)
+    return _bulk_change(db, models.ConstructionBudget, clauses, delete(models.ConstructionBudget), dry_run, reindex=_text_reindex(db, models.ConstructionBudget))
+
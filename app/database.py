@@ -1,24 +1,280 @@
 import os
+import threading
+import time
+import weakref
+from typing import Optional, Tuple
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except ImportError:
     pass
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app import metrics
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./operating_budget.db")
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Async drivers used for each sync URL scheme unless ASYNC_DATABASE_URL is set
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mssql": "mssql+aioodbc",
+    "mssql+pyodbc": "mssql+aioodbc",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """The async-driver equivalent of a sync database URL."""
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class PoolStats:
+    """Checkout / wait counters for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "waits": self.waits,
+                "wait_total_ms": round(self.wait_total * 1000, 3),
+                "wait_avg_ms": round(self.wait_total * 1000 / self.waits, 3) if self.waits else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+_pool_stats = weakref.WeakKeyDictionary()
+
+
+class _TimedCheckout:
+    """Pool mixin that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            stats = _pool_stats.get(self)
+            if stats is not None:
+                stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        stats = _pool_stats.get(self)
+        if stats is not None:
+            stats.record_wait(time.perf_counter() - started)
+        return conn
+
+    def recreate(self):
+        # The new pool inherits our event listeners; keep it on the same
+        # stats after engine.dispose()
+        pool = super().recreate()
+        if self in _pool_stats:
+            _pool_stats[pool] = _pool_stats[self]
+        return pool
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _register_pool_events(pool, stats: PoolStats) -> None:
+    event.listen(pool, "connect", lambda *args: stats.incr("connects"))
+    event.listen(pool, "checkout", lambda *args: stats.incr("checkouts"))
+    event.listen(pool, "checkin", lambda *args: stats.incr("checkins"))
+    event.listen(pool, "invalidate", lambda *args: stats.incr("invalidations"))
+
+
+def pool_stats(engine: Engine) -> PoolStats:
+    """The stats collected for `engine`'s pool, attaching collection on first use."""
+    pool = engine.pool
+    stats = _pool_stats.get(pool)
+    if stats is None:
+        stats = _pool_stats[pool] = PoolStats()
+        _register_pool_events(pool, stats)
+    return stats
+
+
+def pool_status(engine: Engine) -> dict:
+    """Current pool occupancy plus the collected checkout/wait counters."""
+    pool = engine.pool
+    status = {
+        "dialect": engine.dialect.name,
+        "driver": engine.dialect.driver,
+        "pool_class": type(pool).__name__,
+        "status": pool.status(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            timeout=pool.timeout(),
+        )
+    status.update(pool_stats(engine).as_dict())
+    return status
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record, journal_mode, synchronous, mmap_size):
+    cursor = dbapi_connection.cursor()
+    try:
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+        if mmap_size:
+            cursor.execute(f"PRAGMA mmap_size={int(mmap_size)}")
+    finally:
+        cursor.close()
+
+
+def _engine_kwargs(url: str, queue_pool) -> Tuple[dict, Optional[dict]]:
+    """Per-dialect create_engine kwargs, plus the SQLite pragmas to set on connect (if any)."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    kwargs = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+
+    if backend == "sqlite":
+        kwargs["connect_args"] = {"check_same_thread": False}
+        in_memory = parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+        if in_memory:
+            return kwargs, None
+        kwargs.update(
+            poolclass=queue_pool,
+            pool_size=_env_int("DB_POOL_SIZE", 5),
+            max_overflow=_env_int("DB_MAX_OVERFLOW", 10),
+            pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+        )
+        pragmas = dict(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            mmap_size=_env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        )
+        return kwargs, pragmas
+
+    kwargs.update(
+        poolclass=queue_pool,
+        pool_size=_env_int("DB_POOL_SIZE", 10),
+        max_overflow=_env_int("DB_MAX_OVERFLOW", 20),
+        pool_timeout=_env_int("DB_POOL_TIMEOUT", 30),
+        # SQL Server and firewalls drop idle connections; replace them first
+        pool_recycle=_env_int("DB_POOL_RECYCLE", 1800),
+    )
+    if parsed.drivername in ("mssql+pyodbc", "mssql+aioodbc"):
+        # Send executemany batches as one round trip instead of one per row
+        kwargs["fast_executemany"] = True
+    return kwargs, None
+
+
+def _finish_engine(sync_engine: Engine, pragmas: Optional[dict]) -> None:
+    if pragmas:
+        event.listen(sync_engine, "connect", lambda conn, record: _sqlite_pragmas(conn, record, **pragmas))
+    pool_stats(sync_engine)
+    # Per-request statement counts and timings (app/metrics.py)
+    metrics.instrument_engine(sync_engine)
+
+
+def build_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """
+    Create an engine with per-dialect pool and driver settings.
+
+    Environment settings (all optional):
+
+    * DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT - QueuePool sizing
+    * DB_POOL_RECYCLE - seconds before a pooled connection is replaced
+    * DB_POOL_PRE_PING - test connections on checkout (default on)
+    * SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE - file SQLite pragmas
+    """
+    kwargs, pragmas = _engine_kwargs(url, TimedQueuePool)
+    kwargs.update(overrides)
+    new_engine = create_engine(url, **kwargs)
+    _finish_engine(new_engine, pragmas)
+    return new_engine
+
+
+def build_async_engine(url: str = ASYNC_DATABASE_URL, **overrides) -> AsyncEngine:
+    """Async counterpart of build_engine, configured from the same settings."""
+    kwargs, pragmas = _engine_kwargs(url, TimedAsyncQueuePool)
+    kwargs.update(overrides)
+    new_engine = create_async_engine(url, **kwargs)
+    _finish_engine(new_engine.sync_engine, pragmas)
+    return new_engine
+
+
+engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+metrics.instrument_orm(Base)
+
+try:
+    async_engine = build_async_engine(ASYNC_DATABASE_URL)
+except ImportError:
+    # The async driver (aiosqlite / aioodbc) is not installed
+    async_engine = None
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    if async_engine is None:
+        raise RuntimeError(f"No async driver installed for {ASYNC_DATABASE_URL.split(':', 1)[0]}")
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,84 @@
+"""
+Fast JSON encoding for the REST list endpoints.
+
+Validating every ORM object into a response schema, and then serialising it
+again through ``response_model``, costs two Pydantic passes per row on top of
+ORM hydration. A RowSerializer checks once, when it is created, that every
+field of the schema maps to a model column of a compatible type. The list
+endpoints then select just those columns with a Core ``select()`` and encode
+the result rows straight to JSON bytes. orjson is used when it is installed,
+otherwise the standard library encoder.
+"""
+import json
+import typing
+from decimal import Decimal
+from typing import Any, Iterable, List, Sequence
+
+from fastapi import Response
+from sqlalchemy import select
+
+from . import metrics, models, schemas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Column Python types each schema type accepts without conversion (Decimal
+# is encoded as a float, which is what the schema would have produced)
+COMPATIBLE_TYPES = {
+    int: (int,),
+    float: (float, int, Decimal),
+    str: (str,),
+}
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _schema_type(annotation):
+    # Optional[X] -> X
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    return args[0] if typing.get_origin(annotation) is typing.Union and len(args) == 1 else annotation
+
+
+class RowSerializer:
+    def __init__(self, schema, model):
+        self.schema = schema
+        self.model = model
+        self.keys: List[str] = []
+        self.columns = []
+        for name, field in schema.model_fields.items():
+            attr = getattr(model, name, None)
+            if attr is None or not hasattr(attr, "type"):
+                raise TypeError(f"{schema.__name__}.{name} has no column on {model.__name__}")
+            expected = _schema_type(field.annotation)
+            if attr.type.python_type not in COMPATIBLE_TYPES.get(expected, ()):
+                raise TypeError(
+                    f"{schema.__name__}.{name} is {expected!r} but the column is {attr.type.python_type!r}"
+                )
+            key = field.alias or name
+            self.keys.append(key)
+            self.columns.append(attr.label(key))
+
+    def select(self):
+        return select(*self.columns)
+
+    def dumps(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        keys = self.keys
+        items = [dict(zip(keys, row)) for row in rows]
+        metrics.add_rows(len(items))
+        if orjson is not None:
+            return orjson.dumps(items, default=_default)
+        return json.dumps(items, default=_default, separators=(",", ":")).encode()
+
+    def response(self, rows: Iterable[Sequence[Any]]) -> Response:
+        return Response(self.dumps(rows), media_type="application/json")
+
+
+OPERATING_BUDGET_JSON = RowSerializer(schemas.OperatingBudget, models.OperatingBudget)
+SUPPLIER_BUDGET_JSON = RowSerializer(schemas.SupplierBudget, models.SupplierBudget)
+CONSTRUCTION_BUDGET_JSON = RowSerializer(schemas.ConstructionBudget, models.ConstructionBudget)
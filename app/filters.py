@@ -0,0 +1,170 @@
+"""
+Filter specs shared by the UI and API routes.
+
+Each spec maps request query params onto SQL ``WHERE`` clauses so that
+filtering happens in the database instead of over hydrated ORM objects:
+
+* ``eq``       - exact match (numeric params are coerced, bad input is ignored)
+* ``prefix``   - ``LIKE 'value%'`` on chartfield codes, which can use the index
+* ``contains`` - case-insensitive ``LIKE '%value%'``, only for free-text columns;
+  narrowed by the trigram index when one is built (see app/textindex.py)
+* ``range``    - ``param`` for an exact amount, ``param_min`` / ``param_max`` for bounds
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from . import indexadvisor, models, textindex
+
+EQ = "eq"
+PREFIX = "prefix"
+CONTAINS = "contains"
+RANGE = "range"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+@dataclass(frozen=True)
+class FilterField:
+    param: str
+    attr: str
+    kind: str
+    cast: Callable[[str], Any] = str
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    model: Any
+    fields: Sequence[FilterField]
+
+    def column(self, field: FilterField):
+        return getattr(self.model, field.attr)
+
+    def sort_column(self, param: Optional[str]):
+        """The column a UI ``sort`` param names, or None if it is not one of the spec's fields."""
+        for field in self.fields:
+            if field.param == param:
+                return self.column(field)
+        return None
+
+    def clauses(self, params: Optional[Mapping[str, str]], bind=None) -> List[Any]:
+        """
+        Compile the non-empty params into a list of SQLAlchemy clauses. With the
+        `bind` the query will run on, contains-searches use its trigram index.
+        """
+        return [clause for _, _, clause in self._compile(params, bind)]
+
+    def active_params(self, params: Optional[Mapping[str, str]]) -> Set[str]:
+        """The spec's params that would contribute a clause for `params`."""
+        return {param for _, param, _ in self._compile(params)}
+
+    def _compile(self, params: Optional[Mapping[str, str]], bind=None) -> Iterator[Tuple[FilterField, str, Any]]:
+        if not params:
+            return
+        for field in self.fields:
+            column = self.column(field)
+            if field.kind == RANGE:
+                for suffix, compare in (
+                    ("", column.__eq__),
+                    ("_min", column.__ge__),
+                    ("_max", column.__le__),
+                ):
+                    value = self._cast(field, params.get(field.param + suffix))
+                    if value is not None:
+                        yield field, field.param + suffix, compare(value)
+                continue
+            value = self._cast(field, params.get(field.param))
+            if value is None:
+                continue
+            if field.kind == EQ:
+                yield field, field.param, column == value
+            elif field.kind == PREFIX:
+                yield field, field.param, column.like(_escape_like(value) + "%", escape="\\")
+            elif field.kind == CONTAINS:
+                clause = column.ilike("%" + _escape_like(value) + "%", escape="\\")
+                yield field, field.param, textindex.contains_clause(bind, self.model, field.attr, value, clause)
+
+    def apply(self, query, params: Optional[Mapping[str, str]], bind=None, sort=None):
+        """
+        Apply the compiled clauses to an ORM query or Core select. The query's
+        shape, with the `sort` column the caller orders by, is recorded for the
+        index advisor.
+        """
+        compiled = list(self._compile(params, bind))
+        self._record(compiled, sort)
+        clauses = [clause for _, _, clause in compiled]
+        if clauses:
+            query = query.filter(*clauses) if hasattr(query, "filter") else query.where(*clauses)
+        return query
+
+    def _record(self, compiled, sort=None) -> None:
+        equality, ranges = set(), set()
+        for field, param, _ in compiled:
+            # A contains-search cannot seek a B-tree, so it does not shape an index
+            if field.kind == EQ or (field.kind == RANGE and param == field.param):
+                equality.add(self.column(field).name)
+            elif field.kind in (PREFIX, RANGE):
+                ranges.add(self.column(field).name)
+        indexadvisor.record(
+            self.model.__tablename__, equality, ranges - equality, sort.name if sort is not None else None
+        )
+
+    @staticmethod
+    def _cast(field: FilterField, raw: Optional[str]):
+        if raw is None:
+            return None
+        raw = raw.strip()
+        if not raw:
+            return None
+        try:
+            return field.cast(raw)
+        except ValueError:
+            return None
+
+
+OPERATING_BUDGET_FILTERS = FilterSpec(
+    models.OperatingBudget,
+    [
+        FilterField("fiscal_year", "fiscal_year", EQ, int),
+        FilterField("fund_code", "fund_code", PREFIX),
+        FilterField("program_code", "program_code", PREFIX),
+        FilterField("account", "account", PREFIX),
+        FilterField("deptid", "deptid", PREFIX),
+        FilterField("operating_unit", "operating_unit", PREFIX),
+        FilterField("class", "class_", PREFIX),
+        FilterField("project_id", "project_id", PREFIX),
+        FilterField("budget_amount", "budget_amount", RANGE, float),
+        FilterField("descr", "descr", CONTAINS),
+    ],
+)
+
+SUPPLIER_BUDGET_FILTERS = FilterSpec(
+    models.SupplierBudget,
+    [
+        FilterField("vendor_id", "vendor_id", PREFIX),
+        FilterField("descr", "descr", CONTAINS),
+        FilterField("fiscal_year", "fiscal_year", PREFIX),
+        FilterField("fund_code", "fund_code", PREFIX),
+        FilterField("program_code", "program_code", PREFIX),
+        FilterField("account", "account", PREFIX),
+        FilterField("deptid", "deptid", PREFIX),
+        FilterField("operating_unit", "operating_unit", PREFIX),
+        FilterField("project_id", "project_id", PREFIX),
+        FilterField("business_unit", "business_unit", PREFIX),
+        FilterField("amount", "amount", RANGE, float),
+    ],
+)
+
+CONSTRUCTION_BUDGET_FILTERS = FilterSpec(
+    models.ConstructionBudget,
+    [
+        FilterField("budget_period", "budget_period", PREFIX),
+        FilterField("fund_code", "fund_code", PREFIX),
+        FilterField("program_code", "program_code", PREFIX),
+        FilterField("project_id", "project_id", PREFIX),
+        FilterField("activity_id", "activity_id", PREFIX),
+        FilterField("line_descr", "line_descr", CONTAINS),
+        FilterField("monetary_amount", "monetary_amount", RANGE, float),
+    ],
+)
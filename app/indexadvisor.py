@@ -0,0 +1,160 @@
+"""
+Index advisor for the budget tables.
+
+FilterSpec.apply records the shape of every list query the routers issue:
+which columns are compared with ``=``, which with a range (prefix ``LIKE`` or
+min/max bounds), and which column the rows are sorted by. ``recommend`` turns
+those patterns into composite indexes using the usual B-tree rule: equality
+columns first, then one range column, or the sort column if there is no
+range. ``report`` compares the recommendations with the indexes that exist
+and lists single-column indexes that another index already leads with.
+
+The patterns are kept in memory per process and served at
+``/diagnostics/indexes``. Set INDEX_ADVISOR=0 to stop recording.
+"""
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import inspect
+
+# Distinct patterns kept; later new shapes are dropped, repeats still count
+MAX_PATTERNS = 1000
+
+
+def enabled() -> bool:
+    return os.getenv("INDEX_ADVISOR", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+@dataclass(frozen=True)
+class QueryPattern:
+    table: str
+    equality: Tuple[str, ...]
+    ranges: Tuple[str, ...]
+    sort: Optional[str] = None
+
+
+PRIMARY_KEY = "PRIMARY KEY"
+
+_lock = threading.Lock()
+_patterns: Counter = Counter()
+
+
+def record(table: str, equality: Iterable[str] = (), ranges: Iterable[str] = (), sort: Optional[str] = None) -> None:
+    """Count one query on `table` (column names, not attribute names)."""
+    if not enabled():
+        return
+    pattern = QueryPattern(table, tuple(sorted(set(equality))), tuple(sorted(set(ranges))), sort)
+    if not (pattern.equality or pattern.ranges or pattern.sort):
+        return
+    with _lock:
+        if pattern in _patterns or len(_patterns) < MAX_PATTERNS:
+            _patterns[pattern] += 1
+
+
+def patterns() -> List[Tuple[QueryPattern, int]]:
+    with _lock:
+        return _patterns.most_common()
+
+
+def reset() -> None:
+    with _lock:
+        _patterns.clear()
+
+
+def _index_columns(pattern: QueryPattern, frequency: Counter) -> Tuple[str, ...]:
+    # Most-filtered columns lead, so patterns on the same table share prefixes
+    def rank(column):
+        return (-frequency[(pattern.table, column)], column)
+
+    columns = sorted(pattern.equality, key=rank)
+    if pattern.ranges:
+        columns.append(sorted(pattern.ranges, key=rank)[0])
+    elif pattern.sort and pattern.sort not in columns:
+        columns.append(pattern.sort)
+    return tuple(columns)
+
+
+def recommend(counted: Optional[Sequence[Tuple[QueryPattern, int]]] = None) -> List[Dict[str, Any]]:
+    """
+    Composite indexes serving the recorded patterns, most-used first. An
+    index whose columns lead another recommendation is folded into it.
+    """
+    counted = patterns() if counted is None else counted
+    frequency: Counter = Counter()
+    for pattern, count in counted:
+        for column in pattern.equality + pattern.ranges:
+            frequency[(pattern.table, column)] += count
+
+    candidates: Counter = Counter()
+    for pattern, count in counted:
+        candidates[(pattern.table, _index_columns(pattern, frequency))] += count
+
+    merged: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+    for (table, columns), count in sorted(candidates.items(), key=lambda item: -len(item[0][1])):
+        wider = next(
+            (key for key in merged if key[0] == table and key[1][:len(columns)] == columns),
+            None,
+        )
+        if wider is not None:
+            merged[wider] += count
+        else:
+            merged[(table, columns)] = count
+    return [
+        {"table": table, "columns": list(columns), "queries": count}
+        for (table, columns), count in sorted(merged.items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+
+def existing_indexes(bind, tables: Iterable[str]) -> Dict[str, Dict[str, List[str]]]:
+    """{table: {index name: columns}}, with the primary key under PRIMARY_KEY."""
+    inspector = inspect(bind)
+    found = {}
+    for table in tables:
+        indexes = {index["name"]: list(index["column_names"]) for index in inspector.get_indexes(table)}
+        pk = inspector.get_pk_constraint(table)
+        if pk.get("constrained_columns"):
+            indexes[PRIMARY_KEY] = list(pk["constrained_columns"])
+        found[table] = indexes
+    return found
+
+
+def _made_redundant(name: str, columns: Sequence[str], other_name: str, other: Sequence[str]) -> bool:
+    """True if index `other` can serve every seek that index `name` can."""
+    if name == PRIMARY_KEY or name == other_name:
+        return False
+    if list(columns) == list(other):
+        # Keep the primary key, or the first of two identical indexes
+        return other_name == PRIMARY_KEY or name > other_name
+    return len(columns) < len(other) and list(other[:len(columns)]) == list(columns)
+
+
+def report(bind, tables: Iterable[str]) -> Dict[str, Any]:
+    tables = list(tables)
+    existing = existing_indexes(bind, tables)
+    recommended = []
+    for item in recommend():
+        indexes = existing.get(item["table"], {})
+        covered_by = next(
+            (name for name, columns in indexes.items()
+             if columns[:len(item["columns"])] == item["columns"]),
+            None,
+        )
+        recommended.append(dict(item, covered_by=covered_by))
+    redundant = [
+        {"table": table, "index": name, "columns": columns, "led_by": other_name}
+        for table, indexes in existing.items()
+        for name, columns in indexes.items()
+        for other_name, other in indexes.items()
+        if _made_redundant(name, columns, other_name, other)
+    ]
+    return {
+        "patterns": [
+            {"table": p.table, "equality": list(p.equality), "ranges": list(p.ranges), "sort": p.sort, "queries": n}
+            for p, n in patterns()
+        ],
+        "recommended": recommended,
+        "redundant": redundant,
+    }
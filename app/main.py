@@ -1,12 +1,27 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app import metrics, profiler, textindex
 from app.database import engine, Base
-from app.routers import budgets, supplier_budgets, construction_budgets
+from app.routers import budgets, supplier_budgets, construction_budgets, diagnostics, exports
+from app.routers import metrics as metrics_routes
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Operating Budget API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the description trigram indexes before serving searches
+    if textindex.enabled():
+        textindex.build(engine)
+    yield
+
+app = FastAPI(title="Operating Budget API", lifespan=lifespan)
+# Latency, SQL and render timings per request (Server-Timing header, /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+# Opt-in sampling profiles of single requests (PROFILE_TOKEN, /diagnostics/profiles)
+app.add_middleware(profiler.ProfilerMiddleware)
 
 # Include HTMX-driven UI routes first so they take precedence over the budgets API
 try:
@@ -21,7 +36,14 @@ except ImportError:
     # Templating dependencies not available; skip UI
     pass
 
+# Exports are registered ahead of the REST routers so /budgets/export is not
+# captured by /budgets/{budget_id}
+app.include_router(exports.router)
+
 # Include the RESTful budgets API
 app.include_router(budgets.router)
 app.include_router(supplier_budgets.router)
 app.include_router(construction_budgets.router)
+
+app.include_router(diagnostics.router)
+app.include_router(metrics_routes.router)
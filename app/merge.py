@@ -0,0 +1,330 @@
+"""
+Merge (upsert) mode for staged bulk uploads.
+
+Instead of appending, a merge matches each staged row to the budget row with
+the same natural key. Matched rows whose other columns differ are updated,
+unmatched rows are inserted and, optionally, budget rows the upload no longer
+contains are deleted. Deletes are limited to the values of the first key
+column present in the upload (the fiscal years or budget periods it covers).
+
+The key defaults to the target's chartfield combination (StageTarget.natural_key)
+and can be overridden per table with ``<TABLE>_MERGE_KEY``, a comma-separated
+list of attribute names, e.g. ``OPERATING_BUDGET_MERGE_KEY=fiscal_year,fund_code,...``.
+Key columns compare NULL equal to NULL.
+
+On SQL Server the merge is a single MERGE statement. Elsewhere it is an
+UPDATE ... FROM, an INSERT ... SELECT and a DELETE in one transaction.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, delete, exists, false, func, insert, or_, select, text, update
+from sqlalchemy.orm import Session, aliased
+
+from . import cache, models, summary, textindex
+from .staging import SAMPLE_SIZE, StagedUpload, StageTarget, claim_upload, discard_upload
+
+MODES = ("append", "merge")
+
+
+@dataclass(frozen=True)
+class MergeChange:
+    action: str
+    # Upload row number (inserts and updates) or budget row id (deletes)
+    row: int
+    key: Tuple[Any, ...]
+    # (attribute, old value, new value) for updates
+    changes: Tuple[Tuple[str, Any, Any], ...] = ()
+
+
+@dataclass
+class MergeDiff:
+    key: Tuple[str, ...]
+    inserts: int = 0
+    updates: int = 0
+    unchanged: int = 0
+    deletes: int = 0
+    delete_missing: bool = False
+    sample: List[MergeChange] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class MergeResult:
+    inserted: int
+    updated: int
+    deleted: int
+
+
+def merge_key(target: StageTarget) -> Tuple[str, ...]:
+    configured = os.getenv(f"{target.model.__tablename__}_MERGE_KEY", "").strip()
+    if not configured:
+        return target.natural_key
+    key = tuple(name.strip() for name in configured.split(",") if name.strip())
+    unknown = [name for name in key if name not in target.data_columns()]
+    if unknown:
+        raise ValueError(f"Unknown merge key column(s) for {target.model.__tablename__}: {', '.join(unknown)}")
+    return key
+
+
+def _same(a, b):
+    return or_(a == b, and_(a.is_(None), b.is_(None)))
+
+
+def _different(a, b):
+    return or_(a != b, and_(a.is_(None), b.isnot(None)), and_(a.isnot(None), b.is_(None)))
+
+
+def _match(key: Sequence[str], left, right):
+    return and_(*[_same(getattr(left, name), getattr(right, name)) for name in key])
+
+
+def _value_columns(target: StageTarget, key: Sequence[str]) -> List[str]:
+    return [name for name in target.data_columns() if name not in key]
+
+
+def _changed(target: StageTarget, key: Sequence[str]):
+    model, stage = target.model, target.stage_model
+    values = _value_columns(target, key)
+    if not values:
+        return false()
+    return or_(*[_different(getattr(model, name), getattr(stage, name)) for name in values])
+
+
+def _staged(stage, token: str):
+    return stage.upload_token == token
+
+
+def _in_scope(target: StageTarget, key: Sequence[str], token: str):
+    """Budget rows whose first key column takes a value present in the upload."""
+    stage, scope = target.stage_model, key[0]
+    return getattr(target.model, scope).in_(select(getattr(stage, scope)).where(_staged(stage, token)).distinct())
+
+
+def _missing(target: StageTarget, key: Sequence[str], token: str):
+    """Budget rows in scope with no staged row for their key (deleted by delete_missing)."""
+    stage = target.stage_model
+    return and_(
+        _in_scope(target, key, token),
+        ~exists().where(_staged(stage, token), _match(key, target.model, stage)),
+    )
+
+
+def duplicate_keys(db: Session, target: StageTarget, token: str, key: Sequence[str]) -> List[dict]:
+    """Errors for staged rows that share their merge key with another staged row."""
+    stage = target.stage_model
+    other = aliased(stage)
+    stmt = (
+        select(stage.row_no)
+        .where(
+            _staged(stage, token),
+            exists().where(_staged(other, token), other.row_no != stage.row_no, _match(key, stage, other)),
+        )
+        .order_by(stage.row_no)
+    )
+    message = f"Another row has the same merge key ({', '.join(key)})"
+    return [{"row": row_no, "field": ",".join(key), "message": message} for row_no in db.execute(stmt).scalars()]
+
+
+def diff(db: Session, target: StageTarget, token: str, delete_missing: bool = False,
+         sample_size: int = SAMPLE_SIZE) -> MergeDiff:
+    """Count (and sample) the inserts, updates and deletes merging a staged upload would make."""
+    model, stage = target.model, target.stage_model
+    key = merge_key(target)
+    matched = exists().where(_match(key, model, stage))
+    changed = exists().where(_match(key, model, stage), _changed(target, key))
+    counts = db.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((matched, 0), else_=1)), 0),
+            func.coalesce(func.sum(case((changed, 1), else_=0)), 0),
+        ).where(_staged(stage, token))
+    ).one()
+    result = MergeDiff(key=key, inserts=counts[1], updates=counts[2], delete_missing=delete_missing)
+    result.unchanged = counts[0] - result.inserts - result.updates
+    if delete_missing:
+        result.deletes = db.execute(select(func.count()).select_from(model).where(_missing(target, key, token))).scalar_one()
+
+    def key_of(row):
+        return tuple(row._mapping[name] for name in key)
+
+    values = _value_columns(target, key)
+    updated = (
+        select(
+            stage.row_no,
+            *[getattr(stage, name).label(name) for name in key],
+            *[getattr(stage, name).label("new_" + name) for name in values],
+            *[getattr(model, name).label("old_" + name) for name in values],
+        )
+        .join(model, and_(_match(key, model, stage), _changed(target, key)))
+        .where(_staged(stage, token))
+        .order_by(stage.row_no)
+        .limit(sample_size)
+    )
+    for row in db.execute(updated):
+        mapping = row._mapping
+        changes = tuple(
+            (name, mapping["old_" + name], mapping["new_" + name])
+            for name in values
+            if mapping["old_" + name] != mapping["new_" + name]
+        )
+        result.sample.append(MergeChange("update", row.row_no, key_of(row), changes))
+    inserted = (
+        select(stage.row_no, *[getattr(stage, name).label(name) for name in key])
+        .where(_staged(stage, token), ~matched)
+        .order_by(stage.row_no)
+        .limit(sample_size)
+    )
+    result.sample.extend(MergeChange("insert", row.row_no, key_of(row)) for row in db.execute(inserted))
+    if delete_missing:
+        deleted = (
+            select(model.id, *[getattr(model, name).label(name) for name in key])
+            .where(_missing(target, key, token))
+            .order_by(model.id)
+            .limit(sample_size)
+        )
+        result.sample.extend(MergeChange("delete", row.id, key_of(row)) for row in db.execute(deleted))
+    return result
+
+
+def preview(db: Session, target: StageTarget, upload: StagedUpload, delete_missing: bool = False) -> None:
+    """
+    Check a staged upload can be merged and attach its diff. Duplicate keys
+    in the upload are reported as errors and the upload is discarded.
+    """
+    if upload.errors:
+        return
+    key = merge_key(target)
+    errors = duplicate_keys(db, target, upload.token, key)
+    if errors:
+        upload.errors.extend(errors)
+        discard_upload(db, target, upload.token)
+        return
+    upload.diff = diff(db, target, upload.token, delete_missing)
+
+
+def _column_names(target: StageTarget, names: Sequence[str]) -> List[str]:
+    return [getattr(target.model, name).property.columns[0].name for name in names]
+
+
+def merge_statement(db: Session, target: StageTarget, key: Sequence[str], delete_missing: bool):
+    """The SQL Server MERGE for a staged upload (bind parameter ``token``)."""
+    quote = db.get_bind().dialect.identifier_preparer.quote
+    table, stage = target.model.__table__, target.stage_model.__table__
+    names = [quote(name) for name in _column_names(target, target.data_columns())]
+    keys = [quote(name) for name in _column_names(target, key)]
+    values = [quote(name) for name in _column_names(target, _value_columns(target, key))]
+    token_column = quote(stage.c.UPLOAD_TOKEN.name)
+    staged = f"SELECT {', '.join(names)} FROM {quote(stage.name)} WHERE {token_column} = :token"
+    on = " AND ".join(f"(t.{name} = s.{name} OR (t.{name} IS NULL AND s.{name} IS NULL))" for name in keys)
+    if delete_missing:
+        # Merging into a CTE limits NOT MATCHED BY SOURCE to the upload's scope;
+        # HOLDLOCK on the base table keeps concurrent merges from inserting the same key
+        scope = keys[0]
+        into = (
+            f"WITH scoped AS (SELECT * FROM {quote(table.name)} WITH (HOLDLOCK) WHERE {scope} IN "
+            f"(SELECT {scope} FROM {quote(stage.name)} WHERE {token_column} = :token)) "
+            "MERGE INTO scoped AS t"
+        )
+    else:
+        into = f"MERGE INTO {quote(table.name)} WITH (HOLDLOCK) AS t"
+    sql = f"{into} USING ({staged}) AS s ON {on}"
+    if values:
+        # EXCEPT compares NULLs as equal
+        sql += (
+            f" WHEN MATCHED AND EXISTS (SELECT {', '.join('s.' + v for v in values)}"
+            f" EXCEPT SELECT {', '.join('t.' + v for v in values)})"
+            f" THEN UPDATE SET {', '.join(f't.{v} = s.{v}' for v in values)}"
+        )
+    sql += f" WHEN NOT MATCHED BY TARGET THEN INSERT ({', '.join(names)}) VALUES ({', '.join('s.' + n for n in names)})"
+    if delete_missing:
+        sql += " WHEN NOT MATCHED BY SOURCE THEN DELETE"
+    id_column = quote(table.c.ID.name)
+    sql += f" OUTPUT $action, inserted.{id_column}, deleted.{id_column};"
+    return text(sql)
+
+
+def _merge_mssql(db: Session, target: StageTarget, token: str, key: Sequence[str], delete_missing: bool):
+    counts = {"INSERT": 0, "UPDATE": 0, "DELETE": 0}
+    deleted_ids = []
+    for action, _, deleted_id in db.execute(merge_statement(db, target, key, delete_missing), {"token": token}):
+        counts[action] += 1
+        if action == "DELETE":
+            deleted_ids.append(deleted_id)
+    return MergeResult(counts["INSERT"], counts["UPDATE"], counts["DELETE"]), deleted_ids
+
+
+def _merge_portable(db: Session, target: StageTarget, token: str, key: Sequence[str], delete_missing: bool):
+    model, stage = target.model, target.stage_model
+    table = model.__table__
+    columns = {name: getattr(model, name).property.columns[0] for name in target.data_columns()}
+    deleted, deleted_ids = 0, []
+    if delete_missing:
+        deleted_ids = db.execute(select(model.id).where(_missing(target, key, token))).scalars().all()
+    values = _value_columns(target, key)
+    updated = 0
+    if values:
+        # Rows that differ only outside the key; unchanged rows are left alone
+        stmt = (
+            update(table)
+            .where(_staged(stage, token), _match(key, model, stage), _changed(target, key))
+            .values({columns[name]: getattr(stage, name) for name in values})
+        )
+        updated = db.execute(stmt).rowcount
+    new_rows = (
+        select(*[getattr(stage, name) for name in columns])
+        .where(_staged(stage, token), ~exists().where(_match(key, model, stage)))
+        .order_by(stage.row_no)
+    )
+    inserted = db.execute(insert(table).from_select(list(columns.values()), new_rows)).rowcount
+    if deleted_ids:
+        deleted = db.execute(delete(table).where(_missing(target, key, token))).rowcount
+    return MergeResult(inserted, updated, deleted), deleted_ids
+
+
+def merge_upload(db: Session, target: StageTarget, token: str, delete_missing: bool = False) -> Optional[MergeResult]:
+    """
+    Merge a staged upload into its budget table and drop the staged rows.
+    Returns None for an unknown token.
+    """
+    model, stage = target.model, target.stage_model
+    key = merge_key(target)
+    text_column = getattr(model, textindex.TEXT_COLUMNS[model])
+    indexed = textindex.is_indexed(db, model)
+    try:
+        token = claim_upload(db, target, token)
+        if token is None:
+            db.rollback()
+            return None
+        if duplicate_keys(db, target, token, key):
+            # Only possible for an upload that was previewed in append mode
+            raise ValueError("The upload has rows with the same merge key")
+        years = set()
+        if model is models.OperatingBudget:
+            # Summary groups of the upload's years, and of any row it moves or deletes
+            years = set(db.execute(select(stage.fiscal_year).where(_staged(stage, token)).distinct()).scalars())
+            touched = exists().where(_staged(stage, token), _match(key, model, stage))
+            if delete_missing:
+                touched = or_(touched, _missing(target, key, token))
+            years |= set(db.execute(select(model.fiscal_year).where(touched).distinct()).scalars())
+        if db.get_bind().dialect.name == "mssql":
+            result, deleted_ids = _merge_mssql(db, target, token, key, delete_missing)
+        else:
+            result, deleted_ids = _merge_portable(db, target, token, key, delete_missing)
+        pairs = []
+        if indexed:
+            merged = exists().where(_staged(stage, token), _match(key, model, stage))
+            pairs = db.execute(select(model.id, text_column).where(merged)).all()
+        if years:
+            summary.refresh_fiscal_years(db, years)
+        db.execute(delete(stage).where(_staged(stage, token)))
+        if result.inserted or result.updated or result.deleted:
+            cache.bump(db, model)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if indexed:
+        textindex.forget(db, model, deleted_ids)
+        textindex.record_pairs(db, model, pairs)
+    return result
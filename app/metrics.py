@@ -0,0 +1,284 @@
+"""
+Per-request timing and SQL instrumentation.
+
+MetricsMiddleware gives each request a RequestMetrics in a context variable.
+The engine hooks (instrument_engine, installed by app/database.py) add
+every statement's count and time to it. ORM instance loads and Core rows
+encoded by the JSON list path add to its row count, and instrumented Jinja
+environments add template render time. When the response starts, the
+totals so far go out in a ``Server-Timing`` header. When it finishes, they
+are folded into per-route counters and a latency histogram, served in the
+Prometheus text format at ``/metrics``.
+
+Set METRICS=0 to turn collection off.
+"""
+import contextvars
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+try:
+    import jinja2
+except ImportError:
+    # No UI, so no templates to time
+    jinja2 = None
+
+# Request latency histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def enabled() -> bool:
+    return os.getenv("METRICS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+@dataclass
+class RequestMetrics:
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    rows: int = 0
+    render_seconds: float = 0.0
+
+    def server_timing(self, elapsed: float) -> str:
+        return ", ".join([
+            f'sql;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} statements"',
+            f'rows;desc="{self.rows}"',
+            f"render;dur={self.render_seconds * 1000:.2f}",
+            f"app;dur={elapsed * 1000:.2f}",
+        ])
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def add_rows(count: int) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.rows += count
+
+
+# Process-wide aggregates
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    seconds: float = 0.0
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    rows: int = 0
+    render_seconds: float = 0.0
+
+    def __post_init__(self):
+        self.buckets = [0] * len(BUCKETS)
+
+
+_lock = threading.Lock()
+_routes: Dict[Tuple[str, str, str, str], RouteStats] = defaultdict(RouteStats)
+_templates: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+
+
+def _observe(key: Tuple[str, str, str, str], elapsed: float, metrics: RequestMetrics) -> None:
+    with _lock:
+        stats = _routes[key]
+        stats.requests += 1
+        stats.seconds += elapsed
+        stats.sql_count += metrics.sql_count
+        stats.sql_seconds += metrics.sql_seconds
+        stats.rows += metrics.rows
+        stats.render_seconds += metrics.render_seconds
+        for i, bound in enumerate(BUCKETS):
+            if elapsed <= bound:
+                stats.buckets[i] += 1
+
+
+def reset() -> None:
+    with _lock:
+        _routes.clear()
+        _templates.clear()
+
+
+# SQLAlchemy hooks
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current.get()
+    started = conn.info.get("metrics_started")
+    if metrics is None or not started:
+        return
+    metrics.sql_count += 1
+    metrics.sql_seconds += time.perf_counter() - started.pop()
+    # rowcount is only meaningful for DML; SELECT rows are counted as loaded
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete) and cursor.rowcount > 0:
+        metrics.rows += cursor.rowcount
+
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run on `engine` (a sync Engine)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _on_load(target, context):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.rows += 1
+
+
+def instrument_orm(base) -> None:
+    """Count ORM instances loaded for every class mapped from `base`."""
+    event.listen(base, "load", _on_load, propagate=True)
+
+
+# Jinja hooks
+
+if jinja2 is not None:
+    class TimedTemplate(jinja2.Template):
+        """Template that adds its render time to the request and template totals."""
+
+        def _record(self, seconds: float) -> None:
+            metrics = _current.get()
+            if metrics is not None:
+                metrics.render_seconds += seconds
+            with _lock:
+                totals = _templates[self.name or "<string>"]
+                totals[0] += 1
+                totals[1] += seconds
+
+        def render(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return super().render(*args, **kwargs)
+            finally:
+                self._record(time.perf_counter() - started)
+
+        def generate(self, *args, **kwargs):
+            # Streamed renders: only time spent producing output counts, not
+            # time waiting for the client to take it
+            spent = 0.0
+            chunks = super().generate(*args, **kwargs)
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        spent += time.perf_counter() - started
+                        return
+                    spent += time.perf_counter() - started
+                    yield chunk
+            finally:
+                self._record(spent)
+
+
+def instrument_templates(templates) -> None:
+    """Time renders for a Jinja2Templates (must be called before templates load)."""
+    templates.env.template_class = TimedTemplate
+
+
+# ASGI middleware
+
+def _route_labels(scope) -> Tuple[str, str]:
+    route = scope.get("route")
+    if route is None:
+        return "<unmatched>", "<unmatched>"
+    endpoint = getattr(route, "endpoint", None)
+    if endpoint is None:
+        return getattr(route, "path", "<unmatched>"), "<unmatched>"
+    module = endpoint.__module__.rsplit(".", 1)[-1]
+    return route.path, f"{module}.{endpoint.__name__}"
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", metrics.server_timing(time.perf_counter() - started).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            path, handler = _route_labels(scope)
+            _observe((scope["method"], path, handler, str(status)), time.perf_counter() - started, metrics)
+
+
+# Prometheus text exposition
+
+def _labels(**labels: str) -> str:
+    body = ",".join(
+        '%s="%s"' % (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + body + "}"
+
+
+def render() -> str:
+    with _lock:
+        routes = [(key, stats, list(stats.buckets)) for key, stats in sorted(_routes.items())]
+        templates = sorted((name, tuple(totals)) for name, totals in _templates.items())
+
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    for (method, path, handler, status), stats, buckets in routes:
+        labels = dict(method=method, route=path, handler=handler, status=status)
+        for bound, count in zip(BUCKETS, buckets):
+            lines.append(f"http_request_duration_seconds_bucket{_labels(**labels, le=repr(bound))} {count}")
+        lines.append(f'http_request_duration_seconds_bucket{_labels(**labels, le="+Inf")} {stats.requests}')
+        lines.append(f"http_request_duration_seconds_sum{_labels(**labels)} {stats.seconds:.6f}")
+        lines.append(f"http_request_duration_seconds_count{_labels(**labels)} {stats.requests}")
+
+    counters = [
+        ("app_sql_statements_total", "SQL statements executed, by route.", "sql_count", "{}"),
+        ("app_sql_seconds_total", "Time spent executing SQL, by route.", "sql_seconds", "{:.6f}"),
+        ("app_rows_total", "ORM rows loaded, Core rows encoded and DML rows affected, by route.", "rows", "{}"),
+        ("app_template_render_seconds_total", "Jinja render time, by route.", "render_seconds", "{:.6f}"),
+    ]
+    for name, help_text, attr, fmt in counters:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, path, handler, status), stats, _ in routes:
+            value = fmt.format(getattr(stats, attr))
+            lines.append(f"{name}{_labels(method=method, route=path, handler=handler, status=status)} {value}")
+
+    lines += [
+        "# HELP app_template_renders_total Renders per template.",
+        "# TYPE app_template_renders_total counter",
+    ]
+    lines += [f"app_template_renders_total{_labels(template=name)} {count}" for name, (count, _) in templates]
+    lines += [
+        "# HELP app_template_seconds_total Render time per template.",
+        "# TYPE app_template_seconds_total counter",
+    ]
+    lines += [f"app_template_seconds_total{_labels(template=name)} {seconds:.6f}" for name, (_, seconds) in templates]
+    return "\n".join(lines) + "\n"
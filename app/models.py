@@ -1,47 +1,158 @@
-from sqlalchemy import Column, Integer, String, Float, Numeric
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Float, Numeric
 
 from .database import Base
 
+# Indexes follow the query patterns recorded by app/indexadvisor.py: one
+# composite per common filter path instead of a B-tree per column, so bulk
+# loads maintain fewer indexes. See migration f1a3c5e7b9d2.
+
 class OperatingBudget(Base):
     __tablename__ = "OPERATING_BUDGET"
+    __table_args__ = (
+        # Latest-year view, summary refreshes and FY + chartfield filters
+        Index("ix_OPERATING_BUDGET_FY_FUND_PROGRAM_DEPT", "FISCAL_YEAR", "FUND_CODE", "PROGRAM_CODE", "DEPTID"),
+        Index("ix_OPERATING_BUDGET_FUND_PROGRAM", "FUND_CODE", "PROGRAM_CODE"),
+    )
 
-    id = Column("ID", Integer, primary_key=True, index=True)
-    fiscal_year = Column("FISCAL_YEAR", Integer, index=True)
-    fund_code = Column("FUND_CODE", String, index=True)
-    program_code = Column("PROGRAM_CODE", String, index=True)
+    id = Column("ID", Integer, primary_key=True)
+    fiscal_year = Column("FISCAL_YEAR", Integer)
+    fund_code = Column("FUND_CODE", String)
+    program_code = Column("PROGRAM_CODE", String)
     account = Column("ACCOUNT", String, index=True)
     deptid = Column("DEPTID", String, index=True)
-    operating_unit = Column("OPERATING_UNIT", String, index=True)
-    class_ = Column("CLASS", String, index=True)
+    operating_unit = Column("OPERATING_UNIT", String)
+    class_ = Column("CLASS", String)
     project_id = Column("PROJECT_ID", String, index=True)
     budget_amount = Column("BUDGET_AMOUNT", Float)
-    descr = Column("DESCR", String, index=True)
+    descr = Column("DESCR", String)
 
 class SupplierBudget(Base):
     __tablename__ = "SUPPLIER_BUDGET"
+    __table_args__ = (
+        Index("ix_SUPPLIER_BUDGET_FY_FUND_PROGRAM", "FISCAL_YEAR", "FUND_CODE", "PROGRAM_CODE"),
+        Index("ix_SUPPLIER_BUDGET_FUND_PROGRAM", "FUND_CODE", "PROGRAM_CODE"),
+    )
 
-    id = Column("ID", Integer, primary_key=True, index=True)
+    id = Column("ID", Integer, primary_key=True)
     vendor_id = Column("VENDOR_ID", String(15), nullable=True)
     descr = Column("DESCR", String(120), nullable=True)
-    fiscal_year = Column("FISCAL_YEAR", String(4), nullable=True, index=True)
-    fund_code = Column("FUND_CODE", String(4), nullable=True, index=True)
-    program_code = Column("PROGRAM_CODE", String(4), nullable=True, index=True)
+    fiscal_year = Column("FISCAL_YEAR", String(4), nullable=True)
+    fund_code = Column("FUND_CODE", String(4), nullable=True)
+    program_code = Column("PROGRAM_CODE", String(4), nullable=True)
     account = Column("ACCOUNT", String(10), nullable=True, index=True)
-    operating_unit = Column("OPERATING_UNIT", String(4), nullable=True, index=True)
+    operating_unit = Column("OPERATING_UNIT", String(4), nullable=True)
     deptid = Column("DEPTID", String(10), nullable=True, index=True)
     project_id = Column("PROJECT_ID", String(26), nullable=True, index=True)
-    business_unit = Column("BUSINESS_UNIT", String(5), nullable=True, index=True)
+    business_unit = Column("BUSINESS_UNIT", String(5), nullable=True)
     amount = Column("AMOUNT", Numeric(10, 2), nullable=True)
 
 class ConstructionBudget(Base):
     __tablename__ = "CONSTRUCTION_BUDGET"
+    __table_args__ = (
+        Index("ix_CONSTRUCTION_BUDGET_PERIOD_FUND_PROGRAM", "BUDGET_PERIOD", "FUND_CODE", "PROGRAM_CODE"),
+        Index("ix_CONSTRUCTION_BUDGET_FUND_PROGRAM", "FUND_CODE", "PROGRAM_CODE"),
+        Index("ix_CONSTRUCTION_BUDGET_PROJECT_ACTIVITY", "PROJECT_ID", "ACTIVITY_ID"),
+    )
 
-    id = Column("ID", Integer, primary_key=True, index=True)
-    budget_period = Column("BUDGET_PERIOD", String(4), nullable=True, index=True)
-    fund_code = Column("FUND_CODE", String(4), nullable=True, index=True)
-    program_code = Column("PROGRAM_CODE", String(4), nullable=True, index=True)
-    project_id = Column("PROJECT_ID", String(26), nullable=True, index=True)
-    activity_id = Column("ACTIVITY_ID", String(20), nullable=True, index=True)
+    id = Column("ID", Integer, primary_key=True)
+    budget_period = Column("BUDGET_PERIOD", String(4), nullable=True)
+    fund_code = Column("FUND_CODE", String(4), nullable=True)
+    program_code = Column("PROGRAM_CODE", String(4), nullable=True)
+    project_id = Column("PROJECT_ID", String(26), nullable=True)
+    activity_id = Column("ACTIVITY_ID", String(20), nullable=True)
+    line_descr = Column("LINE_DESCR", String(255), nullable=True)
+    monetary_amount = Column("MONETARY_AMOUNT", Numeric(18, 2), nullable=True)
+
+
+class OperatingBudgetSummary(Base):
+    """
+    Totals per (fiscal_year, fund_code, program_code, deptid), kept current by
+    delta adjustments from every write path. See app/summary.py.
+    """
+    __tablename__ = "OPERATING_BUDGET_SUMMARY"
+    __table_args__ = (
+        Index(
+            "ux_OPERATING_BUDGET_SUMMARY_KEY",
+            "FISCAL_YEAR", "FUND_CODE", "PROGRAM_CODE", "DEPTID",
+            unique=True,
+        ),
+    )
+
+    id = Column("ID", Integer, primary_key=True)
+    fiscal_year = Column("FISCAL_YEAR", Integer, nullable=False)
+    fund_code = Column("FUND_CODE", String(30), nullable=False)
+    program_code = Column("PROGRAM_CODE", String(30), nullable=False)
+    deptid = Column("DEPTID", String(30), nullable=False)
+    budget_amount = Column("BUDGET_AMOUNT", Float, nullable=False, default=0)
+    row_count = Column("ROW_COUNT", Integer, nullable=False, default=0)
+
+
+class BudgetTableVersion(Base):
+    """
+    Per-table change counter, bumped by every write path in the same
+    transaction as the write. Cached query results are keyed on it, so all
+    workers see an invalidation as soon as the write commits. See app/cache.py.
+    """
+    __tablename__ = "BUDGET_TABLE_VERSION"
+
+    table_name = Column("TABLE_NAME", String(64), primary_key=True)
+    version = Column("VERSION", Integer, nullable=False, default=0)
+
+
+# Bulk-upload staging tables. A preview parses and validates a workbook into
+# the stage table for its target under a random UPLOAD_TOKEN; confirming the
+# upload copies those rows into the target table with INSERT ... SELECT.
+
+class OperatingBudgetStage(Base):
+    __tablename__ = "OPERATING_BUDGET_STAGE"
+
+    id = Column("ID", Integer, primary_key=True)
+    upload_token = Column("UPLOAD_TOKEN", String(32), nullable=False, index=True)
+    row_no = Column("ROW_NO", Integer, nullable=False)
+    created_at = Column("CREATED_AT", DateTime, nullable=False, default=datetime.utcnow)
+    fiscal_year = Column("FISCAL_YEAR", Integer)
+    fund_code = Column("FUND_CODE", String)
+    program_code = Column("PROGRAM_CODE", String)
+    account = Column("ACCOUNT", String)
+    deptid = Column("DEPTID", String)
+    operating_unit = Column("OPERATING_UNIT", String)
+    class_ = Column("CLASS", String)
+    project_id = Column("PROJECT_ID", String)
+    budget_amount = Column("BUDGET_AMOUNT", Float)
+    descr = Column("DESCR", String)
+
+class SupplierBudgetStage(Base):
+    __tablename__ = "SUPPLIER_BUDGET_STAGE"
+
+    id = Column("ID", Integer, primary_key=True)
+    upload_token = Column("UPLOAD_TOKEN", String(32), nullable=False, index=True)
+    row_no = Column("ROW_NO", Integer, nullable=False)
+    created_at = Column("CREATED_AT", DateTime, nullable=False, default=datetime.utcnow)
+    vendor_id = Column("VENDOR_ID", String(15), nullable=True)
+    descr = Column("DESCR", String(120), nullable=True)
+    fiscal_year = Column("FISCAL_YEAR", String(4), nullable=True)
+    fund_code = Column("FUND_CODE", String(4), nullable=True)
+    program_code = Column("PROGRAM_CODE", String(4), nullable=True)
+    account = Column("ACCOUNT", String(10), nullable=True)
+    operating_unit = Column("OPERATING_UNIT", String(4), nullable=True)
+    deptid = Column("DEPTID", String(10), nullable=True)
+    project_id = Column("PROJECT_ID", String(26), nullable=True)
+    business_unit = Column("BUSINESS_UNIT", String(5), nullable=True)
+    amount = Column("AMOUNT", Numeric(10, 2), nullable=True)
+
+class ConstructionBudgetStage(Base):
+    __tablename__ = "CONSTRUCTION_BUDGET_STAGE"
+
+    id = Column("ID", Integer, primary_key=True)
+    upload_token = Column("UPLOAD_TOKEN", String(32), nullable=False, index=True)
+    row_no = Column("ROW_NO", Integer, nullable=False)
+    created_at = Column("CREATED_AT", DateTime, nullable=False, default=datetime.utcnow)
+    budget_period = Column("BUDGET_PERIOD", String(4), nullable=True)
+    fund_code = Column("FUND_CODE", String(4), nullable=True)
+    program_code = Column("PROGRAM_CODE", String(4), nullable=True)
+    project_id = Column("PROJECT_ID", String(26), nullable=True)
+    activity_id = Column("ACTIVITY_ID", String(20), nullable=True)
     line_descr = Column("LINE_DESCR", String(255), nullable=True)
     monetary_amount = Column("MONETARY_AMOUNT", Numeric(18, 2), nullable=True)
-    
\ No newline at end of file
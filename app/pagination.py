@@ -0,0 +1,172 @@
+"""
+Keyset pagination helpers for the list endpoints.
+
+Cursors are opaque to clients: a URL-safe base64 encoding of the JSON list of
+key values of the last row on a page.  Fetching the next page is then an
+indexed ``WHERE ID > :last_id`` seek instead of an ever-growing ``OFFSET``.
+
+The UI tables load in pages of UI_PAGE_SIZE rows (see keyset_page), optionally
+sorted by a column: the cursor then carries the sort value and id of the last
+row, so every page is an index seek however deep the user scrolls.
+"""
+import base64
+import json
+import os
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select, text
+from sqlalchemy.orm import Session
+
+# Dialect-specific queries that read the row count from catalog metadata
+# instead of scanning the table.  They take the table name as ``:table``.
+FAST_ROW_COUNT_SQL = {
+    "mssql": (
+        "SELECT SUM(p.rows) FROM sys.partitions p "
+        "WHERE p.object_id = OBJECT_ID(:table) AND p.index_id IN (0, 1)"
+    ),
+    "postgresql": "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(quote_ident(:table))",
+    "mysql": (
+        "SELECT table_rows FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = :table"
+    ),
+}
+
+# 0 renders whole results, streamed (see app/streaming.py)
+UI_PAGE_SIZE = int(os.getenv("UI_PAGE_SIZE", "100"))
+# Rows fetched per round trip when streaming a whole result
+STREAM_YIELD_PER = 1000
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    """Decode a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Decode a cursor over ``ID`` into the last seen id."""
+    if cursor is None:
+        return None
+    try:
+        return int(decode_cursor(cursor)[-1])
+    except (TypeError, ValueError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def next_id_cursor(rows: Sequence[Any], limit: Optional[int]) -> Optional[str]:
+    """Return the cursor for the page after `rows`, or None if this was the last page."""
+    if not rows or limit is None or len(rows) < limit:
+        return None
+    return encode_cursor([rows[-1].id])
+
+
+def estimate_row_count(db: Session, model) -> int:
+    """
+    Total rows in a model's table, read from the dialect's catalog metadata where
+    available (sys.partitions on SQL Server) and falling back to COUNT(*).
+    """
+    sql = FAST_ROW_COUNT_SQL.get(db.get_bind().dialect.name)
+    if sql is not None:
+        count = db.execute(text(sql), {"table": model.__tablename__}).scalar()
+        if count is not None and count >= 0:
+            return int(count)
+    return db.execute(select(func.count()).select_from(model)).scalar_one()
+
+
+def set_page_headers(request, response, rows: Sequence[Any], limit: Optional[int], total: Optional[int] = None) -> None:
+    """Advertise the next page cursor (and optional total) on a list response."""
+    cursor = next_id_cursor(rows, limit)
+    if cursor is not None:
+        response.headers["X-Next-Cursor"] = cursor
+        next_url = request.url.remove_query_params("skip").include_query_params(cursor=cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    if total is not None:
+        response.headers["X-Total-Count"] = str(total)
+
+
+@dataclass(frozen=True)
+class Page:
+    rows: List[Any]
+    next_cursor: Optional[str]
+
+
+def parse_sort(raw: Optional[str]) -> Tuple[Optional[str], bool]:
+    """Split a ``sort`` param (``fund_code``, or ``-fund_code`` for descending) into (param, descending)."""
+    raw = (raw or "").strip()
+    descending = raw.startswith("-")
+    return raw.lstrip("-") or None, descending
+
+
+def _after(column, id_column, value, last_id: int, descending: bool):
+    # Rows past (value, last_id) in ORDER BY column, ID. NULLs sort lowest, as
+    # they do by default on SQL Server and SQLite
+    if descending:
+        if value is None:
+            return and_(column.is_(None), id_column < last_id)
+        return or_(column < value, and_(column == value, id_column < last_id), column.is_(None))
+    if value is None:
+        return or_(and_(column.is_(None), id_column > last_id), column.isnot(None))
+    return or_(column > value, and_(column == value, id_column > last_id))
+
+
+def keyset_query(query, model, column=None, descending: bool = False, cursor: Optional[str] = None):
+    """
+    `query` ordered by `column` (then ID), or by ID alone, and continued past
+    `cursor`. A malformed cursor raises ValueError.
+    """
+    id_column = model.id
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != (1 if column is None else 2):
+            raise ValueError("Invalid cursor")
+        try:
+            last_id = int(values[-1])
+            value = values[0] if column is not None else None
+            if value is not None:
+                value = column.type.python_type(value)
+        except (ArithmeticError, TypeError, ValueError) as exc:
+            raise ValueError("Invalid cursor") from exc
+        if column is None:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            query = query.filter(_after(column, id_column, value, last_id, descending))
+
+    if column is None:
+        return query.order_by(id_column.desc() if descending else id_column)
+    if descending:
+        return query.order_by(column.desc(), id_column.desc())
+    return query.order_by(column, id_column)
+
+
+def keyset_page(query, model, column=None, descending: bool = False,
+                cursor: Optional[str] = None, limit: int = UI_PAGE_SIZE) -> Page:
+    """One page of keyset_query(...), with the cursor for the page after it."""
+    # One extra row tells us whether there is a next page
+    rows = keyset_query(query, model, column, descending, cursor).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return Page(rows, None)
+    rows = rows[:limit]
+    last = rows[-1]
+    key = [last.id] if column is None else [getattr(last, column.key), last.id]
+    return Page(rows, encode_cursor(key))
+
+
+def next_page_url(request, params, cursor: Optional[str]) -> Optional[str]:
+    """URL of the page after this one, keeping the filters and sort in `params`."""
+    if cursor is None:
+        return None
+    query = dict(params)
+    query["cursor"] = cursor
+    return str(request.url.replace_query_params(**query))
@@ -0,0 +1,301 @@
+"""
+On-demand request profiling.
+
+A request carrying the PROFILE_TOKEN secret, in an ``X-Profile`` header or a
+``_profile`` query parameter, is run under a sampling profiler with
+tracemalloc tracking its peak memory. Profiling is off unless PROFILE_TOKEN is
+set, and only one request is profiled at a time.
+
+The sampler is a background thread that reads ``sys._current_frames()`` every
+PROFILE_INTERVAL seconds and keeps the stacks running the matched route's
+handler. That captures sync handlers in their worker thread as well as async
+ones on the event loop, and leaves other requests' work out. Ticks where the
+handler is not on any stack are counted as ``(outside handler)``: routing,
+body parsing, awaiting I/O, or streaming the response.
+
+Each profile is written to PROFILE_DIR as collapsed stacks (the input format
+of flamegraph.pl and speedscope) plus a JSON summary. The newest PROFILE_KEEP
+profiles are kept, and they are served from ``/diagnostics/profiles``. The
+same token guards every ``/diagnostics`` route.
+"""
+import hmac
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+PROFILE_HEADER = "x-profile"
+PROFILE_PARAM = "_profile"
+PROFILES_PATH = "/diagnostics/profiles"
+# The diagnostics routes take the same token but are never themselves profiled
+DIAGNOSTICS_PATH = "/diagnostics/"
+OUTSIDE_HANDLER = "(outside handler)"
+
+
+def token() -> str:
+    return os.getenv("PROFILE_TOKEN", "")
+
+
+def enabled() -> bool:
+    return bool(token())
+
+
+def profile_dir() -> str:
+    return os.getenv("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "operating-budget-profiles")
+
+
+def _interval() -> float:
+    return float(os.getenv("PROFILE_INTERVAL", "0.002"))
+
+
+def _keep() -> int:
+    return int(os.getenv("PROFILE_KEEP", "20"))
+
+
+def authorized(supplied: Optional[str]) -> bool:
+    secret = token()
+    return bool(secret and supplied) and hmac.compare_digest(supplied.encode(), secret.encode())
+
+
+# Sampling
+
+def _frame_label(code) -> str:
+    parts = code.co_filename.replace("\\", "/").rsplit("/", 2)
+    return f"{code.co_name} ({'/'.join(parts[-2:])}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Collects the stacks of whichever thread is running `scope`'s route handler."""
+
+    def __init__(self, scope, interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.scope = scope
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def _handler_code(self):
+        route = self.scope.get("route")
+        endpoint = getattr(route, "endpoint", None)
+        return getattr(endpoint, "__code__", None)
+
+    def _sample(self, handler) -> None:
+        me = threading.get_ident()
+        found = False
+        if handler is not None:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    if frame.f_code is handler:
+                        break
+                    frame = frame.f_back
+                if frame is None:
+                    continue
+                self.stacks[";".join(_frame_label(code) for code in reversed(stack))] += 1
+                found = True
+        if not found:
+            self.stacks[OUTSIDE_HANDLER] += 1
+        self.samples += 1
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self._sample(self._handler_code())
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+# Artefacts
+
+@dataclass
+class Profile:
+    id: str
+    method: str
+    path: str
+    query: str
+    handler: str
+    status: int
+    started: float
+    seconds: float
+    samples: int
+    interval: float
+    peak_memory_bytes: int
+    # Self samples per frame, most frequent first
+    top: List[Tuple[str, int]] = field(default_factory=list)
+
+
+def _top_frames(stacks: Counter, limit: int = 15) -> List[Tuple[str, int]]:
+    leaves: Counter = Counter()
+    for stack, count in stacks.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return leaves.most_common(limit)
+
+
+def _paths(profile_id: str) -> Tuple[str, str]:
+    base = os.path.join(profile_dir(), profile_id)
+    return base + ".json", base + ".collapsed"
+
+
+def save(profile: Profile, stacks: Counter) -> None:
+    os.makedirs(profile_dir(), exist_ok=True)
+    summary_path, stacks_path = _paths(profile.id)
+    with open(stacks_path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(asdict(profile), f, indent=2)
+    _prune()
+
+
+def _prune() -> None:
+    for profile in list_profiles()[_keep():]:
+        for path in _paths(profile["id"]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """Saved profile summaries, newest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in os.listdir(directory):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda profile: profile["started"], reverse=True)
+
+
+def _valid_id(profile_id: str) -> bool:
+    try:
+        return uuid.UUID(profile_id).hex == profile_id
+    except ValueError:
+        return False
+
+
+def summary_path(profile_id: str) -> Optional[str]:
+    path = _paths(profile_id)[0] if _valid_id(profile_id) else None
+    return path if path and os.path.exists(path) else None
+
+
+def stacks_path(profile_id: str) -> Optional[str]:
+    path = _paths(profile_id)[1] if _valid_id(profile_id) else None
+    return path if path and os.path.exists(path) else None
+
+
+# ASGI middleware
+
+def _requested(scope) -> Tuple[Optional[str], bytes]:
+    """The supplied token, if any, and the query string without the profile parameter."""
+    supplied = None
+    for name, value in scope.get("headers", []):
+        if name == PROFILE_HEADER.encode():
+            supplied = value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if PROFILE_PARAM.encode() in query:
+        pairs = parse_qsl(query.decode("latin-1"), keep_blank_values=True)
+        kept = [(name, value) for name, value in pairs if name != PROFILE_PARAM]
+        supplied = next((value for name, value in pairs if name == PROFILE_PARAM), supplied)
+        # Keep the token out of filters, cache keys and next-page links
+        query = urlencode(kept).encode("latin-1")
+    return supplied, query
+
+
+class ProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled() or scope["path"].startswith(DIAGNOSTICS_PATH):
+            await self.app(scope, receive, send)
+            return
+        supplied, query = _requested(scope)
+        if supplied is None:
+            await self.app(scope, receive, send)
+            return
+        scope = dict(scope, query_string=query)
+        if not authorized(supplied):
+            await self.app(scope, receive, send)
+            return
+        if not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def _with_headers(send, extra):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + extra)
+            await send(message)
+        return wrapped
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        headers = [
+            (b"x-profile-id", profile_id.encode()),
+            (b"x-profile-url", f"{PROFILES_PATH}/{profile_id}".encode()),
+        ]
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        sampler = StackSampler(scope, _interval())
+        started, wall = time.perf_counter(), time.time()
+        sampler.start()
+        try:
+            await self.app(scope, receive, self._with_headers(send_status, headers))
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            if started_tracing:
+                tracemalloc.stop()
+            route = scope.get("route")
+            endpoint = getattr(route, "endpoint", None)
+            profile = Profile(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                query=scope["query_string"].decode("latin-1"),
+                handler=f"{endpoint.__module__}.{endpoint.__qualname__}" if endpoint else "",
+                status=status,
+                started=wall,
+                seconds=round(elapsed, 6),
+                samples=sampler.samples,
+                interval=sampler.interval,
+                peak_memory_bytes=peak,
+                top=_top_frames(sampler.stacks),
+            )
+            save(profile, sampler.stacks)
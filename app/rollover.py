@@ -0,0 +1,150 @@
+"""
+Fiscal-year rollover: copy a year's budget rows, or a filtered subset of them,
+into another year inside the database.
+
+The copy is one ``INSERT ... SELECT``. The target year is a literal in the
+select list, and amounts can be adjusted on the way with a CASE expression.
+Each adjustment matches a fund and/or program code and applies a percentage
+and then a flat amount, rounded to cents. The first matching adjustment wins,
+and rows that match none are copied unchanged. Rows never pass through Python,
+so the time is the database's insert time whatever the year's size.
+
+A target year that already has rows in scope is refused unless `replace` is
+set, in which case those rows are deleted in the same transaction.
+"""
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional, Sequence
+
+from sqlalchemy import String, and_, case, delete, func, insert, literal, or_, select, true
+from sqlalchemy.orm import Session
+
+from . import cache, models, schemas, summary, textindex
+from .filters import CONSTRUCTION_BUDGET_FILTERS, OPERATING_BUDGET_FILTERS, SUPPLIER_BUDGET_FILTERS, FilterSpec
+
+
+@dataclass(frozen=True)
+class RolloverTarget:
+    model: Any
+    spec: FilterSpec
+    # The year column and the amount column adjustments apply to
+    year_attr: str
+    amount_attr: str
+
+
+OPERATING_BUDGET_ROLLOVER = RolloverTarget(models.OperatingBudget, OPERATING_BUDGET_FILTERS, "fiscal_year", "budget_amount")
+SUPPLIER_BUDGET_ROLLOVER = RolloverTarget(models.SupplierBudget, SUPPLIER_BUDGET_FILTERS, "fiscal_year", "amount")
+CONSTRUCTION_BUDGET_ROLLOVER = RolloverTarget(models.ConstructionBudget, CONSTRUCTION_BUDGET_FILTERS, "budget_period", "monetary_amount")
+
+
+@dataclass(frozen=True)
+class RolloverResult:
+    copied: int
+    adjusted: int
+    replaced: int
+    # Total amount of the copied rows, after adjustments
+    total_amount: float
+
+
+def _year_value(target: RolloverTarget, year: int):
+    column = getattr(target.model, target.year_attr).property.columns[0]
+    return str(year) if isinstance(column.type, String) else year
+
+
+def _matches(target: RolloverTarget, adjustment: schemas.RolloverAdjustment):
+    model = target.model
+    conditions = [
+        getattr(model, attr) == code
+        for attr, code in (("fund_code", adjustment.fund_code), ("program_code", adjustment.program_code))
+        if code is not None
+    ]
+    return and_(*conditions) if conditions else true()
+
+
+def _adjusted(target: RolloverTarget, adjustments: Sequence[schemas.RolloverAdjustment]):
+    """The new-amount expression, and the condition for rows an adjustment applies to."""
+    amount = getattr(target.model, target.amount_attr)
+    if not adjustments:
+        return amount, None
+    whens = [
+        (_matches(target, adj), func.round(amount * (1 + adj.percent / 100) + adj.amount, 2))
+        for adj in adjustments
+    ]
+    return case(*whens, else_=amount), or_(*[condition for condition, _ in whens])
+
+
+def _scope(db: Session, target: RolloverTarget, filters: Optional[Mapping[str, str]], year) -> list:
+    # The year comes from the request, not the filters
+    params = {key: value for key, value in (filters or {}).items() if key != target.year_attr}
+    return target.spec.clauses(params, db.get_bind()) + [getattr(target.model, target.year_attr) == year]
+
+
+def rollover(
+    db: Session,
+    target: RolloverTarget,
+    source_year: int,
+    target_year: int,
+    filters: Optional[Mapping[str, str]] = None,
+    adjustments: Sequence[schemas.RolloverAdjustment] = (),
+    replace: bool = False,
+    dry_run: bool = False,
+) -> RolloverResult:
+    """
+    Copy `source_year`'s rows matching `filters` into `target_year`. With
+    `dry_run` only the counts are computed.
+    """
+    if source_year == target_year:
+        raise ValueError("The source and target years are the same")
+    model = target.model
+    source = _scope(db, target, filters, _year_value(target, source_year))
+    existing = _scope(db, target, filters, _year_value(target, target_year))
+    new_amount, adjusted_rows = _adjusted(target, adjustments)
+
+    adjusted_count = literal(0) if adjusted_rows is None else func.sum(case((adjusted_rows, 1), else_=0))
+    counts = db.execute(
+        select(func.count(), adjusted_count, func.sum(new_amount)).select_from(model).where(*source)
+    ).one()
+    replaced = db.execute(select(func.count()).select_from(model).where(*existing)).scalar_one()
+    if replaced and not replace:
+        raise ValueError(f"{target_year} already has {replaced} matching rows; set replace to overwrite them")
+    result = RolloverResult(counts[0], counts[1] or 0, replaced, float(counts[2] or 0))
+    if dry_run:
+        return result
+
+    table = model.__table__
+    columns = [column for column in table.columns if not column.primary_key]
+    year_column = getattr(model, target.year_attr).property.columns[0]
+    amount_column = getattr(model, target.amount_attr).property.columns[0]
+    selected = []
+    for column in columns:
+        if column is year_column:
+            selected.append(literal(_year_value(target, target_year), column.type))
+        elif column is amount_column:
+            selected.append(new_amount)
+        else:
+            selected.append(column)
+
+    indexed = textindex.is_indexed(db, model)
+    text_column = getattr(model, textindex.TEXT_COLUMNS[model])
+    try:
+        replaced_ids = []
+        if replaced:
+            if indexed:
+                replaced_ids = db.execute(select(model.id).where(*existing)).scalars().all()
+            db.execute(delete(table).where(*existing))
+        last_id = db.execute(select(func.max(model.id))).scalar() or 0
+        # No ORDER BY: sorting the source rows by id would double the insert time
+        db.execute(insert(table).from_select(columns, select(*selected).where(*source)))
+        pairs = []
+        if indexed:
+            pairs = db.execute(select(model.id, text_column).where(model.id > last_id)).all()
+        if model is models.OperatingBudget:
+            summary.refresh_fiscal_years(db, [target_year])
+        cache.bump(db, model)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    if indexed:
+        textindex.forget(db, model, replaced_ids)
+        textindex.record_pairs(db, model, pairs)
+    return result
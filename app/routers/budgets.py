@@ -1,10 +1,12 @@
-from typing import List
+from dataclasses import asdict
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, schemas
-from app.database import get_db
+from app import aggregates, async_crud, batch, conditional, crud, fastjson, models, schemas, staging
+from app.database import get_async_db
+from app.pagination import decode_id_cursor, set_page_headers
 
 router = APIRouter(
     prefix="/budgets",
@@ -12,31 +14,124 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.OperatingBudget, status_code=status.HTTP_201_CREATED)
-def create_budget(budget: schemas.OperatingBudgetCreate, db: Session = Depends(get_db)):
-    return crud.create_budget(db, budget)
+async def create_budget(budget: schemas.OperatingBudgetCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_budget(db, budget)
+
+@router.post("/batch", response_model=schemas.BatchResult)
+async def batch_create_budgets(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create budget rows from a JSON array, or from NDJSON (`Content-Type:
+    application/x-ndjson`) read as it streams in. Rows are validated and inserted
+    in chunks, each in its own transaction; a chunk with any invalid row is
+    skipped and its errors are listed in the per-chunk results.
+    """
+    try:
+        return await batch.load_request(db, staging.OPERATING_BUDGET_UPLOADS, request)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @router.get("/", response_model=List[schemas.OperatingBudget])
-def read_budgets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    orm_objs = crud.get_budgets(db, skip, limit)
-    return [schemas.OperatingBudget.model_validate(obj) for obj in orm_objs]
+async def read_budgets(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List budgets, filtered by the same query params as the UI. Send the
+    `X-Next-Cursor` response header back as `cursor` to seek to the next page;
+    `include_total` adds an `X-Total-Count` header. Responses carry an ETag;
+    a matching `If-None-Match` gets an empty 304.
+    """
+    try:
+        after_id = decode_id_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after_id is not None:
+        skip = 0
+    version = await async_crud.table_version(db, models.OperatingBudget)
+    etag = conditional.etag(models.OperatingBudget, version, request.url.path, request.query_params)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    rows = await async_crud.get_budget_rows(db, skip, limit, filters=request.query_params, after_id=after_id)
+    total = await async_crud.count_budgets(db, request.query_params) if include_total else None
+    # Rows go straight to JSON; the schema was checked against the columns at import
+    response = fastjson.OPERATING_BUDGET_JSON.response(rows)
+    conditional.set_etag(response, etag)
+    set_page_headers(request, response, rows, limit, total)
+    return response
+
+@router.get("/summary", response_model=List[schemas.BudgetSummary])
+async def summarize_budgets(
+    request: Request,
+    group_by: List[str] = Query([]),
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Total budget amounts in the database, grouped by the chosen chartfields and
+    filtered by the UI filter params. `rollup` adds subtotal and grand-total rows.
+    """
+    try:
+        return await async_crud.summarize(db, aggregates.OPERATING_BUDGET_AGGREGATES, group_by, request.query_params, rollup)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.post("/bulk_update", response_model=schemas.BulkChangeResult)
+async def bulk_update_budgets(change: schemas.BulkChange, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Set `values` on every budget selected by `ids` and/or `filters` with a
+    single UPDATE. `dry_run` only counts the rows that would change.
+    """
+    try:
+        affected = await async_crud.bulk_update_budgets(db, change, dry_run)
+    except crud.BulkValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.BulkChangeResult(affected=affected, dry_run=dry_run)
+
+@router.post("/bulk_delete", response_model=schemas.BulkChangeResult)
+async def bulk_delete_budgets(change: schemas.BulkChange, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Delete every budget selected by `ids` and/or `filters` with a single DELETE."""
+    try:
+        affected = await async_crud.bulk_delete_budgets(db, change, dry_run)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.BulkChangeResult(affected=affected, dry_run=dry_run)
+
+@router.post("/rollover", response_model=schemas.RolloverResult)
+async def rollover_budgets(request: schemas.Rollover, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Copy a fiscal year's budgets (or those matching `filters`) into `target_year`
+    with one INSERT ... SELECT, applying the fund/program `adjustments`.
+    `dry_run` only computes the counts.
+    """
+    try:
+        result = await async_crud.rollover_budgets(db, request, dry_run)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.RolloverResult(**asdict(result), dry_run=dry_run)
 
 @router.get("/{budget_id}", response_model=schemas.OperatingBudget)
-def read_budget(budget_id: int, db: Session = Depends(get_db)):
-    db_budget = crud.get_budget(db, budget_id)
+async def read_budget(budget_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_budget = await async_crud.get_budget(db, budget_id)
     if db_budget is None:
         raise HTTPException(status_code=404, detail="Budget not found")
     return db_budget
 
 @router.put("/{budget_id}", response_model=schemas.OperatingBudget)
-def update_budget(budget_id: int, budget: schemas.OperatingBudgetCreate, db: Session = Depends(get_db)):
-    db_budget = crud.update_budget(db, budget_id, budget)
+async def update_budget(budget_id: int, budget: schemas.OperatingBudgetCreate, db: AsyncSession = Depends(get_async_db)):
+    db_budget = await async_crud.update_budget(db, budget_id, budget)
     if db_budget is None:
         raise HTTPException(status_code=404, detail="Budget not found")
     return db_budget
 
 @router.delete("/{budget_id}", response_model=schemas.OperatingBudget)
-def delete_budget(budget_id: int, db: Session = Depends(get_db)):
-    db_budget = crud.delete_budget(db, budget_id)
+async def delete_budget(budget_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_budget = await async_crud.delete_budget(db, budget_id)
     if db_budget is None:
         raise HTTPException(status_code=404, detail="Budget not found")
     return db_budget
\ No newline at end of file
@@ -1,10 +1,12 @@
-from typing import List
+from dataclasses import asdict
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import crud, schemas
-from app.database import get_db
+from app import aggregates, async_crud, batch, conditional, crud, fastjson, models, schemas, staging
+from app.database import get_async_db
+from app.pagination import decode_id_cursor, set_page_headers
 
 router = APIRouter(
     prefix="/construction_budgets",
@@ -12,31 +14,124 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.ConstructionBudget, status_code=status.HTTP_201_CREATED)
-def create_construction_budget(construction_budget: schemas.ConstructionBudgetCreate, db: Session = Depends(get_db)):
-    return crud.create_construction_budget(db, construction_budget)
+async def create_construction_budget(construction_budget: schemas.ConstructionBudgetCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_crud.create_construction_budget(db, construction_budget)
+
+@router.post("/batch", response_model=schemas.BatchResult)
+async def batch_create_construction_budgets(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Create construction budget rows from a JSON array, or from NDJSON (`Content-Type:
+    application/x-ndjson`) read as it streams in. Rows are validated and inserted
+    in chunks, each in its own transaction; a chunk with any invalid row is
+    skipped and its errors are listed in the per-chunk results.
+    """
+    try:
+        return await batch.load_request(db, staging.CONSTRUCTION_BUDGET_UPLOADS, request)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @router.get("/", response_model=List[schemas.ConstructionBudget])
-def read_construction_budgets(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    orm_objs = crud.get_construction_budgets(db, skip, limit)
-    return [schemas.ConstructionBudget.model_validate(obj) for obj in orm_objs]
+async def read_construction_budgets(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    List construction budgets, filtered by the same query params as the UI. Send the
+    `X-Next-Cursor` response header back as `cursor` to seek to the next page;
+    `include_total` adds an `X-Total-Count` header. Responses carry an ETag;
+    a matching `If-None-Match` gets an empty 304.
+    """
+    try:
+        after_id = decode_id_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if after_id is not None:
+        skip = 0
+    version = await async_crud.table_version(db, models.ConstructionBudget)
+    etag = conditional.etag(models.ConstructionBudget, version, request.url.path, request.query_params)
+    if conditional.matches(request, etag):
+        return conditional.not_modified(etag)
+    rows = await async_crud.get_construction_budget_rows(db, skip, limit, filters=request.query_params, after_id=after_id)
+    total = await async_crud.count_construction_budgets(db, request.query_params) if include_total else None
+    # Rows go straight to JSON; the schema was checked against the columns at import
+    response = fastjson.CONSTRUCTION_BUDGET_JSON.response(rows)
+    conditional.set_etag(response, etag)
+    set_page_headers(request, response, rows, limit, total)
+    return response
+
+@router.get("/summary", response_model=List[schemas.BudgetSummary])
+async def summarize_construction_budgets(
+    request: Request,
+    group_by: List[str] = Query([]),
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Total construction budget amounts in the database, grouped by the chosen chartfields and
+    filtered by the UI filter params. `rollup` adds subtotal and grand-total rows.
+    """
+    try:
+        return await async_crud.summarize(db, aggregates.CONSTRUCTION_BUDGET_AGGREGATES, group_by, request.query_params, rollup)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.post("/bulk_update", response_model=schemas.BulkChangeResult)
+async def bulk_update_construction_budgets(change: schemas.BulkChange, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Set `values` on every construction budget selected by `ids` and/or `filters` with a
+    single UPDATE. `dry_run` only counts the rows that would change.
+    """
+    try:
+        affected = await async_crud.bulk_update_construction_budgets(db, change, dry_run)
+    except crud.BulkValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.BulkChangeResult(affected=affected, dry_run=dry_run)
+
+@router.post("/bulk_delete", response_model=schemas.BulkChangeResult)
+async def bulk_delete_construction_budgets(change: schemas.BulkChange, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """Delete every construction budget selected by `ids` and/or `filters` with a single DELETE."""
+    try:
+        affected = await async_crud.bulk_delete_construction_budgets(db, change, dry_run)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.BulkChangeResult(affected=affected, dry_run=dry_run)
+
+@router.post("/rollover", response_model=schemas.RolloverResult)
+async def rollover_construction_budgets(request: schemas.Rollover, dry_run: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Copy a budget period's construction budgets (or those matching
+    `filters`) into `target_year` with one INSERT ... SELECT, applying the
+    fund/program `adjustments`. `dry_run` only computes the counts.
+    """
+    try:
+        result = await async_crud.rollover_construction_budgets(db, request, dry_run)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return schemas.RolloverResult(**asdict(result), dry_run=dry_run)
 
 @router.get("/{construction_budget_id}", response_model=schemas.ConstructionBudget)
-def read_construction_budget(construction_budget_id: int, db: Session = Depends(get_db)):
-    db_obj = crud.get_construction_budget(db, construction_budget_id)
+async def read_construction_budget(construction_budget_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_obj = await async_crud.get_construction_budget(db, construction_budget_id)
     if db_obj is None:
         raise HTTPException(status_code=404, detail="ConstructionBudget not found")
     return db_obj
 
 @router.put("/{construction_budget_id}", response_model=schemas.ConstructionBudget)
-def update_construction_budget(construction_budget_id: int, construction_budget: schemas.ConstructionBudgetCreate, db: Session = Depends(get_db)):
-    db_obj = crud.update_construction_budget(db, construction_budget_id, construction_budget)
+async def update_construction_budget(construction_budget_id: int, construction_budget: schemas.ConstructionBudgetCreate, db: AsyncSession = Depends(get_async_db)):
+    db_obj = await async_crud.update_construction_budget(db, construction_budget_id, construction_budget)
     if db_obj is None:
         raise HTTPException(status_code=404, detail="ConstructionBudget not found")
     return db_obj
 
 @router.delete("/{construction_budget_id}", response_model=schemas.ConstructionBudget)
-def delete_construction_budget(construction_budget_id: int, db: Session = Depends(get_db)):
-    db_obj = crud.delete_construction_budget(db, construction_budget_id)
+async def delete_construction_budget(construction_budget_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_obj = await async_crud.delete_construction_budget(db, construction_budget_id)
     if db_obj is None:
         raise HTTPException(status_code=404, detail="ConstructionBudget not found")
     return db_obj
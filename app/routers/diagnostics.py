@@ -0,0 +1,66 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import indexadvisor, models, profiler
+from app.database import get_async_db, get_db, pool_status
+
+router = APIRouter(prefix="/diagnostics", tags=["diagnostics"])
+
+
+def require_profile_token(
+    x_profile: Optional[str] = Header(None),
+    token: Optional[str] = Query(None, alias=profiler.PROFILE_PARAM),
+):
+    """Every diagnostics route needs the PROFILE_TOKEN secret, as a header or query parameter."""
+    if not profiler.enabled():
+        raise HTTPException(status_code=404, detail="Diagnostics are disabled; set PROFILE_TOKEN")
+    if not profiler.authorized(x_profile or token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@router.get("/pool", dependencies=[Depends(require_profile_token)])
+def read_pool_status(db: Session = Depends(get_db), async_db: AsyncSession = Depends(get_async_db)):
+    """
+    Connection pool occupancy and checkout/wait statistics for the sync engine
+    (UI routes) and, under `async`, the async engine (REST routes).
+    """
+    return dict(pool_status(db.get_bind()), **{"async": pool_status(async_db.get_bind())})
+
+
+@router.get("/indexes", dependencies=[Depends(require_profile_token)])
+def read_index_advice(db: Session = Depends(get_db)):
+    """
+    Filter/sort patterns recorded from the list queries since startup, the
+    composite indexes that would serve them (with any existing index that
+    already does), and indexes made redundant by another index.
+    """
+    tables = [model.__tablename__ for model in (models.OperatingBudget, models.SupplierBudget, models.ConstructionBudget)]
+    return indexadvisor.report(db.get_bind(), tables)
+
+
+@router.get("/profiles", dependencies=[Depends(require_profile_token)])
+def read_profiles():
+    """Summaries of the saved request profiles, newest first."""
+    return profiler.list_profiles()
+
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_profile_token)])
+def read_profile(profile_id: str):
+    """A profile's summary: timing, sample count, peak traced memory and top frames."""
+    path = profiler.summary_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json")
+
+
+@router.get("/profiles/{profile_id}/stacks", dependencies=[Depends(require_profile_token)])
+def download_profile_stacks(profile_id: str):
+    """The profile's samples as collapsed stacks, for flamegraph.pl or speedscope."""
+    path = profiler.stacks_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
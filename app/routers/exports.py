@@ -0,0 +1,124 @@
+import csv
+import io
+import tempfile
+from typing import Iterator, List, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.pagination import keyset_query, parse_sort
+from app.filters import (
+    CONSTRUCTION_BUDGET_FILTERS,
+    OPERATING_BUDGET_FILTERS,
+    SUPPLIER_BUDGET_FILTERS,
+    FilterSpec,
+)
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+router = APIRouter(tags=["exports"])
+
+# Rows fetched per server-side cursor round trip; also the CSV flush size
+EXPORT_CHUNK_SIZE = 2000
+# XLSX exports up to this size are assembled in memory, larger ones on disk
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _export_columns(model) -> List[Tuple[str, object]]:
+    # Header names follow the API field names, so CLASS is exported as "class"
+    return [
+        (attr.key.rstrip("_"), attr.columns[0])
+        for attr in inspect(model).column_attrs
+    ]
+
+
+def _iter_partitions(session: Session, stmt) -> Iterator[list]:
+    try:
+        result = session.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        session.close()
+
+
+def _csv_stream(headers: List[str], partitions: Iterator[list]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(headers)
+    yield buf.getvalue()
+    for partition in partitions:
+        buf.seek(0)
+        buf.truncate(0)
+        writer.writerows(partition)
+        yield buf.getvalue()
+
+
+def _xlsx_stream(headers: List[str], partitions: Iterator[list]) -> Iterator[bytes]:
+    # Write-only workbooks spool rows to disk as they are appended, so only
+    # the current partition is held in memory. The zip container can only be
+    # written once the sheet is complete, so the first bytes go out after the
+    # last row is read; the file is then streamed in chunks.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(headers)
+    for partition in partitions:
+        for row in partition:
+            ws.append(list(row))
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE) as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            data = tmp.read(64 * 1024)
+            if not data:
+                break
+            yield data
+
+
+def _export(request: Request, db: Session, spec: FilterSpec, filename: str, format: str):
+    columns = _export_columns(spec.model)
+    # Rows come out in the list view's order: its sort param, then id
+    sort, descending = parse_sort(request.query_params.get("sort"))
+    column = spec.sort_column(sort)
+    stmt = select(*[column for _, column in columns])
+    stmt = spec.apply(stmt, request.query_params, db.get_bind(), sort=column)
+    stmt = keyset_query(stmt, spec.model, column, descending)
+    headers = [name for name, _ in columns]
+    # The request-scoped session may be closed before the body is streamed,
+    # so the export runs on its own session against the same bind.
+    partitions = _iter_partitions(Session(bind=db.get_bind()), stmt)
+    if format == "xlsx":
+        if Workbook is None:
+            raise HTTPException(status_code=501, detail="openpyxl is required for xlsx export")
+        body, media_type = _xlsx_stream(headers, partitions), XLSX_MEDIA_TYPE
+    else:
+        body, media_type = _csv_stream(headers, partitions), "text/csv"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+
+@router.get("/budgets/export")
+def export_budgets(request: Request, format: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db)):
+    """Stream operating budgets matching the UI filter params as CSV or XLSX."""
+    return _export(request, db, OPERATING_BUDGET_FILTERS, "operating_budgets", format)
+
+
+@router.get("/supplier_budgets/export")
+def export_supplier_budgets(request: Request, format: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db)):
+    """Stream supplier budgets matching the UI filter params as CSV or XLSX."""
+    return _export(request, db, SUPPLIER_BUDGET_FILTERS, "supplier_budgets", format)
+
+
+@router.get("/construction_budgets/export")
+def export_construction_budgets(request: Request, format: str = Query("csv", pattern="^(csv|xlsx)$"), db: Session = Depends(get_db)):
+    """Stream construction budgets matching the UI filter params as CSV or XLSX."""
+    return _export(request, db, CONSTRUCTION_BUDGET_FILTERS, "construction_budgets", format)
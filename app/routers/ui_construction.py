@@ -3,83 +3,89 @@ from fastapi import APIRouter
 router = APIRouter()
 
 try:
-    from fastapi import Depends, Request, Form, UploadFile, File
+    from typing import Optional
+
+    from fastapi import Depends, HTTPException, Request, Form, UploadFile, File
     from fastapi.responses import HTMLResponse
     from fastapi.templating import Jinja2Templates
     from sqlalchemy.orm import Session
-    import pandas as pd
-    import json
 
-    from app import crud, schemas
+    from app import conditional, crud, merge, metrics, models, pagination, schemas, staging, streaming
+    from app.cache import query_cache, table_version
     from app.database import get_db
+    from app.excel import ExcelRowReader
+    from app.pagination import next_page_url
 
     templates = Jinja2Templates(directory="app/templates")
+    metrics.instrument_templates(templates)
+
+    def bulk_upload_errors(request: Request, errors, target: str):
+        # Swap the error report into the preview area instead of the table body
+        response = templates.TemplateResponse(
+            "bulk_upload_errors.html", {"request": request, "errors": errors}
+        )
+        response.headers["HX-Retarget"] = target
+        response.headers["HX-Reswap"] = "innerHTML"
+        return response
+
+    def merge_upload(request: Request, target, token: str, delete_missing: bool, db: Session, container: str):
+        try:
+            result = merge.merge_upload(db, target, token, delete_missing)
+        except ValueError as exc:
+            return bulk_upload_errors(request, [{"row": "", "field": "token", "message": str(exc)}], container)
+        if result is None:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, container)
+        # Updated and deleted rows can be anywhere in the table, so reload it
+        response = HTMLResponse("")
+        response.headers["HX-Refresh"] = "true"
+        return response
 
     @router.get("/construction_budgets", response_class=HTMLResponse)
     def construction_index(request: Request, db: Session = Depends(get_db)):
         params = request.query_params
         is_htmx = bool(request.headers.get("hx-request"))
         has_filter = any(v for v in params.values())
-        cons_budgets = crud.get_construction_budgets(db, skip=0, limit=None)
-        bp = params.get("budget_period")
-        if bp:
-            bp_value = bp.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.budget_period and bp_value in str(b.budget_period).lower()
-            ]
-        fc = params.get("fund_code")
-        if fc:
-            fc_value = fc.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.fund_code and fc_value in str(b.fund_code).lower()
-            ]
-        pc = params.get("program_code")
-        if pc:
-            pc_value = pc.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.program_code and pc_value in str(b.program_code).lower()
-            ]
-        pid = params.get("project_id")
-        if pid:
-            pid_value = pid.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.project_id and pid_value in str(b.project_id).lower()
-            ]
-        aid = params.get("activity_id")
-        if aid:
-            aid_value = aid.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.activity_id and aid_value in str(b.activity_id).lower()
-            ]
-        la = params.get("line_descr")
-        if la:
-            la_value = la.lower()
-            cons_budgets = [
-                b
-                for b in cons_budgets
-                if b.line_descr and la_value in str(b.line_descr).lower()
-            ]
-        ma = params.get("monetary_amount")
-        if ma:
+        version = table_version(db, models.ConstructionBudget)
+        fragment = is_htmx or has_filter
+        if fragment:
+            # Row fragment: answer revalidations from the version counter alone
+            etag = conditional.etag(models.ConstructionBudget, version, request.url.path, params, "construction_budget_rows.html")
+            if conditional.matches(request, etag):
+                return conditional.not_modified(etag, vary="HX-Request")
+        template_name = "construction_budget_rows.html" if fragment else "construction_index.html"
+
+        if not pagination.UI_PAGE_SIZE:
+            response = streaming.template_response(
+                templates, template_name,
+                {
+                    "request": request,
+                    "construction_budgets": crud.stream_construction_budgets(db.get_bind(), params),
+                    "next_url": None,
+                },
+            )
+        else:
             try:
-                cons_budgets = [b for b in cons_budgets if b.monetary_amount == float(ma)]
+                # Only the first page is rendered; the rows template's sentinel
+                # loads the rest as the user scrolls
+                page = query_cache.get_or_load(
+                    db, models.ConstructionBudget, params,
+                    lambda: crud.get_construction_budget_page(db, params),
+                    kind="page", version=version,
+                )
             except ValueError:
-                pass
-
-        template_name = "construction_budget_rows.html" if (is_htmx or has_filter) else "construction_index.html"
-        return templates.TemplateResponse(
-            template_name, {"request": request, "construction_budgets": cons_budgets}
-        )
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            response = templates.TemplateResponse(
+                template_name,
+                {
+                    "request": request,
+                    "construction_budgets": page.rows,
+                    "next_url": next_page_url(request, params, page.next_cursor),
+                },
+            )
+        if fragment:
+            conditional.set_etag(response, etag, vary="HX-Request")
+        return response
 
     @router.post("/construction_budgets", response_class=HTMLResponse)
     def create_construction_budget_ui(
@@ -107,14 +113,14 @@ try:
             "construction_budget_row.html", {"request": request, "budget": cons}
         )
 
-    @router.get("/construction_budgets/{construction_budget_id}/edit", response_class=HTMLResponse)
+    @router.get("/construction_budgets/{construction_budget_id:int}/edit", response_class=HTMLResponse)
     def edit_construction_budget_ui(request: Request, construction_budget_id: int, db: Session = Depends(get_db)):
         cons = crud.get_construction_budget(db, construction_budget_id)
         return templates.TemplateResponse(
             "construction_budget_edit_row.html", {"request": request, "budget": cons}
         )
 
-    @router.get("/construction_budgets/{construction_budget_id}/cancel", response_class=HTMLResponse)
+    @router.get("/construction_budgets/{construction_budget_id:int}/cancel", response_class=HTMLResponse)
     def cancel_edit_construction_budget_ui(request: Request, construction_budget_id: int, db: Session = Depends(get_db)):
         cons = crud.get_construction_budget(db, construction_budget_id)
         return templates.TemplateResponse(
@@ -158,35 +164,44 @@ try:
         return templates.TemplateResponse("construction_bulk_upload_form.html", {"request": request})
 
     @router.post("/construction_budgets/bulk_upload/preview", response_class=HTMLResponse)
-    def construction_bulk_upload_preview(request: Request, file: UploadFile = File(...)):
-        df = pd.read_excel(file.file, dtype=str)
-        df.columns = [str(col).strip().lower() for col in df.columns]
-        if "fund_code" in df.columns:
-            df["fund_code"] = df["fund_code"].apply(lambda x: x.zfill(2) if isinstance(x, str) else x)
-        if "program_code" in df.columns:
-            df["program_code"] = df["program_code"].apply(lambda x: x.zfill(4) if isinstance(x, str) else x)
-        df.fillna("", inplace=True)
-        rows = df.to_dict(orient="records")
-        headers = list(df.columns)
+    def construction_bulk_upload_preview(
+        request: Request,
+        file: UploadFile = File(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        with ExcelRowReader(file.file) as reader:
+            upload = staging.stage_upload(db, staging.CONSTRUCTION_BUDGET_UPLOADS, reader.headers, reader.column_chunks())
+        if mode == "merge":
+            merge.preview(db, staging.CONSTRUCTION_BUDGET_UPLOADS, upload, delete_missing)
         return templates.TemplateResponse(
-            "construction_bulk_upload_preview.html",
-            {"request": request, "headers": headers, "rows": rows},
+            "construction_bulk_upload_preview.html", {"request": request, "upload": upload}
         )
 
     @router.post("/construction_budgets/bulk_upload", response_class=HTMLResponse)
-    def construction_bulk_upload(request: Request, rows_json: str = Form(...), db: Session = Depends(get_db)):
-        rows = json.loads(rows_json)
-        created = []
-        for row in rows:
-            cons_in = schemas.ConstructionBudgetCreate.model_validate(row)
-            cons = crud.create_construction_budget(db, cons_in)
-            created.append(cons)
+    def construction_bulk_upload(
+        request: Request,
+        token: str = Form(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        if mode == "merge":
+            return merge_upload(request, staging.CONSTRUCTION_BUDGET_UPLOADS, token, delete_missing, db, "#construction-bulk-preview-container")
+        ids = staging.commit_upload(db, staging.CONSTRUCTION_BUDGET_UPLOADS, token)
+        if not ids:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, "#construction-bulk-preview-container")
+        created = staging.fetch_created(db, staging.CONSTRUCTION_BUDGET_UPLOADS, ids)
         return templates.TemplateResponse(
             "construction_budget_rows.html", {"request": request, "construction_budgets": created}
         )
 
     @router.get("/construction_budgets/bulk_upload/cancel", response_class=HTMLResponse)
-    def construction_bulk_upload_cancel(request: Request):
+    def construction_bulk_upload_cancel(request: Request, token: Optional[str] = None, db: Session = Depends(get_db)):
+        if token:
+            staging.discard_upload(db, staging.CONSTRUCTION_BUDGET_UPLOADS, token)
         return HTMLResponse("")
 
 except ImportError:
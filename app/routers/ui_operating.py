@@ -3,17 +3,43 @@ from fastapi import APIRouter
 router = APIRouter()
 
 try:
-    from fastapi import Depends, Request, Form, UploadFile, File
+    from typing import Optional
+
+    from fastapi import Depends, HTTPException, Request, Form, UploadFile, File
     from fastapi.responses import HTMLResponse
     from fastapi.templating import Jinja2Templates
     from sqlalchemy.orm import Session
-    import pandas as pd
-    import json
 
-    from app import crud, schemas
+    from app import conditional, crud, merge, metrics, models, pagination, schemas, staging, streaming
+    from app.cache import query_cache, table_version
     from app.database import get_db
+    from app.excel import ExcelRowReader
+    from app.pagination import next_page_url
 
     templates = Jinja2Templates(directory="app/templates")
+    metrics.instrument_templates(templates)
+
+    def bulk_upload_errors(request: Request, errors, target: str):
+        # Swap the error report into the preview area instead of the table body
+        response = templates.TemplateResponse(
+            "bulk_upload_errors.html", {"request": request, "errors": errors}
+        )
+        response.headers["HX-Retarget"] = target
+        response.headers["HX-Reswap"] = "innerHTML"
+        return response
+
+    def merge_upload(request: Request, target, token: str, delete_missing: bool, db: Session, container: str):
+        try:
+            result = merge.merge_upload(db, target, token, delete_missing)
+        except ValueError as exc:
+            return bulk_upload_errors(request, [{"row": "", "field": "token", "message": str(exc)}], container)
+        if result is None:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, container)
+        # Updated and deleted rows can be anywhere in the table, so reload it
+        response = HTMLResponse("")
+        response.headers["HX-Refresh"] = "true"
+        return response
 
     @router.get("/", response_class=HTMLResponse)
     def index(request: Request, db: Session = Depends(get_db)):
@@ -21,63 +47,49 @@ try:
         is_htmx = bool(request.headers.get("hx-request"))
         has_filter = any(v for v in params.values())
 
+        version = table_version(db, models.OperatingBudget)
+
         if not is_htmx and not has_filter:
-            from sqlalchemy import func
-            from app.models import OperatingBudget
-
-            latest_year = db.query(func.max(OperatingBudget.fiscal_year)).scalar()
-            if latest_year is not None:
-                budgets = (
-                    db.query(OperatingBudget)
-                    .filter(OperatingBudget.fiscal_year == latest_year)
-                    .order_by(OperatingBudget.id)
-                    .all()
+            # Full page: the first page of the latest fiscal year; the rows
+            # template's sentinel loads the rest as the user scrolls
+            latest = query_cache.get_or_load(
+                db, models.OperatingBudget, None, lambda: crud.latest_budget_year(db), kind="latest_year", version=version
+            )
+            page_params = {"fiscal_year": str(latest)} if latest is not None else {}
+            if not pagination.UI_PAGE_SIZE:
+                return streaming.template_response(
+                    templates, "index.html",
+                    {"request": request, "budgets": crud.stream_budgets(db.get_bind(), page_params), "next_url": None},
                 )
-            else:
-                budgets = []
+            page = query_cache.get_or_load(
+                db, models.OperatingBudget, page_params, lambda: crud.get_budget_page(db, page_params), kind="page", version=version
+            )
             return templates.TemplateResponse(
-                "index.html", {"request": request, "budgets": budgets}
+                "index.html",
+                {"request": request, "budgets": page.rows, "next_url": next_page_url(request, page_params, page.next_cursor)},
             )
 
-        budgets = crud.get_budgets(db, skip=0, limit=None)
-        fy = params.get("fiscal_year")
-        if fy:
-            budgets = [b for b in budgets if fy in str(b.fiscal_year)]
-        fc = params.get("fund_code")
-        if fc:
-            budgets = [b for b in budgets if fc.lower() in b.fund_code.lower()]
-        pc = params.get("program_code")
-        if pc:
-            budgets = [b for b in budgets if pc.lower() in b.program_code.lower()]
-        ac = params.get("account")
-        if ac:
-            budgets = [b for b in budgets if ac.lower() in b.account.lower()]
-        did = params.get("deptid")
-        if did:
-            budgets = [b for b in budgets if did.lower() in b.deptid.lower()]
-        ou = params.get("operating_unit")
-        if ou:
-            budgets = [b for b in budgets if ou.lower() in b.operating_unit.lower()]
-        cl = params.get("class")
-        if cl:
-            budgets = [b for b in budgets if cl.lower() in b.class_.lower()]
-        pid = params.get("project_id")
-        if pid:
-            budgets = [b for b in budgets if pid.lower() in b.project_id.lower()]
-        ba = params.get("budget_amount")
-        if ba:
-            try:
-                budgets = [b for b in budgets if b.budget_amount == float(ba)]
-            except ValueError:
-                pass
-        ds = params.get("descr")
-        if ds:
-            budgets = [b for b in budgets if ds.lower() in b.descr.lower()]
-
-        template_name = "budget_rows.html" if (is_htmx or has_filter) else "index.html"
-        return templates.TemplateResponse(
-            template_name, {"request": request, "budgets": budgets}
+        # Row fragment: answer revalidations from the version counter alone
+        etag = conditional.etag(models.OperatingBudget, version, request.url.path, params, "budget_rows.html")
+        if conditional.matches(request, etag):
+            return conditional.not_modified(etag, vary="HX-Request")
+        if not pagination.UI_PAGE_SIZE:
+            response = streaming.template_response(
+                templates, "budget_rows.html",
+                {"request": request, "budgets": crud.stream_budgets(db.get_bind(), params), "next_url": None},
+            )
+            return conditional.set_etag(response, etag, vary="HX-Request")
+        try:
+            page = query_cache.get_or_load(
+                db, models.OperatingBudget, params, lambda: crud.get_budget_page(db, params), kind="page", version=version
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        response = templates.TemplateResponse(
+            "budget_rows.html",
+            {"request": request, "budgets": page.rows, "next_url": next_page_url(request, params, page.next_cursor)},
         )
+        return conditional.set_etag(response, etag, vary="HX-Request")
 
     @router.post("/budgets", response_class=HTMLResponse)
     def create_budget_ui(
@@ -111,14 +123,14 @@ try:
             "budget_row.html", {"request": request, "budget": budget}
         )
 
-    @router.get("/budgets/{budget_id}/edit", response_class=HTMLResponse)
+    @router.get("/budgets/{budget_id:int}/edit", response_class=HTMLResponse)
     def edit_budget_ui(request: Request, budget_id: int, db: Session = Depends(get_db)):
         budget = crud.get_budget(db, budget_id)
         return templates.TemplateResponse(
             "budget_edit_row.html", {"request": request, "budget": budget}
         )
 
-    @router.get("/budgets/{budget_id}/cancel", response_class=HTMLResponse)
+    @router.get("/budgets/{budget_id:int}/cancel", response_class=HTMLResponse)
     def cancel_edit_budget_ui(request: Request, budget_id: int, db: Session = Depends(get_db)):
         budget = crud.get_budget(db, budget_id)
         return templates.TemplateResponse(
@@ -168,38 +180,44 @@ try:
         return templates.TemplateResponse("bulk_upload_form.html", {"request": request})
 
     @router.post("/budgets/bulk_upload/preview", response_class=HTMLResponse)
-    def bulk_upload_preview(request: Request, file: UploadFile = File(...)):
-        df = pd.read_excel(file.file, dtype=str)
-        df.columns = [str(col).strip().lower() for col in df.columns]
-        df = df.rename(columns={"class": "class_"})
-        if "fund_code" in df.columns:
-            df["fund_code"] = df["fund_code"].apply(lambda x: x.zfill(2) if isinstance(x, str) else x)
-        if "program_code" in df.columns:
-            df["program_code"] = df["program_code"].apply(lambda x: x.zfill(4) if isinstance(x, str) else x)
-        df.fillna("", inplace=True)
-        rows = df.to_dict(orient="records")
-        headers = list(df.columns)
+    def bulk_upload_preview(
+        request: Request,
+        file: UploadFile = File(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        with ExcelRowReader(file.file, rename={"class": "class_"}) as reader:
+            upload = staging.stage_upload(db, staging.OPERATING_BUDGET_UPLOADS, reader.headers, reader.column_chunks())
+        if mode == "merge":
+            merge.preview(db, staging.OPERATING_BUDGET_UPLOADS, upload, delete_missing)
         return templates.TemplateResponse(
-            "bulk_upload_preview.html",
-            {"request": request, "headers": headers, "rows": rows},
+            "bulk_upload_preview.html", {"request": request, "upload": upload}
         )
 
     @router.post("/budgets/bulk_upload", response_class=HTMLResponse)
-    def bulk_upload(request: Request, rows_json: str = Form(...), db: Session = Depends(get_db)):
-        rows = json.loads(rows_json)
-        created = []
-        for row in rows:
-            if "class" in row:
-                row["class_"] = row.pop("class")
-            budget_in = schemas.OperatingBudgetCreate.model_validate(row)
-            budget = crud.create_budget(db, budget_in)
-            created.append(budget)
+    def bulk_upload(
+        request: Request,
+        token: str = Form(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        if mode == "merge":
+            return merge_upload(request, staging.OPERATING_BUDGET_UPLOADS, token, delete_missing, db, "#bulk-preview-container")
+        ids = staging.commit_upload(db, staging.OPERATING_BUDGET_UPLOADS, token)
+        if not ids:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, "#bulk-preview-container")
+        created = staging.fetch_created(db, staging.OPERATING_BUDGET_UPLOADS, ids)
         return templates.TemplateResponse(
             "budget_rows.html", {"request": request, "budgets": created}
         )
 
     @router.get("/budgets/bulk_upload/cancel", response_class=HTMLResponse)
-    def bulk_upload_cancel(request: Request):
+    def bulk_upload_cancel(request: Request, token: Optional[str] = None, db: Session = Depends(get_db)):
+        if token:
+            staging.discard_upload(db, staging.OPERATING_BUDGET_UPLOADS, token)
         return HTMLResponse("")
 
 except ImportError:
@@ -3,17 +3,43 @@ from fastapi import APIRouter
 router = APIRouter()
 
 try:
-    from fastapi import Depends, Request, Form, UploadFile, File
+    from typing import Optional
+
+    from fastapi import Depends, HTTPException, Request, Form, UploadFile, File
     from fastapi.responses import HTMLResponse
     from fastapi.templating import Jinja2Templates
     from sqlalchemy.orm import Session
-    import pandas as pd
-    import json
 
-    from app import crud, schemas
+    from app import conditional, crud, merge, metrics, models, pagination, schemas, staging, streaming
+    from app.cache import query_cache, table_version
     from app.database import get_db
+    from app.excel import ExcelRowReader
+    from app.pagination import next_page_url
 
     templates = Jinja2Templates(directory="app/templates")
+    metrics.instrument_templates(templates)
+
+    def bulk_upload_errors(request: Request, errors, target: str):
+        # Swap the error report into the preview area instead of the table body
+        response = templates.TemplateResponse(
+            "bulk_upload_errors.html", {"request": request, "errors": errors}
+        )
+        response.headers["HX-Retarget"] = target
+        response.headers["HX-Reswap"] = "innerHTML"
+        return response
+
+    def merge_upload(request: Request, target, token: str, delete_missing: bool, db: Session, container: str):
+        try:
+            result = merge.merge_upload(db, target, token, delete_missing)
+        except ValueError as exc:
+            return bulk_upload_errors(request, [{"row": "", "field": "token", "message": str(exc)}], container)
+        if result is None:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, container)
+        # Updated and deleted rows can be anywhere in the table, so reload it
+        response = HTMLResponse("")
+        response.headers["HX-Refresh"] = "true"
+        return response
 
     @router.get("/supplier_budgets", response_class=HTMLResponse)
     def supplier_index(request: Request, db: Session = Depends(get_db)):
@@ -21,66 +47,49 @@ try:
         is_htmx = bool(request.headers.get("hx-request"))
         has_filter = any(v for v in params.values())
 
+        version = table_version(db, models.SupplierBudget)
+
         if not is_htmx and not has_filter:
-            from sqlalchemy import func
-            from app.models import SupplierBudget
-
-            latest_year = db.query(func.max(SupplierBudget.fiscal_year)).scalar()
-            if latest_year is not None:
-                sup_budgets = (
-                    db.query(SupplierBudget)
-                    .filter(SupplierBudget.fiscal_year == latest_year)
-                    .order_by(SupplierBudget.id)
-                    .all()
+            # Full page: the first page of the latest fiscal year; the rows
+            # template's sentinel loads the rest as the user scrolls
+            latest = query_cache.get_or_load(
+                db, models.SupplierBudget, None, lambda: crud.latest_supplier_budget_year(db), kind="latest_year", version=version
+            )
+            page_params = {"fiscal_year": str(latest)} if latest is not None else {}
+            if not pagination.UI_PAGE_SIZE:
+                return streaming.template_response(
+                    templates, "supplier_index.html",
+                    {"request": request, "supplier_budgets": crud.stream_supplier_budgets(db.get_bind(), page_params), "next_url": None},
                 )
-            else:
-                sup_budgets = []
+            page = query_cache.get_or_load(
+                db, models.SupplierBudget, page_params, lambda: crud.get_supplier_budget_page(db, page_params), kind="page", version=version
+            )
             return templates.TemplateResponse(
-                "supplier_index.html", {"request": request, "supplier_budgets": sup_budgets}
+                "supplier_index.html",
+                {"request": request, "supplier_budgets": page.rows, "next_url": next_page_url(request, page_params, page.next_cursor)},
             )
 
-        sup_budgets = crud.get_supplier_budgets(db, skip=0, limit=None)
-        fy = params.get("fiscal_year")
-        if fy:
-            sup_budgets = [b for b in sup_budgets if fy in str(b.fiscal_year)]
-        fc = params.get("fund_code")
-        if fc:
-            sup_budgets = [b for b in sup_budgets if fc.lower() in b.fund_code.lower()]
-        pc = params.get("program_code")
-        if pc:
-            sup_budgets = [b for b in sup_budgets if pc.lower() in b.program_code.lower()]
-        ac = params.get("account")
-        if ac:
-            sup_budgets = [b for b in sup_budgets if ac.lower() in b.account.lower()]
-        did = params.get("deptid")
-        if did:
-            sup_budgets = [b for b in sup_budgets if did.lower() in b.deptid.lower()]
-        ou = params.get("operating_unit")
-        if ou:
-            sup_budgets = [b for b in sup_budgets if ou.lower() in b.operating_unit.lower()]
-        pid = params.get("project_id")
-        if pid:
-            sup_budgets = [b for b in sup_budgets if b.project_id and pid.lower() in b.project_id.lower()]
-        bu = params.get("business_unit")
-        if bu:
-            sup_budgets = [b for b in sup_budgets if b.business_unit and bu.lower() in b.business_unit.lower()]
-        vid = params.get("vendor_id")
-        if vid:
-            sup_budgets = [b for b in sup_budgets if b.vendor_id and vid.lower() in b.vendor_id.lower()]
-        amt = params.get("amount")
-        if amt:
-            try:
-                sup_budgets = [b for b in sup_budgets if b.amount == float(amt)]
-            except ValueError:
-                pass
-        ds = params.get("descr")
-        if ds:
-            sup_budgets = [b for b in sup_budgets if b.descr and ds.lower() in b.descr.lower()]
-
-        template_name = "supplier_budget_rows.html" if (is_htmx or has_filter) else "supplier_index.html"
-        return templates.TemplateResponse(
-            template_name, {"request": request, "supplier_budgets": sup_budgets}
+        # Row fragment: answer revalidations from the version counter alone
+        etag = conditional.etag(models.SupplierBudget, version, request.url.path, params, "supplier_budget_rows.html")
+        if conditional.matches(request, etag):
+            return conditional.not_modified(etag, vary="HX-Request")
+        if not pagination.UI_PAGE_SIZE:
+            response = streaming.template_response(
+                templates, "supplier_budget_rows.html",
+                {"request": request, "supplier_budgets": crud.stream_supplier_budgets(db.get_bind(), params), "next_url": None},
+            )
+            return conditional.set_etag(response, etag, vary="HX-Request")
+        try:
+            page = query_cache.get_or_load(
+                db, models.SupplierBudget, params, lambda: crud.get_supplier_budget_page(db, params), kind="page", version=version
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        response = templates.TemplateResponse(
+            "supplier_budget_rows.html",
+            {"request": request, "supplier_budgets": page.rows, "next_url": next_page_url(request, params, page.next_cursor)},
         )
+        return conditional.set_etag(response, etag, vary="HX-Request")
 
     @router.post("/supplier_budgets", response_class=HTMLResponse)
     def create_supplier_budget_ui(
@@ -116,14 +125,14 @@ try:
             "supplier_budget_row.html", {"request": request, "budget": sup}
         )
 
-    @router.get("/supplier_budgets/{supplier_budget_id}/edit", response_class=HTMLResponse)
+    @router.get("/supplier_budgets/{supplier_budget_id:int}/edit", response_class=HTMLResponse)
     def edit_supplier_budget_ui(request: Request, supplier_budget_id: int, db: Session = Depends(get_db)):
         sup = crud.get_supplier_budget(db, supplier_budget_id)
         return templates.TemplateResponse(
             "supplier_budget_edit_row.html", {"request": request, "budget": sup}
         )
 
-    @router.get("/supplier_budgets/{supplier_budget_id}/cancel", response_class=HTMLResponse)
+    @router.get("/supplier_budgets/{supplier_budget_id:int}/cancel", response_class=HTMLResponse)
     def cancel_edit_supplier_budget_ui(request: Request, supplier_budget_id: int, db: Session = Depends(get_db)):
         sup = crud.get_supplier_budget(db, supplier_budget_id)
         return templates.TemplateResponse(
@@ -175,35 +184,44 @@ try:
         return templates.TemplateResponse("supplier_bulk_upload_form.html", {"request": request})
 
     @router.post("/supplier_budgets/bulk_upload/preview", response_class=HTMLResponse)
-    def supplier_bulk_upload_preview(request: Request, file: UploadFile = File(...)):
-        df = pd.read_excel(file.file, dtype=str)
-        df.columns = [str(col).strip().lower() for col in df.columns]
-        if "fund_code" in df.columns:
-            df["fund_code"] = df["fund_code"].apply(lambda x: x.zfill(2) if isinstance(x, str) else x)
-        if "program_code" in df.columns:
-            df["program_code"] = df["program_code"].apply(lambda x: x.zfill(4) if isinstance(x, str) else x)
-        df.fillna("", inplace=True)
-        rows = df.to_dict(orient="records")
-        headers = list(df.columns)
+    def supplier_bulk_upload_preview(
+        request: Request,
+        file: UploadFile = File(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        with ExcelRowReader(file.file) as reader:
+            upload = staging.stage_upload(db, staging.SUPPLIER_BUDGET_UPLOADS, reader.headers, reader.column_chunks())
+        if mode == "merge":
+            merge.preview(db, staging.SUPPLIER_BUDGET_UPLOADS, upload, delete_missing)
         return templates.TemplateResponse(
-            "supplier_bulk_upload_preview.html",
-            {"request": request, "headers": headers, "rows": rows},
+            "supplier_bulk_upload_preview.html", {"request": request, "upload": upload}
         )
 
     @router.post("/supplier_budgets/bulk_upload", response_class=HTMLResponse)
-    def supplier_bulk_upload(request: Request, rows_json: str = Form(...), db: Session = Depends(get_db)):
-        rows = json.loads(rows_json)
-        created = []
-        for row in rows:
-            sup_in = schemas.SupplierBudgetCreate.model_validate(row)
-            sup = crud.create_supplier_budget(db, sup_in)
-            created.append(sup)
+    def supplier_bulk_upload(
+        request: Request,
+        token: str = Form(...),
+        mode: str = Form("append"),
+        delete_missing: bool = Form(False),
+        db: Session = Depends(get_db),
+    ):
+        if mode == "merge":
+            return merge_upload(request, staging.SUPPLIER_BUDGET_UPLOADS, token, delete_missing, db, "#supplier-bulk-preview-container")
+        ids = staging.commit_upload(db, staging.SUPPLIER_BUDGET_UPLOADS, token)
+        if not ids:
+            errors = [{"row": "", "field": "token", "message": "Upload not found or already confirmed"}]
+            return bulk_upload_errors(request, errors, "#supplier-bulk-preview-container")
+        created = staging.fetch_created(db, staging.SUPPLIER_BUDGET_UPLOADS, ids)
         return templates.TemplateResponse(
             "supplier_budget_rows.html", {"request": request, "supplier_budgets": created}
         )
 
     @router.get("/supplier_budgets/bulk_upload/cancel", response_class=HTMLResponse)
-    def supplier_bulk_upload_cancel(request: Request):
+    def supplier_bulk_upload_cancel(request: Request, token: Optional[str] = None, db: Session = Depends(get_db)):
+        if token:
+            staging.discard_upload(db, staging.SUPPLIER_BUDGET_UPLOADS, token)
         return HTMLResponse("")
 
 except ImportError:
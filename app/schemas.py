@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Any, Dict, List, Optional
 
 class OperatingBudgetBase(BaseModel):
     fiscal_year: int
@@ -70,3 +70,81 @@ class ConstructionBudgetCreate(ConstructionBudgetBase):
 
 class ConstructionBudget(ConstructionBudgetBase):
     id: int
+
+
+class BudgetSummary(BaseModel):
+    groups: Dict[str, Any]
+    total_amount: float
+    row_count: int
+    subtotal: bool = False
+
+
+def _stringify_filters(value):
+    # Filter params arrive as strings from query strings; accept JSON numbers too
+    if isinstance(value, dict):
+        return {key: "" if item is None else str(item) for key, item in value.items()}
+    return value
+
+
+class BulkChange(BaseModel):
+    """
+    Rows selected by `ids` and/or `filters` (the UI filter params), plus the
+    column assignments to apply for a bulk update.
+    """
+    ids: Optional[List[int]] = None
+    filters: Dict[str, str] = {}
+    values: Dict[str, Any] = {}
+
+    _stringify_filters = field_validator("filters", mode="before")(_stringify_filters)
+
+
+class BulkChangeResult(BaseModel):
+    affected: int
+    dry_run: bool = False
+
+
+class RolloverAdjustment(BaseModel):
+    """
+    Change copied amounts for one fund and/or program (None matches any):
+    `percent` first, then the flat `amount`.
+    """
+    fund_code: Optional[str] = None
+    program_code: Optional[str] = None
+    percent: float = 0
+    amount: float = 0
+
+
+class Rollover(BaseModel):
+    """
+    Copy `source_year`'s rows selected by `filters` into `target_year`.
+    `replace` overwrites target-year rows in the same scope.
+    """
+    source_year: int
+    target_year: int
+    filters: Dict[str, str] = {}
+    adjustments: List[RolloverAdjustment] = []
+    replace: bool = False
+
+    _stringify_filters = field_validator("filters", mode="before")(_stringify_filters)
+
+
+class RolloverResult(BaseModel):
+    copied: int
+    adjusted: int
+    replaced: int
+    total_amount: float
+    dry_run: bool = False
+
+
+class BatchChunkResult(BaseModel):
+    chunk: int
+    first_row: int
+    rows: int
+    inserted: int
+    errors: List[Dict[str, Any]] = []
+
+
+class BatchResult(BaseModel):
+    rows: int
+    inserted: int
+    chunks: List[BatchChunkResult]
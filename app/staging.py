@@ -0,0 +1,176 @@
+"""
+Server-side staging for bulk uploads.
+
+The preview step validates a parsed workbook chunk by chunk, a column at a
+time (app/validation.py), and writes the valid rows to the target's stage
+table under a random upload token.  Only a
+sample and summary stats go back to the browser; confirming the upload copies
+the staged rows into the budget table with a single INSERT ... SELECT.
+"""
+import secrets
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from . import cache, crud, models, schemas, summary, textindex, validation
+
+SAMPLE_SIZE = 20
+# Staged uploads that were never confirmed or cancelled are purged after this
+STAGING_TTL = timedelta(hours=24)
+# Confirm responses render at most this many of the new rows into the table
+CONFIRM_RENDER_LIMIT = 200
+
+
+@dataclass(frozen=True)
+class StageTarget:
+    model: Any
+    stage_model: Any
+    schema: Any
+    amount_field: str
+    # Columns identifying a budget line, matched on by merge uploads (app/merge.py)
+    natural_key: Tuple[str, ...] = ()
+
+    def validate(self, columns: Mapping[str, List[str]], count: int, start: int, extra: Mapping[str, Sequence[Any]]):
+        """(typed row dicts plus the `extra` columns, errors) for a chunk of upload cells."""
+        rules = validation.rules_for(self.schema, self.model)
+        return validation.validate_columns(columns, count, rules, start, extra)
+
+    def data_columns(self) -> List[str]:
+        """Attribute names shared by the budget and stage models (everything but the id)."""
+        return [attr.key for attr in inspect(self.model).column_attrs if attr.key != "id"]
+
+
+OPERATING_BUDGET_UPLOADS = StageTarget(
+    models.OperatingBudget, models.OperatingBudgetStage, schemas.OperatingBudgetCreate, "budget_amount",
+    ("fiscal_year", "fund_code", "program_code", "account", "deptid", "operating_unit", "class_", "project_id"),
+)
+SUPPLIER_BUDGET_UPLOADS = StageTarget(
+    models.SupplierBudget, models.SupplierBudgetStage, schemas.SupplierBudgetCreate, "amount",
+    ("fiscal_year", "fund_code", "program_code", "account", "deptid", "operating_unit", "project_id", "vendor_id"),
+)
+CONSTRUCTION_BUDGET_UPLOADS = StageTarget(
+    models.ConstructionBudget, models.ConstructionBudgetStage, schemas.ConstructionBudgetCreate, "monetary_amount",
+    ("budget_period", "fund_code", "program_code", "project_id", "activity_id"),
+)
+
+
+def _rows(columns: Mapping[str, Sequence[Any]]) -> List[dict]:
+    return [dict(zip(columns, cells)) for cells in zip(*columns.values())]
+
+
+@dataclass
+class StagedUpload:
+    token: str
+    headers: List[str]
+    sample: List[dict] = field(default_factory=list)
+    row_count: int = 0
+    total_amount: float = 0.0
+    errors: List[dict] = field(default_factory=list)
+    # merge.MergeDiff for an upload previewed in merge mode
+    diff: Optional[Any] = None
+
+
+def purge_expired(db: Session, target: StageTarget) -> None:
+    stage = target.stage_model
+    db.execute(delete(stage).where(stage.created_at < datetime.utcnow() - STAGING_TTL))
+    db.commit()
+
+
+def stage_upload(
+    db: Session,
+    target: StageTarget,
+    headers: Sequence[str],
+    chunks: Iterable[Mapping[str, List[str]]],
+    sample_size: int = SAMPLE_SIZE,
+) -> StagedUpload:
+    """
+    Validate and stage an upload, given as chunks of cells per header
+    (ExcelRowReader.column_chunks). Every chunk is validated so the report
+    lists all bad rows, but if any row fails nothing is left staged.
+    """
+    purge_expired(db, target)
+    upload = StagedUpload(token=secrets.token_hex(16), headers=list(headers))
+    stmt = insert(target.stage_model)
+    try:
+        for chunk in chunks:
+            count = len(next(iter(chunk.values()), []))
+            if len(upload.sample) < sample_size:
+                wanted = sample_size - len(upload.sample)
+                upload.sample.extend(_rows({name: cells[:wanted] for name, cells in chunk.items()}))
+            first = upload.row_count + 1
+            extra = {"upload_token": [upload.token] * count, "row_no": range(first, first + count)}
+            valid, errors = target.validate(chunk, count, first, extra)
+            upload.errors.extend(errors)
+            if not upload.errors:
+                db.execute(stmt, valid)
+                upload.total_amount += sum(row[target.amount_field] or 0 for row in valid)
+            upload.row_count += count
+        if upload.errors:
+            db.rollback()
+        else:
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return upload
+
+
+def claim_upload(db: Session, target: StageTarget, token: str) -> Optional[str]:
+    """
+    Take a staged upload for confirming by moving its rows to a fresh token,
+    or return None if no rows have `token`. Does not commit. The UPDATE locks
+    the rows, so of two concurrent confirms only one can claim them, even
+    under snapshot isolation where both could otherwise read them.
+    """
+    stage = target.stage_model
+    claimed = secrets.token_hex(16)
+    stmt = update(stage).where(stage.upload_token == token).values(upload_token=claimed)
+    return claimed if db.execute(stmt).rowcount else None
+
+
+def commit_upload(db: Session, target: StageTarget, token: str) -> List[int]:
+    """
+    Copy a staged upload into its budget table with INSERT ... SELECT and drop
+    the staged rows. Returns the new ids, or an empty list for an unknown token.
+    """
+    stage = target.stage_model
+    names = target.data_columns()
+    try:
+        token = claim_upload(db, target, token)
+        if token is None:
+            db.rollback()
+            return []
+        rows = (
+            select(*[getattr(stage, name) for name in names])
+            .where(stage.upload_token == token)
+            .order_by(stage.row_no)
+        )
+        created = crud.insert_select(db, target.model, names, rows)
+        if target.model is models.OperatingBudget:
+            summary.record_staged(db, stage, token)
+        db.execute(delete(stage).where(stage.upload_token == token))
+        if created:
+            cache.bump(db, target.model)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    textindex.record_pairs(db, target.model, created)
+    return sorted(row_id for row_id, _ in created)
+
+
+def discard_upload(db: Session, target: StageTarget, token: str) -> None:
+    stage = target.stage_model
+    db.execute(delete(stage).where(stage.upload_token == token))
+    db.commit()
+
+
+def fetch_created(db: Session, target: StageTarget, ids: Sequence[int], limit: int = CONFIRM_RENDER_LIMIT):
+    """Load the first `limit` rows created by a confirmed upload for rendering."""
+    if not ids:
+        return []
+    model = target.model
+    return db.query(model).filter(model.id.in_(list(ids[:limit]))).order_by(model.id).all()
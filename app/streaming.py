@@ -0,0 +1,23 @@
+"""
+Streamed rendering for the UI row templates.
+
+TemplateResponse renders a whole template into one string before sending
+it. With paging turned off (UI_PAGE_SIZE=0) a fragment can hold tens of
+thousands of rows. template_response instead renders through Jinja's
+``Template.stream()``. Paired with an iterator that fetches rows from a
+server-side cursor (crud.stream_*), bytes reach the client as rows are
+read, and the worker never holds the full result or HTML in memory.
+"""
+from typing import Any, Dict
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+
+# Jinja yields one event per tag / expression; send them in batches
+STREAM_BUFFER_EVENTS = 500
+
+
+def template_response(templates: Jinja2Templates, name: str, context: Dict[str, Any]) -> StreamingResponse:
+    stream = templates.get_template(name).stream(context)
+    stream.enable_buffering(STREAM_BUFFER_EVENTS)
+    return StreamingResponse(stream, media_type="text/html; charset=utf-8")
@@ -0,0 +1,197 @@
+"""
+Incrementally maintained totals for the operating budget.
+
+OPERATING_BUDGET_SUMMARY holds SUM(BUDGET_AMOUNT) and COUNT(*) per
+(fiscal_year, fund_code, program_code, deptid).  Every write path applies the
+delta for the rows it touched inside its own transaction, so reading totals
+costs O(groups) rather than a scan of OPERATING_BUDGET.  Missing key values are
+stored as 0 / "" because the key columns are part of a unique index.
+
+If the table ever drifts (e.g. after manual SQL against OPERATING_BUDGET),
+recompute it with:
+
+    python -m app.summary rebuild
+"""
+import argparse
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, literal_column, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .filters import EQ, PREFIX, FilterField, FilterSpec
+
+KEY_ATTRS = ("fiscal_year", "fund_code", "program_code", "deptid")
+
+SUMMARY_FILTERS = FilterSpec(
+    models.OperatingBudgetSummary,
+    [
+        FilterField("fiscal_year", "fiscal_year", EQ, int),
+        FilterField("fund_code", "fund_code", PREFIX),
+        FilterField("program_code", "program_code", PREFIX),
+        FilterField("deptid", "deptid", PREFIX),
+    ],
+)
+
+Key = Tuple[int, str, str, str]
+
+
+def key_of(row: Any) -> Key:
+    fiscal_year, fund_code, program_code, deptid = (getattr(row, attr) for attr in KEY_ATTRS)
+    return (fiscal_year or 0, fund_code or "", program_code or "", deptid or "")
+
+
+def row_deltas(rows: Iterable[Any], sign: int = 1) -> Dict[Key, List[float]]:
+    """Group rows (ORM objects or schemas) into {key: [amount delta, count delta]}."""
+    deltas: Dict[Key, List[float]] = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        delta = deltas[key_of(row)]
+        delta[0] += sign * (row.budget_amount or 0)
+        delta[1] += sign
+    return deltas
+
+
+def _key_params(key: Key) -> dict:
+    return {f"k_{attr}": value for attr, value in zip(KEY_ATTRS, key)}
+
+
+def _key_match(table) -> list:
+    return [table.c[attr.upper()] == bindparam(f"k_{attr}") for attr in KEY_ATTRS]
+
+
+def _existing_keys(db: Session, keys: Iterable[Key]) -> set:
+    """Which of `keys` already have a summary row (one query over a superset)."""
+    summary = models.OperatingBudgetSummary
+    columns = [getattr(summary, attr) for attr in KEY_ATTRS]
+    values = list(zip(*keys))
+    stmt = select(*columns).where(*[column.in_(set(vals)) for column, vals in zip(columns, values)])
+    wanted = set(keys)
+    return {tuple(row) for row in db.execute(stmt)} & wanted
+
+
+def apply_deltas(db: Session, deltas: Dict[Key, Sequence[float]]) -> None:
+    """
+    Add amount/count deltas to their summary rows. Does not commit. Existing
+    groups are updated with one executemany and new ones inserted with another,
+    so the cost is a few round trips however many groups a write touches.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+    if not deltas:
+        return
+    table = models.OperatingBudgetSummary.__table__
+    for attempt in range(3):
+        existing = _existing_keys(db, deltas)
+        new = [key for key in deltas if key not in existing]
+        if not new:
+            break
+        try:
+            with db.begin_nested():
+                db.execute(insert(table), [
+                    {attr.upper(): value for attr, value in zip(KEY_ATTRS, key)}
+                    | {"BUDGET_AMOUNT": deltas[key][0], "ROW_COUNT": deltas[key][1]}
+                    for key in new
+                ])
+            break
+        except IntegrityError:
+            # Another writer created some of the groups first; look again
+            if attempt == 2:
+                raise
+    changed = [key for key in deltas if key in existing]
+    if changed:
+        stmt = update(table).where(*_key_match(table)).values(
+            BUDGET_AMOUNT=table.c.BUDGET_AMOUNT + bindparam("d_amount"),
+            ROW_COUNT=table.c.ROW_COUNT + bindparam("d_count"),
+        )
+        db.execute(stmt, [
+            dict(_key_params(key), d_amount=deltas[key][0], d_count=deltas[key][1]) for key in changed
+        ])
+    emptied = [key for key in changed if deltas[key][1] < 0]
+    if emptied:
+        stmt = delete(table).where(*_key_match(table), table.c.ROW_COUNT <= 0)
+        db.execute(stmt, [_key_params(key) for key in emptied])
+
+
+def record_rows(db: Session, rows: Iterable[Any], sign: int = 1) -> None:
+    """Count inserted (sign=1) or deleted (sign=-1) operating budget rows."""
+    apply_deltas(db, row_deltas(rows, sign))
+
+
+def record_update(db: Session, old_key: Key, old_amount: Optional[float], row: Any) -> None:
+    """Move an updated row's amount from its old group to its current one."""
+    deltas = row_deltas([row])
+    deltas[old_key][0] -= old_amount or 0
+    deltas[old_key][1] -= 1
+    apply_deltas(db, deltas)
+
+
+def key_column(source, attr: str):
+    """
+    A key column with NULL mapped to 0 / "", as stored in the summary table.
+    The default is inlined rather than bound: MSSQL matches SELECT and GROUP BY
+    expressions by their text, and two bound parameters never match.
+    """
+    default = literal_column("0") if attr == "fiscal_year" else literal_column("''")
+    return func.coalesce(getattr(source, attr), default)
+
+
+def _grouped(source, amount_column, where: Sequence[Any] = ()):
+    keys = [key_column(source, attr) for attr in KEY_ATTRS]
+    return (
+        select(*keys, func.coalesce(func.sum(amount_column), literal_column("0")), func.count())
+        .where(*where)
+        .group_by(*keys)
+    )
+
+
+def record_staged(db: Session, stage_model, token: str) -> None:
+    """Count the rows of a staged upload that was just copied into OPERATING_BUDGET."""
+    stmt = _grouped(stage_model, stage_model.budget_amount, [stage_model.upload_token == token])
+    apply_deltas(db, {tuple(row[:4]): (row[4], row[5]) for row in db.execute(stmt)})
+
+
+def refresh_fiscal_years(db: Session, fiscal_years: Iterable[int]) -> None:
+    """Recompute the summary rows of whole fiscal years after a set-based change. Does not commit."""
+    years = sorted({year or 0 for year in fiscal_years})
+    if not years:
+        return
+    budget, summary = models.OperatingBudget, models.OperatingBudgetSummary
+    db.execute(delete(summary).where(summary.fiscal_year.in_(years)))
+    where = [key_column(budget, "fiscal_year").in_(years)]
+    db.execute(_insert_grouped(_grouped(budget, budget.budget_amount, where)))
+
+
+def _insert_grouped(grouped):
+    summary = models.OperatingBudgetSummary
+    columns = [getattr(summary, attr) for attr in KEY_ATTRS] + [summary.budget_amount, summary.row_count]
+    return insert(summary).from_select(columns, grouped)
+
+
+def rebuild(db: Session) -> int:
+    """Recompute the whole summary table from OPERATING_BUDGET. Returns the number of groups."""
+    budget, summary = models.OperatingBudget, models.OperatingBudgetSummary
+    try:
+        db.execute(delete(summary))
+        db.execute(_insert_grouped(_grouped(budget, budget.budget_amount)))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db.execute(select(func.count()).select_from(summary)).scalar_one()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from .database import Base, SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Maintain the OPERATING_BUDGET_SUMMARY table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        groups = rebuild(db)
+    print(f"Rebuilt OPERATING_BUDGET_SUMMARY: {groups} groups")
+
+
+if __name__ == "__main__":
+    main()
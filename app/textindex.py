@@ -0,0 +1,190 @@
+"""
+In-process trigram index for the free-text description columns.
+
+``LIKE '%term%'`` cannot use the B-tree index on DESCR / LINE_DESCR, so every
+contains-search scans the table. A TrigramIndex maps each lower-cased
+three-character sequence to the ids of the rows containing it; a search term
+resolves to the intersection of its trigrams' postings, which is then checked
+against the stored text. The resulting ids are added to the SQL query next to
+the usual ``ILIKE``, so the database still verifies every match.
+
+Indexes are built per database at startup (``build``) and kept current by the
+crud write paths after they commit. They only see writes made by this
+process: with several workers, rows another worker writes would silently
+drop out of search results. So the index is off unless TEXT_INDEX=1, which
+is only safe for a single-worker deployment.
+"""
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, false, select
+from sqlalchemy.engine import Engine
+
+from . import models
+
+# The free-text column indexed for each table
+TEXT_COLUMNS = {
+    models.OperatingBudget: "descr",
+    models.SupplierBudget: "descr",
+    models.ConstructionBudget: "line_descr",
+}
+# Above this many candidates the id list costs more than it saves
+MAX_CANDIDATES = 5000
+BUILD_CHUNK_SIZE = 10000
+
+
+def enabled() -> bool:
+    return os.getenv("TEXT_INDEX", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Set[int]] = {}
+        self._texts: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def _remove(self, row_id: int) -> None:
+        old = self._texts.pop(row_id, None)
+        if old is None:
+            return
+        for gram in trigrams(old):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def update(self, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+        """Index (id, text) pairs, replacing any previous text for those ids."""
+        with self._lock:
+            postings, texts = self._postings, self._texts
+            for row_id, text in rows:
+                if row_id in texts:
+                    self._remove(row_id)
+                text = (text or "").lower()
+                texts[row_id] = text
+                for gram in trigrams(text):
+                    ids = postings.get(gram)
+                    if ids is None:
+                        postings[gram] = {row_id}
+                    else:
+                        ids.add(row_id)
+
+    def remove(self, ids: Iterable[int]) -> None:
+        with self._lock:
+            for row_id in ids:
+                self._remove(row_id)
+
+    def search(self, term: str, limit: Optional[int] = None) -> Optional[Set[int]]:
+        """
+        Ids whose text contains `term` (case-insensitive). Returns None when the
+        term is too short to narrow the search or matches more than `limit` rows.
+        """
+        term = term.lower()
+        grams = trigrams(term)
+        if not grams:
+            return None
+        with self._lock:
+            postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+            candidates = postings[0].intersection(*postings[1:])
+            texts = self._texts
+        matches = set()
+        # Trigram hits can be false positives ("abcd" has the trigrams of
+        # "abc bcd"); stop as soon as the term proves too common to help
+        for row_id in candidates:
+            text = texts.get(row_id)
+            if text is not None and term in text:
+                matches.add(row_id)
+                if limit is not None and len(matches) > limit:
+                    return None
+        return matches
+
+
+_indexes: Dict[Tuple[Any, ...], TrigramIndex] = {}
+
+
+def _bind_key(bind: Engine, model) -> Tuple[Any, ...]:
+    # Sync and async engines on the same database share an index
+    url = bind.url
+    return (url.get_backend_name(), url.host, url.port, url.database, model)
+
+
+def index_for(bind: Optional[Engine], model) -> Optional[TrigramIndex]:
+    if bind is None or model not in TEXT_COLUMNS:
+        return None
+    return _indexes.get(_bind_key(bind, model))
+
+
+def _iter_texts(bind: Engine, model) -> Iterator[list]:
+    column = getattr(model, TEXT_COLUMNS[model])
+    stmt = select(model.id, column).execution_options(yield_per=BUILD_CHUNK_SIZE)
+    with bind.connect() as conn:
+        for partition in conn.execute(stmt).partitions():
+            yield partition
+
+
+def build(bind: Engine, tables: Iterable[Any] = tuple(TEXT_COLUMNS)) -> Dict[str, int]:
+    """(Re)build the indexes for `bind`. Returns the number of rows indexed per table."""
+    sizes = {}
+    for model in tables:
+        index = TrigramIndex()
+        for partition in _iter_texts(bind, model):
+            index.update(partition)
+        _indexes[_bind_key(bind, model)] = index
+        sizes[model.__tablename__] = len(index)
+    return sizes
+
+
+def drop(bind: Engine) -> None:
+    for key in [key for key in _indexes if key[:4] == _bind_key(bind, None)[:4]]:
+        del _indexes[key]
+
+
+def contains_clause(bind: Optional[Engine], model, attr: str, term: str, clause):
+    """Narrow an ILIKE contains-clause to the index's matching ids when possible."""
+    if TEXT_COLUMNS.get(model) != attr:
+        return clause
+    index = index_for(bind, model)
+    if index is None:
+        return clause
+    ids = index.search(term, limit=MAX_CANDIDATES)
+    if ids is None:
+        return clause
+    if not ids:
+        return false()
+    # Rendered inline so the list stays under SQL Server's parameter limit
+    return model.id.in_(bindparam("text_ids", sorted(ids), expanding=True, literal_execute=True)) & clause
+
+
+# Write hooks, called by the crud paths after their transaction commits
+
+def record_rows(db, model, rows: Iterable[Any]) -> None:
+    """Index ORM objects (or any objects with `id` and the text attribute) that were written."""
+    index = index_for(db.get_bind(), model)
+    if index is not None:
+        attr = TEXT_COLUMNS[model]
+        index.update((row.id, getattr(row, attr)) for row in rows)
+
+
+def record_pairs(db, model, pairs: Iterable[Tuple[int, Optional[str]]]) -> None:
+    index = index_for(db.get_bind(), model)
+    if index is not None:
+        index.update(pairs)
+
+
+def forget(db, model, ids: Iterable[int]) -> None:
+    index = index_for(db.get_bind(), model)
+    if index is not None:
+        index.remove(ids)
+
+
+def is_indexed(db, model) -> bool:
+    return index_for(db.get_bind(), model) is not None
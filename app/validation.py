@@ -0,0 +1,210 @@
+"""
+Columnar validation for bulk-upload chunks.
+
+Validating an upload row by row through Pydantic costs a model instance per
+row. Here each column of a chunk is checked at once with NumPy's vectorised
+string and float operations. The checks cover required values, integer and
+number parsing, Numeric(p, s) digit limits and String(n) lengths, with
+chartfield codes zero-padded first. The rules come from the upload schema
+and the budget model, so they follow the same field definitions as the REST API.
+
+``validate_columns`` returns the typed rows, ready to insert, plus an error
+per failing (row, field), in row order. Like the schema, a string field
+accepts a blank cell as "". A blank number, or a blank in an Optional field
+with no default, counts as missing: an error when the field is required, and
+None otherwise.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import repeat
+from operator import itemgetter
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union, get_args, get_origin
+
+import numpy as np
+from numpy.dtypes import StringDType
+from sqlalchemy import Numeric, String, inspect
+
+from .excel import ZERO_PAD
+
+TYPE_NAMES = {int: "integer", float: "number", str: "string"}
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    name: str
+    kind: type
+    required: bool
+    # Whether a blank cell counts as a missing value rather than ""
+    blank_is_missing: bool = True
+    # Header accepted in place of `name` (the schema alias, e.g. "class")
+    alias: Optional[str] = None
+    max_length: Optional[int] = None
+    # A Numeric(p, s) column holds values below 10 ** (p - s)
+    max_integer_digits: Optional[int] = None
+    # Width a short chartfield code is zero-padded to
+    width: Optional[int] = None
+
+
+def _field_kind(annotation) -> Tuple[type, bool]:
+    """The scalar type of a schema field and whether it is Optional."""
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        return args[0], True
+    return annotation, False
+
+
+@lru_cache(maxsize=None)
+def rules_for(schema, model) -> Tuple[ColumnRule, ...]:
+    columns = {attr.key: attr.columns[0] for attr in inspect(model).column_attrs}
+    rules = []
+    for name, info in schema.model_fields.items():
+        kind, optional = _field_kind(info.annotation)
+        column_type = columns[name].type
+        max_length = max_digits = None
+        if isinstance(column_type, String):
+            max_length = column_type.length
+        if isinstance(column_type, Numeric) and column_type.precision is not None:
+            max_digits = column_type.precision - (column_type.scale or 0)
+        rules.append(ColumnRule(
+            name=name,
+            kind=kind,
+            required=info.is_required(),
+            blank_is_missing=kind is not str or (optional and info.is_required()),
+            alias=info.alias,
+            max_length=max_length,
+            max_integer_digits=max_digits,
+            width=ZERO_PAD.get(name),
+        ))
+    return tuple(rules)
+
+
+def _header(headers: Sequence[str], rule: ColumnRule) -> Optional[str]:
+    for header in (rule.name, rule.alias):
+        if header and header in headers:
+            return header
+    return None
+
+
+def _parse_numbers(text: np.ndarray, blank: np.ndarray) -> np.ndarray:
+    """Floats for `text`, NaN for blanks and anything unparseable."""
+    text = np.where(blank, "nan", text)
+    try:
+        return text.astype(float)
+    except ValueError:
+        # Only a chunk with a bad value pays for the per-cell fallback
+        numbers = np.empty(len(text))
+        for i, value in enumerate(text.tolist()):
+            try:
+                numbers[i] = float(value)
+            except ValueError:
+                numbers[i] = np.nan
+        return numbers
+
+
+def _to_python(numbers: np.ndarray, kind: type) -> List[Any]:
+    missing = np.isnan(numbers)
+    if kind is int:
+        values = np.where(missing, 0, numbers).astype(np.int64).astype(object)
+    else:
+        values = numbers.astype(object)
+    values[missing] = None
+    return values.tolist()
+
+
+def validate_columns(
+    columns: Mapping[str, Sequence[Any]],
+    count: int,
+    rules: Sequence[ColumnRule],
+    start: int = 1,
+    extra: Optional[Mapping[str, Sequence[Any]]] = None,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Validate `count` rows of cells given as a list per header. Returns
+    (rows, errors): the rows as dicts of typed values keyed by field name
+    (empty if anything failed), and one error per failing (row, field),
+    numbered from `start`. `extra` adds already-typed columns to every row.
+    """
+    row_numbers = np.arange(start, start + count)
+    failures: List[Tuple[np.ndarray, int, str, str]] = []
+    values: Dict[str, Any] = {}
+
+    for order, rule in enumerate(rules):
+        header = _header(list(columns), rule)
+        if header is None:
+            cells: Sequence[Any] = [""] * count
+        else:
+            cells = ["" if cell is None else cell for cell in columns[header]]
+        text = np.array(cells, dtype=StringDType())
+        blank = (text == "") | np.strings.isspace(text)
+        if header is None:
+            missing = np.ones(count, dtype=bool)
+        elif rule.blank_is_missing:
+            missing = blank
+        else:
+            missing = np.zeros(count, dtype=bool)
+
+        def fail(mask, message):
+            if mask.any():
+                failures.append((row_numbers[mask], order, rule.name, message))
+
+        if rule.required:
+            fail(missing, "Field required")
+
+        if rule.kind is str:
+            if rule.width:
+                # Longer codes are left to the column's String(n) limit below
+                text = np.where(blank, text, np.strings.zfill(text, rule.width))
+                cells = text.tolist()
+            if rule.max_length:
+                fail(np.strings.str_len(text) > rule.max_length,
+                     f"String should have at most {rule.max_length} characters")
+            if header is None:
+                values[rule.name] = None
+            elif rule.blank_is_missing:
+                values[rule.name] = np.where(missing, None, np.array(cells, dtype=object)).tolist()
+            else:
+                values[rule.name] = cells
+            continue
+
+        numbers = _parse_numbers(text, blank)
+        finite = np.isfinite(numbers)
+        bad = ~blank & ~finite
+        if rule.kind is int:
+            bad |= finite & (numbers != np.floor(np.where(finite, numbers, 0)))
+        fail(bad, f"Input should be a valid {TYPE_NAMES.get(rule.kind, rule.kind.__name__)}")
+        if rule.max_integer_digits is not None:
+            limit = 10.0 ** rule.max_integer_digits
+            fail(finite & (np.abs(numbers) >= limit), f"Number should be less than {limit:,.0f} in magnitude")
+        values[rule.name] = numbers
+
+    if failures:
+        report = sorted(
+            (row, order, field, message)
+            for rows, order, field, message in failures
+            for row in rows.tolist()
+        )
+        return [], [{"row": row, "field": field, "message": message} for row, _, field, message in report]
+
+    names = [rule.name for rule in rules]
+    cells_by_field = [
+        [None] * count if values[rule.name] is None
+        else values[rule.name] if rule.kind is str
+        else _to_python(values[rule.name], rule.kind)
+        for rule in rules
+    ]
+    if extra:
+        names += list(extra)
+        cells_by_field += list(extra.values())
+    return list(map(dict, map(zip, repeat(names), zip(*cells_by_field)))), []
+
+
+def validate_records(
+    records: Sequence[Mapping[str, Any]],
+    headers: Sequence[str],
+    rules: Sequence[ColumnRule],
+    start: int = 1,
+):
+    """validate_columns for a chunk of row dicts, as produced by ExcelRowReader."""
+    wanted = {_header(headers, rule) for rule in rules} - {None}
+    columns = {header: list(map(itemgetter(header), records)) for header in headers if header in wanted}
+    return validate_columns(columns, len(records), rules, start)
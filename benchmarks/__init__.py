@@ -0,0 +1 @@
+"""Performance benchmarks for the budget app (see benchmarks/run.py)."""
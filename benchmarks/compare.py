@@ -0,0 +1,41 @@
+"""
+Compare two benchmark result files.
+
+    python -m benchmarks.compare baseline.json candidate.json
+
+Prints the median time of every (table, rows, scenario) present in both
+files and the candidate/baseline ratio, slowest regressions first.
+"""
+import argparse
+import json
+from typing import Dict, Tuple
+
+
+def _medians(path: str) -> Dict[Tuple[str, int, str], float]:
+    with open(path) as f:
+        report = json.load(f)
+    return {(r["table"], r["rows"], r["scenario"]): r["median_ms"] for r in report["results"]}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.0,
+                        help="only show rows whose ratio differs from 1 by at least this much")
+    args = parser.parse_args(argv)
+
+    baseline, candidate = _medians(args.baseline), _medians(args.candidate)
+    rows = []
+    for key in baseline.keys() & candidate.keys():
+        before, after = baseline[key], candidate[key]
+        ratio = after / before if before else float("inf")
+        if abs(ratio - 1) >= args.threshold:
+            rows.append((ratio, key, before, after))
+    print(f"{'table':>12} {'rows':>9} {'scenario':<22} {'baseline ms':>12} {'candidate ms':>13} {'ratio':>7}")
+    for ratio, (table, size, scenario), before, after in sorted(rows, reverse=True):
+        print(f"{table:>12} {size:>9} {scenario:<22} {before:>12.2f} {after:>13.2f} {ratio:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Seeded synthetic budget data at district scale.
+
+Rows follow the shape of real KHSD budget extracts rather than uniform
+noise: a handful of funds dominated by the general fund, program, site and
+vendor codes with long-tailed (Zipf) popularity, account object codes
+weighted towards salaries and benefits, and log-normal amounts scaled by
+account type. The same seed always produces the same rows, so runs on
+different commits measure the same data.
+"""
+import math
+import random
+from decimal import Decimal
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from app import models
+
+BASE_YEAR = 2026
+# (fiscal year offset from BASE_YEAR, weight): recent years hold more rows
+YEARS = [(-3, 1), (-2, 2), (-1, 3), (0, 4)]
+FUNDS = [
+    ("01", 62), ("06", 6), ("09", 4), ("11", 5), ("12", 6),
+    ("13", 8), ("21", 3), ("25", 2), ("35", 2), ("40", 2),
+]
+CAPITAL_FUNDS = [("21", 5), ("25", 2), ("35", 3), ("40", 2)]
+# Object code series: (first digit, weight, median amount, descriptions)
+ACCOUNT_SERIES = [
+    ("1", 30, 60000, ["Certificated Teacher Salaries", "Certificated Supervisor Salaries", "Substitute Salaries"]),
+    ("2", 20, 35000, ["Classified Support Salaries", "Clerical Salaries", "Custodial Overtime"]),
+    ("3", 24, 18000, ["STRS Retirement", "PERS Retirement", "Health And Welfare Benefits", "Workers Compensation"]),
+    ("4", 12, 4000, ["Instructional Materials", "Books And Reference", "Materials And Supplies", "Noncapitalized Equipment"]),
+    ("5", 11, 7500, ["Travel And Conferences", "Rentals And Repairs", "Professional Services", "Utilities"]),
+    ("6", 2, 90000, ["Buildings And Improvements", "Equipment Replacement"]),
+    ("7", 1, 25000, ["Interfund Transfers Out", "Indirect Costs"]),
+]
+SITES = [
+    "Arvin HS", "Bakersfield HS", "Centennial HS", "East Bakersfield HS", "Foothill HS",
+    "Frontier HS", "Golden Valley HS", "Highland HS", "Independence HS", "Kern Valley HS",
+    "Liberty HS", "Mira Monte HS", "North HS", "Ridgeview HS", "Shafter HS", "South HS",
+    "Stockdale HS", "West HS", "Del Oro HS", "Nueva Continuation", "Central Valley Continuation",
+    "Vista West Continuation", "Career Technical Education Center", "Adult School",
+    "District Office", "Maintenance And Operations", "Transportation", "Food Services",
+    "Technology Services", "Human Resources", "Business Services", "Special Education",
+]
+OPERATING_UNITS = [("KHSD", 80), ("ADLT", 8), ("CTEC", 7), ("CHTR", 5)]
+CLASSES = [("000", 70), ("100", 12), ("200", 10), ("300", 8)]
+ACTIVITIES = ["DESIGN", "CONSTR", "INSPECT", "FURNISH", "CLOSEOUT", "CONTING"]
+
+
+def _zipf(n: int, s: float = 1.1) -> List[float]:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total, out = 0.0, []
+    for weight in weights:
+        total += weight
+        out.append(total)
+    return out
+
+
+class _Picker:
+    """Weighted choice with precomputed cumulative weights."""
+
+    def __init__(self, rng: random.Random, values: Sequence, weights: Sequence[float]):
+        self.rng = rng
+        self.values = list(values)
+        self.cum = _cumulative(weights)
+
+    def __call__(self):
+        return self.rng.choices(self.values, cum_weights=self.cum)[0]
+
+
+def _pairs(rng: random.Random, pairs: Sequence[Tuple[object, float]]) -> _Picker:
+    return _Picker(rng, [value for value, _ in pairs], [weight for _, weight in pairs])
+
+
+class ChartfieldGenerator:
+    """Shared chartfield pickers for one seeded stream of rows."""
+
+    def __init__(self, seed: int):
+        rng = self.rng = random.Random(seed)
+        self.year = _Picker(rng, [BASE_YEAR + offset for offset, _ in YEARS], [w for _, w in YEARS])
+        self.fund = _pairs(rng, FUNDS)
+        self.capital_fund = _pairs(rng, CAPITAL_FUNDS)
+        self.program = _Picker(rng, [f"{code:04d}" for code in range(100, 100 + 60 * 10, 10)], _zipf(60))
+        self.series = _Picker(rng, ACCOUNT_SERIES, [series[1] for series in ACCOUNT_SERIES])
+        self.site = _Picker(rng, list(enumerate(SITES)), _zipf(len(SITES), 0.8))
+        self.operating_unit = _pairs(rng, OPERATING_UNITS)
+        self.class_ = _pairs(rng, CLASSES)
+        self.vendor = _Picker(rng, list(range(1, 2001)), _zipf(2000))
+        self.project = _Picker(rng, list(range(1, 301)), _zipf(300, 0.9))
+
+    def account(self):
+        digit, _, median, descriptions = self.series()
+        minor = self.rng.randrange(100, 1000, 10)
+        return f"{digit}{minor:03d}", median, self.rng.choice(descriptions)
+
+    def amount(self, median: float) -> float:
+        # Log-normal around the series median, rounded to cents
+        return round(median * math.exp(self.rng.gauss(0, 0.9)), 2)
+
+    def deptid(self):
+        index, name = self.site()
+        return f"{100 + index * 5:04d}", name
+
+
+def operating_rows(n: int, seed: int = 0) -> Iterator[Dict]:
+    gen = ChartfieldGenerator(seed)
+    for _ in range(n):
+        account, median, account_descr = gen.account()
+        deptid, site = gen.deptid()
+        yield {
+            "fiscal_year": gen.year(),
+            "fund_code": gen.fund(),
+            "program_code": gen.program(),
+            "account": account,
+            "deptid": deptid,
+            "operating_unit": gen.operating_unit(),
+            "class_": gen.class_(),
+            "project_id": f"P{gen.project():05d}" if gen.rng.random() < 0.15 else "",
+            "budget_amount": gen.amount(median),
+            "descr": f"{account_descr} - {site}",
+        }
+
+
+def supplier_rows(n: int, seed: int = 0) -> Iterator[Dict]:
+    gen = ChartfieldGenerator(seed + 1)
+    for _ in range(n):
+        account, median, account_descr = gen.account()
+        deptid, site = gen.deptid()
+        vendor = gen.vendor()
+        yield {
+            "vendor_id": f"V{vendor:07d}",
+            "descr": f"Vendor {vendor} {account_descr}"[:120],
+            "fiscal_year": str(gen.year()),
+            "fund_code": gen.fund(),
+            "program_code": gen.program(),
+            "account": account,
+            "deptid": deptid,
+            "operating_unit": gen.operating_unit(),
+            "project_id": f"P{gen.project():05d}" if gen.rng.random() < 0.2 else None,
+            "business_unit": "KHSD1",
+            "amount": Decimal(str(gen.amount(median / 4))),
+        }
+
+
+def construction_rows(n: int, seed: int = 0) -> Iterator[Dict]:
+    gen = ChartfieldGenerator(seed + 2)
+    for _ in range(n):
+        project = gen.project()
+        _, site = gen.deptid()
+        activity = gen.rng.choice(ACTIVITIES)
+        yield {
+            "budget_period": str(gen.year()),
+            "fund_code": gen.capital_fund(),
+            "program_code": gen.program(),
+            "project_id": f"PRJ-{project:05d}",
+            "activity_id": activity,
+            "line_descr": f"{site} {activity.title()} Phase {gen.rng.randint(1, 4)}",
+            "monetary_amount": Decimal(str(gen.amount(150000))),
+        }
+
+
+GENERATORS = {
+    models.OperatingBudget: operating_rows,
+    models.SupplierBudget: supplier_rows,
+    models.ConstructionBudget: construction_rows,
+}
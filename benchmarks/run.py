@@ -0,0 +1,346 @@
+"""
+Benchmark the app's list, filter, CRUD, bulk upload and export paths.
+
+    python -m benchmarks.run --rows 10k,100k,1M --output results/main.json
+
+Each size loads seeded synthetic rows (benchmarks/datagen.py) into all three
+budget tables, growing one database from the smallest size to the largest,
+and times the routes through the ASGI app in-process. The default database
+is a throwaway SQLite file; --database-url points the run at another
+server, which must be a scratch database because the run writes to it.
+Results, one record per (table, size, scenario), are written as JSON so runs
+can be compared with ``python -m benchmarks.compare old.json new.json``.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+@dataclass
+class TableBench:
+    name: str
+    model: Any
+    schema: Any
+    rest: str
+    ui: str
+    upload: str
+    export: str
+    year_param: str
+    search: Dict[str, str]
+    sort: str
+    narrow: Dict[str, str] = field(default_factory=dict)
+    summary: bool = False
+
+
+def _tables():
+    from app import models, schemas
+
+    return [
+        TableBench(
+            "operating", models.OperatingBudget, schemas.OperatingBudgetCreate,
+            "/budgets", "/", "/budgets/bulk_upload", "/budgets/export", "fiscal_year",
+            {"descr": "salaries"}, "-budget_amount", {"fund_code": "01", "program_code": "0100"}, summary=True,
+        ),
+        TableBench(
+            "supplier", models.SupplierBudget, schemas.SupplierBudgetCreate,
+            "/supplier_budgets", "/supplier_budgets", "/supplier_budgets/bulk_upload",
+            "/supplier_budgets/export", "fiscal_year",
+            {"descr": "retirement"}, "-amount", {"fund_code": "01", "program_code": "0100"},
+        ),
+        TableBench(
+            "construction", models.ConstructionBudget, schemas.ConstructionBudgetCreate,
+            "/construction_budgets", "/construction_budgets", "/construction_budgets/bulk_upload",
+            "/construction_budgets/export", "budget_period",
+            {"line_descr": "closeout"}, "-monetary_amount", {"fund_code": "21", "program_code": "0100"},
+        ),
+    ]
+
+
+def _stats(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "repeat": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p95_ms": round(p95 * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _check(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:300]}")
+    return response
+
+
+class Runner:
+    def __init__(self, client, repeat: int, warmup: int = 1):
+        self.client = client
+        # The REST routers alone, for routes the UI shadows in the full app
+        self.rest_client = None
+        self.repeat = repeat
+        self.warmup = warmup
+        self.results: List[Dict[str, Any]] = []
+
+    def time(self, table: str, rows: int, scenario: str, call: Callable[[], Any], repeat: Optional[int] = None) -> None:
+        for _ in range(self.warmup):
+            call()
+        timings = []
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            call()
+            timings.append(time.perf_counter() - started)
+        self.record(table, rows, scenario, timings)
+
+    def record(self, table: str, rows: int, scenario: str, timings: List[float], **extra) -> None:
+        result = {"table": table, "rows": rows, "scenario": scenario}
+        result.update(_stats(timings))
+        result.update(extra)
+        self.results.append(result)
+        print(f"{table:>12} {rows:>9} {scenario:<22} median {result['median_ms']:>10.2f} ms", file=sys.stderr)
+
+    def get(self, url: str, params=None, headers=None):
+        return lambda: _check(self.client.get(url, params=params, headers=headers))
+
+
+def _load(db, model, rows: Iterator[Dict], count: int, chunk: int = 10000) -> None:
+    from sqlalchemy import insert
+
+    while count > 0:
+        batch = list(islice(rows, min(chunk, count)))
+        if not batch:
+            break
+        db.execute(insert(model), batch)
+        count -= len(batch)
+    db.commit()
+
+
+def _form(row: Dict) -> Dict[str, str]:
+    # Schema field names, with "class" for the operating budget's class_
+    return {("class" if key == "class_" else key): ("" if value is None else str(value)) for key, value in row.items()}
+
+
+def _workbook(bench: TableBench, rows: List[Dict]) -> bytes:
+    from openpyxl import Workbook
+
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet()
+    headers = list(_form(rows[0]))
+    sheet.append(headers)
+    for row in rows:
+        sheet.append([_form(row)[header] for header in headers])
+    buffer = io.BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def bench_table(runner: Runner, bench: TableBench, rows: int, latest_year: str, upload: bytes, crud_rows: List[Dict]) -> None:
+    from app.pagination import encode_cursor
+
+    t, r = bench.name, rows
+    htmx = {"HX-Request": "true"}
+    year = {bench.year_param: latest_year}
+
+    runner.time(t, r, "rest_first_page", runner.get(bench.rest + "/", {"limit": 100}))
+    runner.time(t, r, "rest_deep_page", runner.get(bench.rest + "/", {"limit": 100, "cursor": encode_cursor([rows // 2])}))
+    runner.time(t, r, "rest_filter", runner.get(bench.rest + "/", dict(year, limit=100, **bench.narrow)))
+    runner.time(t, r, "rest_search", runner.get(bench.rest + "/", dict(bench.search, limit=100)))
+    runner.time(t, r, "ui_first_paint", runner.get(bench.ui))
+    runner.time(t, r, "ui_filter_fragment", runner.get(bench.ui, dict(year, **bench.narrow), htmx))
+    runner.time(t, r, "ui_sorted_fragment", runner.get(bench.ui, dict(year, sort=bench.sort), htmx))
+    if bench.summary:
+        runner.time(t, r, "summary", runner.get(bench.rest + "/summary", {"group_by": ["fiscal_year", "fund_code"]}))
+
+    # Single-row CRUD: time each step across the same set of new rows
+    client = runner.client
+    created, timings = [], {"create": [], "read": [], "update": [], "delete": []}
+    for row in crud_rows:
+        started = time.perf_counter()
+        new = _check(client.post(bench.rest + "/", json=_form(row))).json()
+        timings["create"].append(time.perf_counter() - started)
+        created.append((new["id"], row))
+    for row_id, _ in created:
+        started = time.perf_counter()
+        _check(client.get(f"{bench.rest}/{row_id}"))
+        timings["read"].append(time.perf_counter() - started)
+    for row_id, row in created:
+        started = time.perf_counter()
+        updated = _check(runner.rest_client.put(f"{bench.rest}/{row_id}", json=_form(row)))
+        timings["update"].append(time.perf_counter() - started)
+        if updated.json().get("id") != row_id:
+            raise RuntimeError(f"PUT {bench.rest}/{row_id} did not return the updated row: {updated.text[:300]}")
+    for row_id, _ in created:
+        started = time.perf_counter()
+        _check(client.delete(f"{bench.rest}/{row_id}"))
+        timings["delete"].append(time.perf_counter() - started)
+    for step, step_timings in timings.items():
+        runner.record(t, r, f"crud_{step}", step_timings)
+
+    # Bulk upload: preview (parse + validate + stage) then confirm (INSERT ... SELECT)
+    preview, confirm = [], []
+    files = lambda: {"file": ("bench.xlsx", io.BytesIO(upload), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+    for _ in range(max(1, runner.repeat // 2)):
+        started = time.perf_counter()
+        html = _check(client.post(bench.upload + "/preview", files=files())).text
+        preview.append(time.perf_counter() - started)
+        token = re.search(r'name="token" value="([^"]+)"', html).group(1)
+        started = time.perf_counter()
+        _check(client.post(bench.upload, data={"token": token}))
+        confirm.append(time.perf_counter() - started)
+    runner.record(t, r, "upload_preview", preview)
+    runner.record(t, r, "upload_confirm", confirm)
+
+    export = dict(year, **bench.narrow)
+    runner.time(t, r, "export_csv", runner.get(bench.export, dict(export, format="csv")), max(1, runner.repeat // 2))
+    runner.time(t, r, "export_xlsx", runner.get(bench.export, dict(export, format="xlsx")), max(1, runner.repeat // 2))
+
+
+def _rest_app():
+    """
+    The REST routers without the UI. The UI's form handler for PUT
+    /budgets/{id} (and the other tables') is registered first in app.main and
+    shadows the REST update route there.
+    """
+    from fastapi import FastAPI
+
+    from app import metrics, profiler
+    from app.routers import budgets, construction_budgets, supplier_budgets
+
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.add_middleware(profiler.ProfilerMiddleware)
+    for module in (budgets, supplier_budgets, construction_budgets):
+        app.include_router(module.router)
+    return app
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], seed: int, repeat: int, upload_rows: int, crud_rows: int) -> Dict[str, Any]:
+    # Imported here so DATABASE_URL is set before app.database builds its engines
+    import sqlalchemy
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+
+    from app import cache, summary
+    from app.database import Base, SessionLocal, engine
+    from app.main import app
+    from benchmarks import datagen
+
+    Base.metadata.create_all(bind=engine)
+    tables = _tables()
+    streams = {bench.name: datagen.GENERATORS[bench.model](sys.maxsize, seed) for bench in tables}
+    runner = Runner(None, repeat)
+    loaded = 0
+    for size in sorted(sizes):
+        with SessionLocal() as db:
+            for bench in tables:
+                started = time.perf_counter()
+                _load(db, bench.model, streams[bench.name], size - loaded)
+                runner.record(bench.name, size, "load_rows", [time.perf_counter() - started], added=size - loaded)
+            started = time.perf_counter()
+            summary.rebuild(db)
+            runner.record("operating", size, "summary_rebuild", [time.perf_counter() - started])
+            for bench in tables:
+                # The rows bypassed the crud write paths
+                cache.bump(db, bench.model)
+            db.commit()
+        loaded = size
+
+        started = time.perf_counter()
+        with TestClient(app) as client, TestClient(_rest_app()) as rest_client:
+            runner.record("app", size, "startup", [time.perf_counter() - started])
+            runner.client, runner.rest_client = client, rest_client
+            for bench in tables:
+                with SessionLocal() as db:
+                    column = getattr(bench.model, bench.year_param)
+                    latest_year = str(db.execute(select(func.max(column))).scalar())
+                generate = datagen.GENERATORS[bench.model]
+                upload = _workbook(bench, list(generate(upload_rows, seed + 100)))
+                bench_table(runner, bench, size, latest_year, upload, list(generate(crud_rows, seed + 200)))
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "dialect": engine.dialect.name,
+            "seed": seed,
+            "sizes": sorted(sizes),
+            "repeat": repeat,
+            "upload_rows": upload_rows,
+            "crud_rows": crud_rows,
+        },
+        "results": runner.results,
+    }
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1M' -> 1000000."""
+    text = text.strip().lower()
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * scale)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--rows", default="10k", help="comma-separated table sizes, e.g. 10k,100k,1M")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per scenario")
+    parser.add_argument("--upload-rows", type=int, default=1000, help="rows in the bulk upload workbook")
+    parser.add_argument("--crud-rows", type=int, default=20, help="rows created/read/updated/deleted")
+    parser.add_argument("--database-url", help="scratch database to use instead of a temporary SQLite file")
+    parser.add_argument("--query-cache", action="store_true", help="leave the UI query cache on")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(text) for text in args.rows.split(",") if text.strip()]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        os.environ.pop("ASYNC_DATABASE_URL", None)
+        if not args.query_cache:
+            # Repeated identical requests would otherwise time cache hits
+            os.environ["QUERY_CACHE_SIZE"] = "0"
+        report = run(sizes, args.seed, args.repeat, args.upload_rows, args.crud_rows)
+        from app.database import async_engine, engine
+
+        engine.dispose()
+        if async_engine is not None:
+            import asyncio
+
+            asyncio.run(async_engine.dispose())
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,45 @@
+import io
+import os
+import tempfile
+
 import pytest
 
+# Trigram indexes are built by the tests that exercise them, not at app startup
+os.environ["TEXT_INDEX"] = "0"
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 
-from app.database import Base, get_db
+from app import metrics
+from app.cache import query_cache
+from app.database import Base, get_async_db, get_db
 from app.main import app
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# The sync (UI) and async (REST) routes must see the same data, so tests use a
+# throwaway file instead of an in-memory database
+_db_dir = tempfile.TemporaryDirectory()
+_db_path = os.path.join(_db_dir.name, "test.db")
+
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{_db_path}"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Each TestClient runs its own event loop, so async connections are not pooled
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{_db_path}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base.metadata.create_all(bind=engine)
 
+# The app's own engines are instrumented when they are built
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
 def override_get_db():
     db = TestingSessionLocal()
     try:
@@ -20,9 +47,99 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 @pytest.fixture
 def client():
+    # Start every test from empty tables
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Version counters restart with the tables, so cached results would look current
+    query_cache.clear()
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+@pytest.fixture
+def db(client):
+    # A session on the same database the client's requests use
+    with TestingSessionLocal() as session:
+        yield session
+
+
+# Row factories: call with keyword overrides for a request body / schema dict
+
+def _factory(defaults):
+    def make(**overrides):
+        return dict(defaults, **overrides)
+    return make
+
+@pytest.fixture
+def budget_row():
+    return _factory({
+        "fiscal_year": 2050,
+        "fund_code": "01",
+        "program_code": "0100",
+        "account": "4300",
+        "deptid": "D1",
+        "operating_unit": "OU1",
+        "class": "CL1",
+        "project_id": "PJ1",
+        "budget_amount": 10.0,
+        "descr": "Budget row",
+    })
+
+@pytest.fixture
+def supplier_row():
+    return _factory({
+        "vendor_id": "V1",
+        "descr": "Supplier row",
+        "fiscal_year": "2050",
+        "fund_code": "01",
+        "program_code": "0100",
+        "account": "4300",
+        "deptid": "D1",
+        "operating_unit": "OU1",
+        "amount": 10.0,
+    })
+
+@pytest.fixture
+def construction_row():
+    return _factory({
+        "budget_period": "2050",
+        "fund_code": "21",
+        "program_code": "0100",
+        "project_id": "P1",
+        "activity_id": "A1",
+        "line_descr": "Construction row",
+        "monetary_amount": 10.0,
+    })
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+@pytest.fixture
+def xlsx():
+    """
+    Build an in-memory workbook from `rows`: dicts (the first row's keys
+    become the header) or lists. Returns it as an upload's `files`, or as
+    the file object with as_file=True.
+    """
+    openpyxl = pytest.importorskip("openpyxl")
+
+    def build(rows, as_file=False):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        if rows and isinstance(rows[0], dict):
+            header = list(rows[0])
+            rows = [header] + [[row.get(name) for name in header] for row in rows]
+        for row in rows:
+            ws.append(row)
+        buf = io.BytesIO()
+        wb.save(buf)
+        buf.seek(0)
+        return buf if as_file else {"file": ("upload.xlsx", buf, XLSX_TYPE)}
+    return build
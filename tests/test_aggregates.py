@@ -0,0 +1,27 @@
+def test_summary_groups_and_rollup(client, budget_row):
+    client.post("/budgets/", json=budget_row())
+    client.post("/budgets/", json=budget_row(budget_amount=5.0))
+    client.post("/budgets/", json=budget_row(program_code="0200", budget_amount=2.5))
+    client.post("/budgets/", json=budget_row(fund_code="02", budget_amount=1.0))
+
+    response = client.get(
+        "/budgets/summary",
+        params={"group_by": ["fund_code", "program_code"], "fiscal_year": 2050},
+    )
+    assert response.status_code == 200
+    assert [(r["groups"], r["total_amount"], r["row_count"]) for r in response.json()] == [
+        ({"fund_code": "01", "program_code": "0100"}, 15.0, 2),
+        ({"fund_code": "01", "program_code": "0200"}, 2.5, 1),
+        ({"fund_code": "02", "program_code": "0100"}, 1.0, 1),
+    ]
+
+    response = client.get(
+        "/budgets/summary",
+        params={"group_by": ["fund_code", "program_code"], "fiscal_year": 2050, "rollup": True},
+    )
+    subtotals = [(r["groups"], r["total_amount"]) for r in response.json() if r["subtotal"]]
+    assert ({"fund_code": None, "program_code": None}, 18.5) in subtotals
+    assert ({"fund_code": "01", "program_code": None}, 17.5) in subtotals
+    assert len(subtotals) == 3
+
+    assert client.get("/budgets/summary", params={"group_by": "descr"}).status_code == 400
@@ -0,0 +1,26 @@
+import json
+
+from app import batch
+
+
+def test_batch_json_array(client, construction_row):
+    response = client.post("/construction_budgets/batch", json=[construction_row(), construction_row(activity_id="A2")])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["rows"], body["inserted"], len(body["chunks"])) == (2, 2, 1)
+    assert len(client.get("/construction_budgets/").json()) == 2
+    assert client.post("/construction_budgets/batch", json={"not": "a list"}).status_code == 400
+
+
+def test_batch_ndjson_reports_per_chunk(client, monkeypatch, construction_row):
+    monkeypatch.setattr(batch, "BATCH_CHUNK_SIZE", 2)
+    lines = [json.dumps(construction_row()), json.dumps(construction_row()), "{broken", json.dumps(construction_row(monetary_amount="x")), json.dumps(construction_row())]
+    response = client.post(
+        "/construction_budgets/batch",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    body = response.json()
+    assert (body["rows"], body["inserted"]) == (5, 3)
+    assert [(c["first_row"], c["inserted"]) for c in body["chunks"]] == [(1, 2), (3, 0), (5, 1)]
+    assert [(e["row"], e["field"]) for e in body["chunks"][1]["errors"]] == [(3, ""), (4, "monetary_amount")]
@@ -0,0 +1,27 @@
+from itertools import islice
+
+from app import schemas
+from benchmarks import datagen
+from benchmarks.run import _form, parse_size
+
+
+def test_generated_rows_are_seeded_and_valid():
+    for model, generate in datagen.GENERATORS.items():
+        rows = list(generate(50, seed=7))
+        assert rows == list(generate(50, seed=7))
+        assert rows != list(generate(50, seed=8))
+        # A longer run starts with the same rows, so datasets grow consistently
+        assert list(islice(generate(500, seed=7), 50)) == rows
+
+    for row in datagen.operating_rows(20):
+        schemas.OperatingBudgetCreate(**_form(row))
+    for row in datagen.supplier_rows(20):
+        schemas.SupplierBudgetCreate(**row)
+    for row in datagen.construction_rows(20):
+        schemas.ConstructionBudgetCreate(**row)
+
+
+def test_parse_size():
+    assert parse_size("10k") == 10000
+    assert parse_size("1M") == 1000000
+    assert parse_size("250") == 250
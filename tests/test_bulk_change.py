@@ -0,0 +1,36 @@
+def _summary(client):
+    response = client.get("/budgets/summary", params={"group_by": "program_code"})
+    return {r["groups"]["program_code"]: (r["total_amount"], r["row_count"]) for r in response.json()}
+
+
+def test_bulk_update_and_delete_by_filter_and_ids(client, budget_row):
+    ids = [client.post("/budgets/", json=budget_row()).json()["id"] for _ in range(3)]
+    other = client.post("/budgets/", json=budget_row(deptid="D2")).json()["id"]
+
+    change = {"filters": {"deptid": "D1"}, "values": {"program_code": "0200"}}
+    response = client.post("/budgets/bulk_update", params={"dry_run": True}, json=change)
+    assert response.json() == {"affected": 3, "dry_run": True}
+    assert _summary(client) == {"0100": (40.0, 4)}
+
+    response = client.post("/budgets/bulk_update", json=change)
+    assert response.json() == {"affected": 3, "dry_run": False}
+    assert client.get(f"/budgets/{ids[0]}").json()["program_code"] == "0200"
+    assert client.get(f"/budgets/{other}").json()["program_code"] == "0100"
+    assert _summary(client) == {"0100": (10.0, 1), "0200": (30.0, 3)}
+
+    response = client.post("/budgets/bulk_delete", json={"ids": ids[:2]})
+    assert response.json()["affected"] == 2
+    assert _summary(client) == {"0100": (10.0, 1), "0200": (10.0, 1)}
+
+
+def test_bulk_change_rejects_bad_requests(client, budget_row):
+    client.post("/budgets/", json=budget_row())
+    # No selection would touch the whole table
+    assert client.post("/budgets/bulk_delete", json={}).status_code == 400
+    assert client.post("/budgets/bulk_delete", json={"filters": {"bogus": "x"}}).status_code == 400
+    response = client.post(
+        "/budgets/bulk_update",
+        json={"ids": [1], "values": {"fiscal_year": "not a year", "nope": 1}},
+    )
+    assert response.status_code == 422
+    assert {e["field"] for e in response.json()["detail"]} == {"fiscal_year", "nope"}
@@ -1,8 +1,4 @@
-import io
-import json
-
 import pytest
-pd = pytest.importorskip("pandas")
 pytest.importorskip("openpyxl")
 
 
@@ -18,58 +14,87 @@ def test_bulk_upload_form_and_cancel(client):
     assert response.text == ""
 
 
-def test_bulk_upload_preview_and_confirm(client):
-    # Prepare an in-memory Excel file with a single row matching the model headers
-    df = pd.DataFrame([
-        {
-            "fiscal_year": 2022,
-            "fund_code": "F1",
-            "program_code": "P1",
-            "account": "A1",
-            "deptid": "D1",
-            "operating_unit": "OU",
-            "class": "CL",
-            "project_id": "PJ",
-            "budget_amount": 123.45,
-            "descr": "Desc",
-        }
-    ])
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False)
-    buf.seek(0)
+def test_bulk_upload_preview_and_confirm(client, budget_row, xlsx):
+    # An in-memory Excel file with a single row matching the model headers
+    rows = [budget_row(budget_amount=123.45, descr="Desc")]
 
     # POST to preview endpoint
-    response = client.post(
-        "/budgets/bulk_upload/preview",
-        files={"file": ("test.xlsx", buf, 
-                         "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")},
-    )
+    response = client.post("/budgets/bulk_upload/preview", files=xlsx(rows))
     assert response.status_code == 200
     text = response.text
     # Headers should be rendered from columns
     assert "<th>fiscal_year</th>" in text
     assert "<th>descr</th>" in text
 
-    # Extract the hidden JSON payload
-    tag = '<textarea name="rows_json" hidden>'
+    # Only a sample is sent back; the rows stay staged server-side under a token
+    assert "rows_json" not in text
+    assert "1 rows staged, total amount 123.45" in text
+    tag = '<input type="hidden" name="token" value="'
     start = text.find(tag)
     assert start != -1
     start += len(tag)
-    end = text.find("</textarea>", start)
-    rows_json = text[start:end]
-    rows = json.loads(rows_json)
-    assert isinstance(rows, list) and len(rows) == 1
-    assert rows[0]["descr"] == "Desc"
+    token = text[start:text.find('"', start)]
 
     # POST to confirm/upload endpoint
     response2 = client.post(
         "/budgets/bulk_upload",
-        data={"rows_json": rows_json},
+        data={"token": token},
     )
     assert response2.status_code == 200
     html2 = response2.text
     # Confirm that the new row appears in the table
     assert "Desc" in html2
     assert "123.45" in html2
-    assert 'id="budget-' in html2
\ No newline at end of file
+    assert 'id="budget-' in html2
+
+def test_bulk_upload_reports_every_invalid_row_and_stages_nothing(client, construction_row, xlsx):
+    good = construction_row(budget_period="2030", program_code="0200", project_id="PRJ-BULK", line_descr="Bulk valid line")
+    rows = [good, dict(good, monetary_amount="ten"), good, dict(good, monetary_amount="x")]
+    response = client.post("/construction_budgets/bulk_upload/preview", files=xlsx(rows))
+    assert response.status_code == 200
+    assert "<td>2</td><td>monetary_amount</td>" in response.text
+    assert "<td>4</td><td>monetary_amount</td>" in response.text
+    assert 'name="token"' not in response.text
+
+    response = client.post("/construction_budgets/bulk_upload/preview", files=xlsx([good, good]))
+    assert "2 rows staged" in response.text
+    token = response.text.split('name="token" value="')[1].split('"')[0]
+    response = client.post("/construction_budgets/bulk_upload", data={"token": token})
+    assert response.text.count('id="construction-budget-') == 2
+
+    # A token can only be confirmed once
+    response = client.post("/construction_budgets/bulk_upload", data={"token": token})
+    assert response.headers["HX-Retarget"] == "#construction-bulk-preview-container"
+    assert "Upload not found" in response.text
+
+
+def test_confirm_claims_the_token_before_inserting(client, db, monkeypatch, construction_row, xlsx):
+    # Under snapshot isolation a concurrent confirm would still see rows staged under the token
+    from sqlalchemy import func, select
+    from app import crud, staging
+
+    response = client.post("/construction_budgets/bulk_upload/preview", files=xlsx([construction_row()] * 3))
+    token = response.text.split('name="token" value="')[1].split('"')[0]
+    stage = staging.CONSTRUCTION_BUDGET_UPLOADS.stage_model
+    insert_select, still_staged = crud.insert_select, []
+
+    def checked(session, *args):
+        still_staged.append(session.execute(select(func.count()).where(stage.upload_token == token)).scalar())
+        return insert_select(session, *args)
+
+    monkeypatch.setattr(crud, "insert_select", checked)
+    assert len(staging.commit_upload(db, staging.CONSTRUCTION_BUDGET_UPLOADS, token)) == 3
+    assert still_staged == [0]
+    assert staging.commit_upload(db, staging.CONSTRUCTION_BUDGET_UPLOADS, token) == []
+
+
+def test_upload_accepts_blank_string_cells(client, supplier_row, xlsx):
+    # Empty cells in string columns load as "", as the REST API accepts them
+    rows = [supplier_row(vendor_id=None, deptid=None, descr="Blank cells")]
+    response = client.post("/supplier_budgets/bulk_upload/preview", files=xlsx(rows))
+    assert "1 rows staged" in response.text
+    token = response.text.split('name="token" value="')[1].split('"')[0]
+    client.post("/supplier_budgets/bulk_upload", data={"token": token})
+
+    [row] = client.get("/supplier_budgets/", params={"descr": "Blank cells"}).json()
+    assert (row["vendor_id"], row["deptid"]) == ("", "")
@@ -0,0 +1,35 @@
+from app import crud, models, schemas
+from app.cache import QueryCache, query_cache, table_version
+
+
+def test_index_reuses_results_until_a_write(client, db, supplier_row):
+    crud.create_supplier_budget(db, schemas.SupplierBudgetCreate(**supplier_row(descr="Cached row")))
+
+    first = client.get("/supplier_budgets", params={"fund_code": "01"})
+    second = client.get("/supplier_budgets", params={"fund_code": "01"})
+    assert first.status_code == second.status_code == 200
+    assert query_cache.stats()["hits"] == 1
+    assert "Cached row" in second.text
+
+    version = table_version(db, models.SupplierBudget)
+    crud.create_supplier_budget(db, schemas.SupplierBudgetCreate(**supplier_row(descr="Fresh row")))
+    assert table_version(db, models.SupplierBudget) == version + 1
+
+    third = client.get("/supplier_budgets", params={"fund_code": "01"})
+    assert "Fresh row" in third.text
+    assert query_cache.stats()["misses"] == 2
+
+
+def test_lru_evicts_oldest_entry(client, db):
+    cache = QueryCache(maxsize=2)
+    calls = []
+
+    def load(tag):
+        calls.append(tag)
+        return tag
+
+    for tag in ("a", "b", "a", "c", "b"):
+        cache.get_or_load(db, models.OperatingBudget, {"fund_code": tag}, lambda: load(tag))
+    # "a" was used after "b", so "c" evicted "b"
+    assert calls == ["a", "b", "c", "b"]
+    assert cache.stats()["entries"] == 2
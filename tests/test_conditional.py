@@ -0,0 +1,38 @@
+from app import crud, schemas
+
+
+def test_list_endpoint_returns_304_until_table_changes(client, db, construction_row):
+    crud.create_construction_budget(db, schemas.ConstructionBudgetCreate(**construction_row()))
+
+    first = client.get("/construction_budgets/", params={"limit": 10})
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('"')
+
+    again = client.get("/construction_budgets/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    # Different params are a different representation
+    other = client.get("/construction_budgets/", params={"limit": 5}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+
+    crud.create_construction_budget(db, schemas.ConstructionBudgetCreate(**construction_row(line_descr="Second row")))
+    changed = client.get("/construction_budgets/", params={"limit": 10}, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.json()) == 2
+
+
+def test_row_fragment_revalidates(client, db, construction_row):
+    crud.create_construction_budget(db, schemas.ConstructionBudgetCreate(**construction_row()))
+    headers = {"HX-Request": "true"}
+
+    first = client.get("/construction_budgets", params={"fund_code": "21"}, headers=headers)
+    assert first.status_code == 200 and "Construction row" in first.text
+    etag = first.headers["etag"]
+
+    again = client.get(
+        "/construction_budgets", params={"fund_code": "21"}, headers=dict(headers, **{"If-None-Match": etag})
+    )
+    assert again.status_code == 304
@@ -0,0 +1,30 @@
+from app.database import TimedQueuePool, build_engine, pool_status
+
+
+def test_file_sqlite_engine_uses_timed_pool_and_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "2")
+    engine = build_engine(f"sqlite:///{tmp_path / 'budget.db'}")
+    try:
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+        assert isinstance(engine.pool, TimedQueuePool)
+        status = pool_status(engine)
+        assert status["size"] == 2
+        assert status["checkouts"] >= 1 and status["checkins"] >= 1
+        assert status["waits"] == status["checkouts"]
+    finally:
+        engine.dispose()
+
+
+def test_pool_diagnostics_endpoint(client, monkeypatch):
+    assert client.get("/diagnostics/pool").status_code == 404
+    monkeypatch.setenv("PROFILE_TOKEN", "s3cret")
+    assert client.get("/diagnostics/pool").status_code == 403
+    headers = {"X-Profile": "s3cret"}
+    # Collection starts on the first report for an engine built elsewhere
+    before = client.get("/diagnostics/pool", headers=headers).json()
+    client.get("/budgets/")
+    after = client.get("/diagnostics/pool", headers=headers).json()
+    assert after["dialect"] == "sqlite"
+    assert after["async"]["checkouts"] > before["async"]["checkouts"]
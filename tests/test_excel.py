@@ -0,0 +1,33 @@
+import pytest
+pytest.importorskip("openpyxl")
+
+from app.excel import ExcelRowReader
+
+
+def test_reader_normalises_headers_and_pads_codes_in_chunks(xlsx):
+    buf = xlsx([
+        [" Fund_Code ", "PROGRAM_CODE", "Class", "budget_amount"],
+        [1, "12", "CL", 10.0],
+        [None, None, None, None],
+        ["17", 300, None, 12.5],
+        [2, None, "X", 3],
+    ], as_file=True)
+    with ExcelRowReader(buf, rename={"class": "class_"}, chunk_size=2) as reader:
+        assert reader.headers == ["fund_code", "program_code", "class_", "budget_amount"]
+        chunks = list(reader.chunks())
+
+    assert [len(c) for c in chunks] == [1, 2]
+    rows = [row for chunk in chunks for row in chunk]
+    assert rows[0] == {"fund_code": "01", "program_code": "0012", "class_": "CL", "budget_amount": "10"}
+    assert rows[1] == {"fund_code": "17", "program_code": "0300", "class_": "", "budget_amount": "12.5"}
+    assert rows[2]["program_code"] == ""
+
+
+def test_column_chunks_match_row_chunks(xlsx):
+    rows = [["fund_code", "descr"], [1, "a"], [None, None], [21, None], [3, "c"]]
+    with ExcelRowReader(xlsx(rows, as_file=True), chunk_size=3) as reader:
+        columns = list(reader.column_chunks())
+    assert columns == [
+        {"fund_code": ["01", "21"], "descr": ["a", ""]},
+        {"fund_code": ["03"], "descr": ["c"]},
+    ]
@@ -0,0 +1,44 @@
+import csv
+import io
+
+import pytest
+
+
+def test_csv_export_streams_filtered_rows(client, budget_row):
+    client.post("/budgets/", json=budget_row(descr="Export keep"))
+    client.post("/budgets/", json=budget_row(fiscal_year=2051, descr="Export skip"))
+
+    response = client.get("/budgets/export", params={"fiscal_year": 2050, "descr": "export"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="operating_budgets.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["descr"] for r in rows] == ["Export keep"]
+    assert rows[0]["class"] == "CL1"
+
+
+def test_xlsx_export(client, budget_row):
+    openpyxl = pytest.importorskip("openpyxl")
+    client.post("/budgets/", json=budget_row(fiscal_year=2042, descr="Excel export"))
+
+    response = client.get("/budgets/export", params={"fiscal_year": 2042, "format": "xlsx"})
+    assert response.status_code == 200
+    ws = openpyxl.load_workbook(io.BytesIO(response.content)).active
+    rows = list(ws.iter_rows(values_only=True))
+    assert rows[0][:3] == ("id", "fiscal_year", "fund_code")
+    assert rows[1][-1] == "Excel export"
+
+    assert client.get("/budgets/export", params={"format": "pdf"}).status_code == 422
+
+
+def test_export_follows_the_list_sort(client, budget_row):
+    for amount, descr in ((5.0, "Sorted b"), (20.0, "Sorted a"), (5.0, "Sorted c")):
+        client.post("/budgets/", json=budget_row(budget_amount=amount, descr=descr))
+
+    response = client.get("/budgets/export", params={"descr": "sorted", "sort": "-budget_amount"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    # Ties keep the list view's id order, descending with the sort
+    assert [r["descr"] for r in rows] == ["Sorted a", "Sorted c", "Sorted b"]
+
+    response = client.get("/budgets/export", params={"descr": "sorted", "sort": "budget_amount"})
+    assert [r["descr"] for r in csv.DictReader(io.StringIO(response.text))] == ["Sorted b", "Sorted c", "Sorted a"]
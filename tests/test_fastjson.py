@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+import pytest
+
+from app import fastjson, models, schemas
+
+
+def test_list_matches_schema_serialisation(client, construction_row):
+    created = [client.post("/construction_budgets/", json=construction_row(monetary_amount=amount)).json()
+               for amount in (12.5, None)]
+
+    response = client.get("/construction_budgets/")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == created
+
+
+def test_operating_rows_use_field_aliases():
+    row = (2050, "01", "0100", "4300", "D1", "OU1", "CL1", "PJ1", 1.5, "Row", 7)
+    encoded = fastjson.OPERATING_BUDGET_JSON.dumps([row])
+    assert schemas.OperatingBudget.model_validate_json(encoded[1:-1]).class_ == "CL1"
+
+
+def test_schema_checked_against_columns():
+    fastjson.RowSerializer(schemas.SupplierBudget, models.SupplierBudget)
+    with pytest.raises(TypeError):
+        # OPERATING_BUDGET has no VENDOR_ID column
+        fastjson.RowSerializer(schemas.SupplierBudget, models.OperatingBudget)
+    assert fastjson._default(Decimal("1.25")) == 1.25
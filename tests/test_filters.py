@@ -0,0 +1,28 @@
+from app.filters import OPERATING_BUDGET_FILTERS
+
+
+def test_filter_spec_compiles_to_where_clauses():
+    clauses = OPERATING_BUDGET_FILTERS.clauses(
+        {"fund_code": "01", "descr": "paper", "budget_amount_min": "10", "fiscal_year": "abc", "account": ""}
+    )
+    sql = [str(c.compile(compile_kwargs={"literal_binds": True})) for c in clauses]
+    assert "\"OPERATING_BUDGET\".\"FUND_CODE\" LIKE '01%' ESCAPE '\\'" in sql
+    assert "lower(\"OPERATING_BUDGET\".\"DESCR\") LIKE lower('%paper%') ESCAPE '\\'" in sql
+    assert "\"OPERATING_BUDGET\".\"BUDGET_AMOUNT\" >= 10.0" in sql
+    # Unparseable and empty params are ignored
+    assert len(sql) == 3
+
+
+def test_ui_filters_run_in_sql(client, budget_row):
+    client.post("/budgets/", json=budget_row(fund_code="17", descr="Filter Target Lab", budget_amount=250.0))
+    client.post("/budgets/", json=budget_row(fund_code="170", descr="Filter Other Lab", budget_amount=5.0))
+    client.post("/budgets/", json=budget_row(fund_code="01", descr="Filter Target Lab", budget_amount=250.0))
+
+    headers = {"HX-Request": "true"}
+    html = client.get("/", params={"fund_code": "17", "descr": "target lab"}, headers=headers).text
+    assert html.count("<tr id=\"budget-") == 1
+    assert "Filter Target Lab" in html
+
+    html = client.get("/", params={"fund_code": "17", "budget_amount_max": "10"}, headers=headers).text
+    assert "Filter Other Lab" in html
+    assert "Filter Target Lab" not in html
@@ -0,0 +1,51 @@
+from app import indexadvisor
+from app.indexadvisor import QueryPattern
+
+
+def test_recommend_orders_equality_then_range_and_folds_prefixes():
+    counted = [
+        (QueryPattern("T", ("FISCAL_YEAR",), ("FUND_CODE",)), 5),
+        (QueryPattern("T", ("FISCAL_YEAR",), (), sort="ACCOUNT"), 3),
+        (QueryPattern("T", ("FISCAL_YEAR",), ()), 2),
+    ]
+    recommended = indexadvisor.recommend(counted)
+    assert recommended == [
+        # (FISCAL_YEAR) alone leads this one, so its queries are folded in
+        {"table": "T", "columns": ["FISCAL_YEAR", "FUND_CODE"], "queries": 7},
+        {"table": "T", "columns": ["FISCAL_YEAR", "ACCOUNT"], "queries": 3},
+    ]
+
+
+def test_endpoint_reports_recorded_ui_patterns(client, monkeypatch):
+    indexadvisor.reset()
+    headers = {"HX-Request": "true"}
+    client.get("/", params={"fiscal_year": "2050", "fund_code": "01", "descr": "x"}, headers=headers)
+    client.get("/", params={"fiscal_year": "2050", "sort": "account"}, headers=headers)
+
+    assert client.get("/diagnostics/indexes").status_code == 404
+    monkeypatch.setenv("PROFILE_TOKEN", "s3cret")
+    report = client.get("/diagnostics/indexes", params={"_profile": "s3cret"}).json()
+    assert {"table": "OPERATING_BUDGET", "equality": ["FISCAL_YEAR"], "ranges": ["FUND_CODE"],
+            "sort": None, "queries": 1} in report["patterns"]
+    advice = {tuple(item["columns"]): item for item in report["recommended"]}
+    assert advice[("FISCAL_YEAR", "FUND_CODE")]["covered_by"] == "ix_OPERATING_BUDGET_FY_FUND_PROGRAM_DEPT"
+    assert advice[("FISCAL_YEAR", "ACCOUNT")]["covered_by"] is None
+    assert report["redundant"] == []
+
+
+def test_composite_index_migration_matches_the_models():
+    import importlib.util
+    from pathlib import Path
+
+    from app import models
+
+    path = Path(__file__).parents[1] / "alembic" / "versions" / "f1a3c5e7b9d2_composite_budget_indexes.py"
+    spec = importlib.util.spec_from_file_location("f1a3c5e7b9d2", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    declared = {
+        index.name: (table.name, [column.name for column in index.columns])
+        for table in (models.OperatingBudget.__table__, models.SupplierBudget.__table__, models.ConstructionBudget.__table__)
+        for index in table.indexes
+    }
+    assert declared == migration.MODEL_INDEXES
@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+pytest.importorskip("openpyxl")
+
+from sqlalchemy.dialects import mssql
+
+from app import merge, models, staging
+
+
+def _upload(client, files, **form):
+    response = client.post("/budgets/bulk_upload/preview", files=files, data=form)
+    assert response.status_code == 200
+    return response.text
+
+
+def _token(text):
+    return text.split('name="token" value="')[1].split('"')[0]
+
+
+def test_merge_updates_inserts_and_deletes(client, db, budget_row, xlsx):
+    original = [budget_row(), budget_row(account="4400"), budget_row(account="4500"), budget_row(fiscal_year=2051)]
+    client.post("/budgets/bulk_upload", data={"token": _token(_upload(client, xlsx(original)))})
+
+    revised = [budget_row(budget_amount=150.0), budget_row(account="4400"), budget_row(account="4600", budget_amount=5.0)]
+    text = _upload(client, xlsx(revised), mode="merge", delete_missing="true")
+    assert "1 to insert, 1 to update, 1 unchanged, 1 to delete." in text
+    assert "budget_amount: 10.0 &rarr; 150.0" in text
+    assert '<input type="hidden" name="mode" value="merge"/>' in text
+
+    response = client.post("/budgets/bulk_upload", data={"token": _token(text), "mode": "merge", "delete_missing": "true"})
+    assert response.headers["HX-Refresh"] == "true"
+
+    rows = db.query(models.OperatingBudget).order_by(models.OperatingBudget.fiscal_year, models.OperatingBudget.account).all()
+    # FY 2051 is outside the upload, so it is not deleted
+    assert [(r.fiscal_year, r.account, r.budget_amount) for r in rows] == [
+        (2050, "4300", 150.0), (2050, "4400", 10.0), (2050, "4600", 5.0), (2051, "4300", 10.0),
+    ]
+    totals = {s.fiscal_year: (s.budget_amount, s.row_count) for s in db.query(models.OperatingBudgetSummary)}
+    assert totals == {2050: (165.0, 3), 2051: (10.0, 1)}
+
+    # A second confirm finds nothing staged
+    response = client.post("/budgets/bulk_upload", data={"token": _token(text), "mode": "merge"})
+    assert "Upload not found" in response.text
+
+
+def test_merge_rejects_duplicate_keys(client, budget_row, xlsx):
+    text = _upload(client, xlsx([budget_row(), budget_row(budget_amount=5.0)]), mode="merge")
+    assert "<td>1</td>" in text and "<td>2</td>" in text
+    assert "Another row has the same merge key" in text
+    assert 'name="token"' not in text
+
+
+def test_merge_key_can_be_configured(monkeypatch):
+    monkeypatch.setenv("OPERATING_BUDGET_MERGE_KEY", "fiscal_year, account")
+    assert merge.merge_key(staging.OPERATING_BUDGET_UPLOADS) == ("fiscal_year", "account")
+    monkeypatch.setenv("OPERATING_BUDGET_MERGE_KEY", "fiscal_year,bogus")
+    with pytest.raises(ValueError):
+        merge.merge_key(staging.OPERATING_BUDGET_UPLOADS)
+
+
+def test_sql_server_merge_statement():
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=mssql.dialect()))
+    target = staging.CONSTRUCTION_BUDGET_UPLOADS
+    sql = str(merge.merge_statement(db, target, target.natural_key, delete_missing=True))
+    assert sql.startswith("WITH scoped AS (SELECT * FROM [CONSTRUCTION_BUDGET] WITH (HOLDLOCK) WHERE [BUDGET_PERIOD] IN")
+    assert "WHEN MATCHED AND EXISTS (SELECT s.[LINE_DESCR], s.[MONETARY_AMOUNT] EXCEPT" in sql
+    assert "WHEN NOT MATCHED BY SOURCE THEN DELETE" in sql
+    assert sql.endswith("OUTPUT $action, inserted.[ID], deleted.[ID];")
+    sql = str(merge.merge_statement(db, target, target.natural_key, delete_missing=False))
+    assert sql.startswith("MERGE INTO [CONSTRUCTION_BUDGET] WITH (HOLDLOCK) AS t")
@@ -0,0 +1,33 @@
+from app import crud, metrics, schemas
+
+
+def _timing(header):
+    entries = {}
+    for entry in header.split(","):
+        name, *params = [part.strip() for part in entry.split(";")]
+        entries[name] = dict(param.split("=", 1) for param in params)
+    return entries
+
+
+def test_server_timing_and_metrics_endpoint(client, db, budget_row):
+    metrics.reset()
+    for i in range(3):
+        crud.create_budget(db, schemas.OperatingBudgetCreate(**budget_row(descr=f"Metrics row {i}")))
+
+    page = client.get("/", params={"fiscal_year": "2050"}, headers={"HX-Request": "true"})
+    timing = _timing(page.headers["server-timing"])
+    assert int(timing["sql"]["desc"].strip('"').split()[0]) >= 2
+    assert timing["rows"]["desc"] == '"3"'
+    assert float(timing["render"]["dur"]) > 0
+
+    # The async REST path is counted too
+    listing = _timing(client.get("/budgets/").headers["server-timing"])
+    assert listing["rows"]["desc"] == '"3"'
+    assert int(listing["sql"]["desc"].strip('"').split()[0]) >= 2
+
+    text = client.get("/metrics").text
+    labels = 'method="GET",route="/",handler="ui_operating.index",status="200"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 1" in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 1' in text
+    assert f"app_rows_total{{{labels}}} 3" in text
+    assert 'app_template_renders_total{template="budget_rows.html"} 1' in text
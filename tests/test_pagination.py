@@ -0,0 +1,81 @@
+from app import crud, pagination, schemas
+from app.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor([42])) == [42]
+
+
+def test_keyset_pages_cover_filtered_rows(client, supplier_row):
+    ids = [
+        client.post("/supplier_budgets/", json=supplier_row(amount=float(i))).json()["id"]
+        for i in range(5)
+    ]
+
+    seen = []
+    response = client.get("/supplier_budgets/", params={"fiscal_year": "2050", "limit": 2, "include_total": True})
+    assert response.headers["X-Total-Count"] == "5"
+    while True:
+        assert response.status_code == 200
+        seen.extend(row["id"] for row in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = client.get("/supplier_budgets/", params={"fiscal_year": "2050", "limit": 2, "cursor": cursor})
+    assert seen == ids
+
+    assert client.get("/supplier_budgets/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_sorted_pages_walk_every_row_once(client, db, supplier_row):
+    descrs = ["c", None, "a", "c", None, "b", "a"]
+    for descr in descrs:
+        crud.create_supplier_budget(db, schemas.SupplierBudgetCreate(**supplier_row(descr=descr)))
+
+    for sort in ("descr", "-descr"):
+        seen, cursor = [], None
+        while True:
+            params = {"sort": sort, "cursor": cursor} if cursor else {"sort": sort}
+            page = crud.get_supplier_budget_page(db, params, limit=2)
+            seen.extend(page.rows)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        assert len({row.id for row in seen}) == len(descrs)
+        values = [row.descr for row in seen]
+        # NULLs sort lowest
+        expected = sorted(values, key=lambda v: (v is not None, v or ""), reverse=sort.startswith("-"))
+        assert values == expected
+
+
+def test_ui_fragment_renders_scroll_sentinel(client, db, monkeypatch, supplier_row):
+    monkeypatch.setattr(pagination, "UI_PAGE_SIZE", 2)
+    for i in range(3):
+        crud.create_supplier_budget(db, schemas.SupplierBudgetCreate(**supplier_row(descr=f"Row {i}")))
+
+    response = client.get("/supplier_budgets", params={"fiscal_year": "2050"}, headers={"HX-Request": "true"})
+    assert "Row 1" in response.text and "Row 2" not in response.text
+    assert 'hx-trigger="revealed"' in response.text
+
+    # The last page ends with an inert sentinel, which the add and confirm forms insert before
+    next_url = response.text.split('class="load-more" hx-get="')[1].split('"')[0].replace("&amp;", "&")
+    response = client.get(next_url, headers={"HX-Request": "true"})
+    assert "Row 2" in response.text
+    assert response.text.rstrip().endswith('<tr class="load-more" hidden></tr>')
+
+    assert client.get("/supplier_budgets", params={"cursor": "bad"}, headers={"HX-Request": "true"}).status_code == 400
+
+
+def test_unpaged_fragment_streams_every_row(client, db, monkeypatch, supplier_row):
+    monkeypatch.setattr(pagination, "UI_PAGE_SIZE", 0)
+    monkeypatch.setattr(pagination, "STREAM_YIELD_PER", 2)
+    for i in range(5):
+        crud.create_supplier_budget(db, schemas.SupplierBudgetCreate(**supplier_row(descr=f"Row {i}")))
+
+    response = client.get("/supplier_budgets", params={"fiscal_year": "2050", "sort": "-descr"}, headers={"HX-Request": "true"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/html")
+    positions = [response.text.index(f"Row {i}") for i in reversed(range(5))]
+    assert positions == sorted(positions)
+    assert "revealed" not in response.text
+    assert response.headers["etag"]
@@ -0,0 +1,71 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import profiler
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROFILE_TOKEN", "s3cret")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_INTERVAL", "0.0005")
+    return tmp_path
+
+
+def slow_handler(done):
+    while not done.is_set():
+        sum(range(1000))
+
+
+def test_sampler_keeps_only_the_handler_stack():
+    done = threading.Event()
+    scope = {"route": SimpleNamespace(endpoint=slow_handler)}
+    worker = threading.Thread(target=slow_handler, args=(done,))
+    sampler = profiler.StackSampler(scope, 0.001)
+    worker.start()
+    sampler.start()
+    time.sleep(0.05)
+    sampler.stop()
+    done.set()
+    worker.join()
+
+    assert sampler.samples > 0
+    stacks = [stack for stack in sampler.stacks if stack != profiler.OUTSIDE_HANDLER]
+    assert stacks
+    # Stacks start at the handler; the thread's own frames above it are dropped
+    assert all(stack.startswith("slow_handler (tests/test_profiler.py:") for stack in stacks)
+
+
+def test_profiled_request_saves_downloadable_artefacts(client, profiling):
+    response = client.get("/", params={"fiscal_year": "2050", "_profile": "s3cret"}, headers={"HX-Request": "true"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert response.headers["x-profile-url"] == f"/diagnostics/profiles/{profile_id}"
+    # The token is not treated as a filter or echoed into links
+    assert "s3cret" not in response.text
+
+    summary = client.get(f"/diagnostics/profiles/{profile_id}", headers={"X-Profile": "s3cret"}).json()
+    assert summary["handler"] == "app.routers.ui_operating.index"
+    assert summary["query"] == "fiscal_year=2050"
+    assert summary["status"] == 200
+    assert summary["peak_memory_bytes"] > 0
+
+    stacks = client.get(f"/diagnostics/profiles/{profile_id}/stacks", params={"_profile": "s3cret"})
+    assert stacks.status_code == 200
+    assert stacks.headers["content-disposition"] == f'attachment; filename="{profile_id}.collapsed"'
+    assert [p["id"] for p in client.get("/diagnostics/profiles", headers={"X-Profile": "s3cret"}).json()] == [profile_id]
+
+
+def test_profiling_requires_the_token(client, profiling, monkeypatch):
+    response = client.get("/", params={"_profile": "wrong"}, headers={"HX-Request": "true"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert client.get("/diagnostics/profiles", headers={"X-Profile": "wrong"}).status_code == 403
+    assert client.get("/diagnostics/profiles/not-an-id", headers={"X-Profile": "s3cret"}).status_code == 404
+
+    monkeypatch.delenv("PROFILE_TOKEN")
+    assert "x-profile-id" not in client.get("/", headers={"X-Profile": ""}).headers
+    assert client.get("/diagnostics/profiles").status_code == 404
@@ -0,0 +1,81 @@
+from app import rollover, textindex
+from app.models import OperatingBudget
+
+
+def _summary(client, year):
+    response = client.get("/budgets/summary", params={"group_by": "fiscal_year"})
+    return {r["groups"]["fiscal_year"]: (r["total_amount"], r["row_count"]) for r in response.json()}.get(year)
+
+
+def test_rollover_copies_a_year_with_adjustments(client, budget_row):
+    client.post("/budgets/", json=budget_row(budget_amount=100.0))
+    client.post("/budgets/", json=budget_row(fund_code="02", budget_amount=50.0))
+    client.post("/budgets/", json=budget_row(program_code="0200", budget_amount=10.0))
+    client.post("/budgets/", json=budget_row(fiscal_year=2049))
+
+    request = {
+        "source_year": 2050,
+        "target_year": 2051,
+        "adjustments": [
+            {"fund_code": "02", "percent": 10},
+            {"program_code": "0200", "amount": -2.5},
+        ],
+    }
+    response = client.post("/budgets/rollover", params={"dry_run": True}, json=request)
+    assert response.json() == {"copied": 3, "adjusted": 2, "replaced": 0, "total_amount": 162.5, "dry_run": True}
+    assert _summary(client, 2051) is None
+
+    response = client.post("/budgets/rollover", json=request)
+    assert response.json()["copied"] == 3
+    rows = client.get("/budgets/", params={"fiscal_year": 2051}).json()
+    assert sorted((r["fund_code"], r["program_code"], r["budget_amount"]) for r in rows) == [
+        ("01", "0100", 100.0), ("01", "0200", 7.5), ("02", "0100", 55.0),
+    ]
+    assert all(r["descr"] == "Budget row" and r["class"] == "CL1" for r in rows)
+    assert _summary(client, 2051) == (162.5, 3)
+    assert _summary(client, 2050) == (160.0, 3)
+
+
+def test_rollover_refuses_an_occupied_year_unless_replacing(client, budget_row):
+    client.post("/budgets/", json=budget_row())
+    client.post("/budgets/", json=budget_row(deptid="D2"))
+    client.post("/budgets/", json=budget_row(fiscal_year=2051, budget_amount=1.0))
+    client.post("/budgets/", json=budget_row(fiscal_year=2051, deptid="D2", budget_amount=2.0))
+
+    request = {"source_year": 2050, "target_year": 2051, "filters": {"deptid": "D1"}}
+    response = client.post("/budgets/rollover", json=request)
+    assert response.status_code == 400
+
+    response = client.post("/budgets/rollover", json=dict(request, replace=True))
+    assert response.json()["replaced"] == 1
+    rows = client.get("/budgets/", params={"fiscal_year": 2051}).json()
+    # Rows outside the filter are left alone
+    assert sorted((r["deptid"], r["budget_amount"]) for r in rows) == [("D1", 10.0), ("D2", 2.0)]
+
+    response = client.post("/budgets/rollover", json={"source_year": 2050, "target_year": 2050})
+    assert response.status_code == 400
+
+
+def test_rollover_string_years(client, supplier_row, construction_row):
+    client.post("/supplier_budgets/", json=supplier_row(amount=20))
+    request = {"source_year": 2050, "target_year": 2051, "adjustments": [{"percent": 5}]}
+    response = client.post("/supplier_budgets/rollover", json=request)
+    assert response.json()["copied"] == 1
+    rows = client.get("/supplier_budgets/", params={"fiscal_year": "2051"}).json()
+    assert [(r["vendor_id"], float(r["amount"])) for r in rows] == [("V1", 21.0)]
+
+    client.post("/construction_budgets/", json=construction_row())
+    response = client.post("/construction_budgets/rollover", json={"source_year": 2050, "target_year": 2051})
+    assert response.json()["copied"] == 1
+
+
+def test_rollover_keeps_text_index_current(client, db, budget_row):
+    client.post("/budgets/", json=budget_row(descr="Library books"))
+    client.post("/budgets/", json=budget_row(fiscal_year=2051, descr="Library old"))
+    textindex.build(db.get_bind(), [OperatingBudget])
+    try:
+        rollover.rollover(db, rollover.OPERATING_BUDGET_ROLLOVER, 2050, 2051, replace=True)
+        rows = client.get("/budgets/", params={"descr": "library"}).json()
+        assert sorted((r["fiscal_year"], r["descr"]) for r in rows) == [(2050, "Library books"), (2051, "Library books")]
+    finally:
+        textindex.drop(db.get_bind())
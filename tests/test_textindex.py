@@ -0,0 +1,54 @@
+import pytest
+
+from app import models, textindex
+
+
+def test_trigram_index_search_and_remove():
+    index = textindex.TrigramIndex()
+    index.update([(1, "Office Supplies"), (2, "Copier lease"), (3, "Printer supplies")])
+    assert index.search("SUPPL") == {1, 3}
+    assert index.search("lease") == {2}
+    assert index.search("ie") is None  # too short to narrow
+    index.update([(1, "Furniture")])
+    index.remove([3])
+    assert index.search("suppl") == set()
+    assert index.search("furn") == {1}
+
+
+@pytest.fixture
+def indexed(db):
+    bind = db.get_bind()
+    textindex.build(bind)
+    yield bind
+    textindex.drop(bind)
+
+
+def _search(client, term):
+    response = client.get("/construction_budgets/", params={"line_descr": term})
+    return sorted(row["line_descr"] for row in response.json())
+
+
+def test_contains_filter_uses_index_across_writes(client, indexed, construction_row):
+    client.post("/construction_budgets/", json=construction_row(line_descr="Roof repair"))
+    client.post("/construction_budgets/batch", json=[construction_row(line_descr="Roofing phase 2"), construction_row(line_descr="Parking lot")])
+    assert len(textindex.index_for(indexed, models.ConstructionBudget)) == 3
+
+    clause = textindex.contains_clause(
+        indexed, models.ConstructionBudget, "line_descr", "roof", models.ConstructionBudget.line_descr.ilike("%roof%")
+    )
+    assert "IN" in str(clause.compile(compile_kwargs={"literal_binds": True}))
+    assert _search(client, "ROOF") == ["Roof repair", "Roofing phase 2"]
+    assert _search(client, "zzz") == []
+
+    client.post("/construction_budgets/bulk_update", json={"filters": {"line_descr": "parking"}, "values": {"line_descr": "Roof drains"}})
+    assert _search(client, "roof") == ["Roof drains", "Roof repair", "Roofing phase 2"]
+    client.post("/construction_budgets/bulk_delete", json={"filters": {"line_descr": "roofing"}})
+    assert _search(client, "roof") == ["Roof drains", "Roof repair"]
+
+
+def test_index_is_opt_in(monkeypatch):
+    # Each worker's index only sees its own writes, so it is off by default
+    monkeypatch.delenv("TEXT_INDEX", raising=False)
+    assert not textindex.enabled()
+    monkeypatch.setenv("TEXT_INDEX", "1")
+    assert textindex.enabled()
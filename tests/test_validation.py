@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip("numpy", minversion="2.0")
+
+from app import crud, models, schemas, staging, validation
+
+
+@pytest.fixture
+def supplier_cells(supplier_row):
+    """`supplier_row` as a sheet row: every cell a string."""
+    def make(**overrides):
+        return {name: str(value) for name, value in supplier_row(**overrides).items()}
+    return make
+
+
+def test_rules_follow_schema_and_model():
+    rules = {rule.name: rule for rule in validation.rules_for(schemas.SupplierBudgetCreate, models.SupplierBudget)}
+    assert (rules["amount"].kind, rules["amount"].required, rules["amount"].max_integer_digits) == (float, True, 8)
+    assert (rules["vendor_id"].required, rules["vendor_id"].max_length) == (False, 15)
+    assert (rules["fund_code"].width, rules["program_code"].width) == (2, 4)
+    operating = {rule.name: rule for rule in validation.rules_for(schemas.OperatingBudgetCreate, models.OperatingBudget)}
+    assert (operating["fiscal_year"].kind, operating["class_"].alias) == (int, "class")
+
+
+def test_valid_rows_match_schema_validation(supplier_cells):
+    target = staging.SUPPLIER_BUDGET_UPLOADS
+    chunk = [supplier_cells(fund_code="1", amount="12.50"), supplier_cells(vendor_id="", amount="7", fund_code="21")]
+    rows, errors = validation.validate_records(chunk, list(chunk[0]), validation.rules_for(target.schema, target.model))
+    assert errors == []
+    expected, _ = crud.validate_rows(target.schema, [dict(row, fund_code=row["fund_code"].zfill(2), program_code=row["program_code"].zfill(4)) for row in chunk])
+    assert rows == [item.model_dump() for item in expected]
+    assert rows[0]["fund_code"] == "01" and rows[0]["amount"] == 12.5
+
+
+def test_codes_are_padded_not_truncated(supplier_cells):
+    # SUPPLIER_BUDGET.FUND_CODE is String(4), and the REST API accepts a 4-character fund
+    target = staging.SUPPLIER_BUDGET_UPLOADS
+    chunk = [supplier_cells(fund_code="0100"), supplier_cells(fund_code="7")]
+    rows, errors = validation.validate_records(chunk, list(chunk[0]), validation.rules_for(target.schema, target.model))
+    assert errors == []
+    assert [row["fund_code"] for row in rows] == ["0100", "07"]
+    _, expected = crud.validate_rows(target.schema, chunk)
+    assert expected == []
+
+
+def test_every_bad_cell_is_reported_in_row_order(supplier_cells):
+    target = staging.SUPPLIER_BUDGET_UPLOADS
+    chunk = [
+        supplier_cells(),
+        supplier_cells(amount="", fund_code="12345"),
+        supplier_cells(amount="1e9", vendor_id="V" * 16),
+        supplier_cells(amount="abc", deptid=""),
+    ]
+    rows, errors = validation.validate_records(chunk, list(chunk[0]), validation.rules_for(target.schema, target.model), start=11)
+    assert rows == []
+    assert [(e["row"], e["field"], e["message"]) for e in errors] == [
+        (12, "fund_code", "String should have at most 4 characters"),
+        (12, "amount", "Field required"),
+        (13, "vendor_id", "String should have at most 15 characters"),
+        (13, "amount", "Number should be less than 100,000,000 in magnitude"),
+        (14, "amount", "Input should be a valid number"),
+    ]
+
+
+def test_blank_cells_match_schema_validation(supplier_cells):
+    target = staging.SUPPLIER_BUDGET_UPLOADS
+    chunk = [
+        supplier_cells(),
+        supplier_cells(deptid="", vendor_id="", account="  "),
+    ]
+    # No operating_unit column: a required field missing from every row
+    headers = [header for header in chunk[0] if header != "operating_unit"]
+    for row in chunk:
+        del row["operating_unit"]
+    rules = validation.rules_for(target.schema, target.model)
+    _, errors = validation.validate_records(chunk, headers, rules, start=5)
+    _, expected = crud.validate_rows(target.schema, chunk, start=5)
+    assert [(e["row"], e["field"], e["message"]) for e in errors] == [
+        (e["row"], e["field"], e["message"]) for e in expected
+    ] == [(5, "operating_unit", "Field required"), (6, "operating_unit", "Field required")]
+
+    for row in chunk:
+        row["operating_unit"] = "OU1"
+    rows, errors = validation.validate_records(chunk, list(chunk[0]), rules)
+    valid, _ = crud.validate_rows(target.schema, chunk)
+    assert errors == [] and rows == [item.model_dump() for item in valid]
+    assert (rows[1]["deptid"], rows[1]["vendor_id"]) == ("", "")
+
+    # Upload chunks take the same path: blank string cells pass, a blank amount does not
+    columns = {name: [row[name] for row in chunk] for name in chunk[0]}
+    columns["amount"][1] = ""
+    valid, errors = target.validate(columns, 2, 1, {"row_no": [1, 2]})
+    assert errors == [{"row": 2, "field": "amount", "message": "Field required"}]
+    columns["amount"][1] = "5"
+    valid, errors = target.validate(columns, 2, 1, {"row_no": [1, 2]})
+    assert errors == [] and [(row["row_no"], row["deptid"], row["vendor_id"]) for row in valid] == [(1, "D1", "V1"), (2, "", "")]
+
+
+def test_missing_and_fractional_integers():
+    target = staging.OPERATING_BUDGET_UPLOADS
+    rules = validation.rules_for(target.schema, target.model)
+    headers = ["fiscal_year", "fund_code", "program_code", "account", "deptid", "operating_unit", "class", "project_id", "budget_amount"]
+    row = dict(zip(headers, ["2025.5", "01", "0100", "4300", "D1", "OU", "CL", "P", "5"]))
+    _, errors = validation.validate_records([row], headers, rules)
+    assert [(e["field"], e["message"]) for e in errors] == [
+        ("fiscal_year", "Input should be a valid integer"),
+        ("descr", "Field required"),
+    ]